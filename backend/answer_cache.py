@@ -0,0 +1,198 @@
+"""
+答案缓存 - 启动时预加载各竞赛的标准答案，评分时直接复用
+
+每个答案文件只保留评分真正需要的信息：
+- index: 样本键 -> 行号 的映射
+- labels: 按行号存放的标签（bytearray，每个样本1字节）
+- version: 答案文件内容的 SHA-256，用于判断历史评分结果是否仍然有效
+
+缓存按文件路径区分，文件的 mtime/size 变化后会自动重新加载。
+文件在上次校验前后 MTIME_GRANULARITY_NS 内被修改过时，同一时间戳内可能又被改写
+而 mtime/size 不变，这时改为重新计算 SHA-256 确认内容，version 始终与缓存的标签一致。
+"""
+import csv
+import hashlib
+import io
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 各竞赛答案文件中用于标识样本的列
+COMPETITION_KEY_COLUMNS = {
+    "ppi": ["protein_A", "protein_B"],
+    "cci": ["source", "target"],
+}
+
+# 答案文件中的标签列
+LABEL_COLUMN = "label"
+
+# 文件系统时间戳粒度的上限（纳秒）
+MTIME_GRANULARITY_NS = 2 * 10**9
+
+
+class AnswerKey:
+    """单个答案文件的紧凑表示"""
+
+    __slots__ = ("path", "mtime_ns", "size", "key_cols", "index", "labels", "version", "verified_ns")
+
+    def __init__(
+        self,
+        path: str,
+        mtime_ns: int,
+        size: int,
+        key_cols: List[str],
+        index: Dict,
+        labels: bytearray,
+        version: str,
+        verified_ns: int,
+    ):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.key_cols = key_cols
+        self.index = index
+        self.labels = labels
+        self.version = version
+        # 最近一次确认文件内容与 version 一致的时间
+        self.verified_ns = verified_ns
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def is_stale(self, stat: os.stat_result) -> bool:
+        """文件是否已被修改"""
+        if stat.st_mtime_ns != self.mtime_ns or stat.st_size != self.size:
+            return True
+        if stat.st_mtime_ns + MTIME_GRANULARITY_NS < self.verified_ns:
+            return False
+        # 修改时间离上次校验太近，mtime/size 不能说明内容未变
+        now = time.time_ns()
+        if file_sha256(self.path) != self.version:
+            return True
+        self.verified_ns = now
+        return False
+
+    def items(self) -> Iterable[Tuple]:
+        """按答案文件顺序返回 (样本键, 标签)"""
+        labels = self.labels
+        for key, idx in self.index.items():
+            yield key, labels[idx]
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_answer_key(path: str, key_cols: List[str]) -> AnswerKey:
+    """解析答案文件，只保留样本键和标签（版本号与解析的是同一份内容）"""
+    verified_ns = time.time_ns()
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    index: Dict = {}
+    labels = bytearray()
+
+    with io.StringIO(data.decode("utf-8"), newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"答案文件为空: {path}")
+
+        missing = [col for col in key_cols + [LABEL_COLUMN] if col not in header]
+        if missing:
+            raise ValueError(f"答案文件缺少列 {missing}: {path}")
+
+        key_pos = [header.index(col) for col in key_cols]
+        label_pos = header.index(LABEL_COLUMN)
+        single_key = len(key_pos) == 1
+
+        for row in reader:
+            if not row:
+                continue
+            if single_key:
+                key = row[key_pos[0]]
+            else:
+                key = tuple(row[i] for i in key_pos)
+            label = int(row[label_pos])
+            if label not in (0, 1):
+                raise ValueError(f"答案文件包含无效标签 {label}: {path}")
+
+            # 与 load_csv_as_dict 一致：重复的键以最后一行为准
+            idx = index.get(key)
+            if idx is None:
+                index[key] = len(labels)
+                labels.append(label)
+            else:
+                labels[idx] = label
+
+    return AnswerKey(
+        path=path,
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        key_cols=list(key_cols),
+        index=index,
+        labels=labels,
+        version=hashlib.sha256(data).hexdigest(),
+        verified_ns=verified_ns,
+    )
+
+
+_cache: Dict[str, AnswerKey] = {}
+_cache_lock = threading.Lock()
+
+
+def get_answer_key(path: str, key_cols: List[str]) -> AnswerKey:
+    """
+    获取答案缓存，文件发生变化时重新加载
+
+    找不到文件时抛出 FileNotFoundError。
+    """
+    cache_key = str(Path(path).resolve())
+    stat = os.stat(cache_key)
+
+    cached = _cache.get(cache_key)
+    if cached is not None and not cached.is_stale(stat) and cached.key_cols == list(key_cols):
+        return cached
+
+    with _cache_lock:
+        # 其他线程可能已经完成了加载
+        cached = _cache.get(cache_key)
+        if cached is not None and not cached.is_stale(os.stat(cache_key)) and cached.key_cols == list(key_cols):
+            return cached
+
+        answer_key = load_answer_key(cache_key, key_cols)
+        _cache[cache_key] = answer_key
+        return answer_key
+
+
+def preload_answer_keys(answer_files: Iterable[Tuple[str, str]]) -> Dict[str, Optional[AnswerKey]]:
+    """
+    预加载一组答案文件
+
+    answer_files: (竞赛名称, 答案文件路径) 列表
+    返回: 竞赛名称 -> AnswerKey（加载失败时为None）
+    """
+    loaded: Dict[str, Optional[AnswerKey]] = {}
+    for name, path in answer_files:
+        key_cols = COMPETITION_KEY_COLUMNS.get(name)
+        if key_cols is None:
+            continue
+        try:
+            loaded[name] = get_answer_key(path, key_cols)
+        except Exception as e:
+            print(f"⚠️  答案文件预加载失败 [{name}]: {e}")
+            loaded[name] = None
+    return loaded
+
+
+def clear_answer_cache() -> None:
+    """清空答案缓存"""
+    with _cache_lock:
+        _cache.clear()
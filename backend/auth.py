@@ -1,41 +1,127 @@
 """
 用户认证相关功能
 """
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, NamedTuple, Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import get_db, User
-
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, EventTicket, User
+from password_hashing import check_password, hash_password, password_hasher
 
 # JWT配置
 SECRET_KEY = "your-secret-key-change-this-in-production-12345678"  # 生产环境应该使用环境变量
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7天
 
+# 已验证令牌缓存：有效期（秒）与最大条目数
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# 实时事件流票据的有效期（秒），只需覆盖从换取票据到建立连接的时间
+EVENT_TICKET_TTL_SECONDS = int(os.getenv("EVENT_TICKET_TTL_SECONDS", "30"))
+
+# 运维指标接口（/api/metrics）的访问令牌，不设置时关闭该接口
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # HTTP Bearer认证
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+
+class Principal(NamedTuple):
+    """已认证用户的轻量表示，不绑定数据库会话"""
+    id: int
+    username: str
+    email: str
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, username=user.username, email=user.email, created_at=user.created_at)
+
+
+class PrincipalCache:
+    """令牌 -> Principal 的 LRU 缓存，条目在 TTL 或令牌过期后失效"""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL_SECONDS, max_size: int = AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, principal: Principal, token_expires_at: Optional[float] = None) -> None:
+        """token_expires_at: 令牌的 exp（Unix 时间戳），缓存不会超过令牌有效期"""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        ttl = self.ttl
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+            if ttl <= 0:
+                return
+        with self._lock:
+            self._entries[token] = (time.monotonic() + ttl, principal)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """删除该用户的所有缓存令牌"""
+        with self._lock:
+            stale = [token for token, (_, principal) in self._entries.items() if principal.id == user_id]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_principal(mapper, connection, target: User) -> None:
+    """用户信息变更或删除后，已缓存的令牌需要重新查库"""
+    principal_cache.invalidate_user(target.id)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
-    # bcrypt限制密码最多72字节
-    if len(plain_password.encode('utf-8')) > 72:
-        plain_password = plain_password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    return pwd_context.verify(plain_password, hashed_password)
+    """验证密码（同步执行，请求处理中使用 password_hasher.verify）"""
+    return check_password(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """获取密码哈希"""
-    # bcrypt限制密码最多72字节，超过的部分截断
-    if len(password.encode('utf-8')) > 72:
-        password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    return pwd_context.hash(password)
+    """获取密码哈希（同步执行，请求处理中使用 password_hasher.hash）"""
+    return hash_password(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -51,11 +137,48 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+def create_user_token(user) -> str:
+    """为用户创建访问令牌，令牌中携带用户ID"""
+    return create_access_token(data={"sub": user.username, "uid": user.id})
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Principal:
     """获取当前登录用户"""
+    return await principal_from_token(credentials.credentials)
+
+
+def require_metrics_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> None:
+    """
+    运维指标接口的访问检查
+
+    指标中有进程 PID、主进程状态和队列情况，不对外公开：未设置 METRICS_TOKEN 时
+    接口返回 404；设置后需要带 Authorization: Bearer <METRICS_TOKEN>。
+    """
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(credentials.credentials, METRICS_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无法验证凭证",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def principal_from_token(token: str) -> Principal:
+    """
+    验证令牌并返回对应的用户，无效时抛出 401
+
+    已验证过的令牌直接从缓存返回；未命中时解码令牌并按用户ID查库
+    （旧令牌没有 uid 时按用户名查询）。
+    """
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭证",
@@ -63,27 +186,82 @@ def get_current_user(
     )
     
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
+        user_id = payload.get("uid")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    async with AsyncSessionLocal() as db:
+        if user_id is not None:
+            user = await db.get(User, user_id)
+        else:
+            user = (await db.execute(select(User).where(User.username == username))).scalars().first()
+    if user is None or user.username != username:
         raise credentials_exception
     
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """验证用户"""
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    """
+    验证用户，密码校验在哈希进程池中执行
+
+    查到用户后先结束事务、把连接还给连接池，再等待密码校验：
+    登录请求集中到达时不会占满连接池、拖慢其他接口。
+    """
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
+    await db.commit()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return None
     return user
 
+
+async def issue_event_ticket(db: AsyncSession, user_id: int, competition_id: int) -> str:
+    """
+    为实时事件流签发一次性票据
+
+    EventSource 不能设置请求头，JWT 放在 URL 中会被访问日志、代理和浏览器历史记录下来；
+    票据只在 EVENT_TICKET_TTL_SECONDS 内有效、只能用于指定竞赛、使用一次即失效。
+    票据保存在数据库中，多进程部署时可以在任意工作进程上使用。
+    """
+    now = time.time()
+    ticket = secrets.token_urlsafe(32)
+    # 顺带清理过期未使用的票据
+    await db.execute(delete(EventTicket).where(EventTicket.expires_at <= now))
+    db.add(EventTicket(
+        ticket=ticket,
+        user_id=user_id,
+        competition_id=competition_id,
+        expires_at=now + EVENT_TICKET_TTL_SECONDS,
+    ))
+    await db.commit()
+    return ticket
+
+
+async def redeem_event_ticket(db: AsyncSession, ticket: str, competition_id: int) -> int:
+    """使用票据并返回其用户ID；票据不存在、已过期、已使用或不属于该竞赛时抛出 401"""
+    user_id = await db.scalar(
+        select(EventTicket.user_id).where(
+            EventTicket.ticket == ticket,
+            EventTicket.competition_id == competition_id,
+        )
+    )
+    # 删除成功的请求才算使用了票据，同一票据的并发请求只有一个能通过
+    redeemed = (await db.execute(
+        delete(EventTicket).where(EventTicket.ticket == ticket, EventTicket.expires_at > time.time())
+    )).rowcount
+    await db.commit()
+    if user_id is None or not redeemed:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="实时事件票据无效或已过期",
+        )
+    return user_id
@@ -1,11 +1,13 @@
 """
-CCI 竞赛的机器学习基线（纯 Python 实现）
+CCI 竞赛的机器学习基线（NumPy 向量化实现）
 
 思路：
 1. 读取 train / val / test 三个数据集
 2. 在训练集中为每个节点统计正/负边次数与比例
-3. 将这些节点统计值组合成边的特征
+3. 将这些节点统计值组合成边的特征；数据集目录中有 h5ad 表达矩阵时，
+   再拼接配体-受体共表达与空间距离特征（见 cci_spatial_features.py）
 4. 使用简单的梯度下降 Logistic Regression 进行训练
+   （默认全量梯度；指定 batch_size 时使用小批量随机梯度下降）
 5. 在验证集上打印 Accuracy / F1
 6. 使用 train+val 重新训练，并对测试集生成提交文件
 """
@@ -13,13 +15,19 @@ CCI 竞赛的机器学习基线（纯 Python 实现）
 from __future__ import annotations
 
 import csv
-import math
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cci_spatial_features import spatial_featurizer
 
 Edge = Tuple[int, int, int]
 EdgeNoLabel = Tuple[int, int]
-NodeStats = Dict[int, Dict[str, float]]
+
+# 边特征的维数（见 build_edge_features）
+N_EDGE_FEATURES = 17
 
 
 def read_edges(path: Path, expect_label: bool = True) -> List[Edge]:
@@ -48,151 +56,202 @@ def read_edges_without_label(path: Path) -> List[EdgeNoLabel]:
     return edges
 
 
+@dataclass
+class NodeStats:
+    """
+    按节点编号索引的正/负边计数（节点编号是从 0 开始的稠密整数）
+
+    训练集中没有出现过的节点（包括超出数组范围的编号）各项统计均为 0。
+    """
+
+    pos: np.ndarray
+    neg: np.ndarray
+    total: np.ndarray
+    pos_ratio: np.ndarray
+    neg_ratio: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.total)
+
+    def __contains__(self, node: int) -> bool:
+        return 0 <= node < len(self.total) and self.total[node] > 0
+
+    def gather(self, nodes: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """批量取出节点的 (pos, neg, total, pos_ratio) ，未知节点为 0"""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        known = (nodes >= 0) & (nodes < len(self.total))
+        index = np.where(known, nodes, 0)
+        return tuple(
+            np.where(known, column[index], 0.0)
+            for column in (self.pos, self.neg, self.total, self.pos_ratio)
+        )
+
+
 def compute_node_stats(edges: Sequence[Edge]) -> NodeStats:
-    stats: NodeStats = {}
-    for source, target, label in edges:
-        for node in (source, target):
-            entry = stats.setdefault(node, {"pos": 0.0, "neg": 0.0})
-            if label == 1:
-                entry["pos"] += 1.0
-            else:
-                entry["neg"] += 1.0
-    for entry in stats.values():
-        total = entry["pos"] + entry["neg"]
-        entry["total"] = total
-        entry["pos_ratio"] = entry["pos"] / total if total > 0 else 0.0
-        entry["neg_ratio"] = entry["neg"] / total if total > 0 else 0.0
-    return stats
+    edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 3)
+    sources, targets, labels = edge_array[:, 0], edge_array[:, 1], edge_array[:, 2]
+    n_nodes = int(edge_array[:, :2].max()) + 1 if len(edge_array) else 0
+
+    # 每条边给两个端点各计一次（自环计两次）
+    nodes = np.concatenate([sources, targets])
+    positive = np.concatenate([labels == 1, labels == 1])
+    pos = np.bincount(nodes, weights=positive, minlength=n_nodes)
+    neg = np.bincount(nodes, weights=~positive, minlength=n_nodes)
+
+    total = pos + neg
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pos_ratio = np.where(total > 0, pos / total, 0.0)
+        neg_ratio = np.where(total > 0, neg / total, 0.0)
+    return NodeStats(pos=pos, neg=neg, total=total, pos_ratio=pos_ratio, neg_ratio=neg_ratio)
 
 
 def get_node_info(stats: NodeStats, node: int) -> Dict[str, float]:
     if node in stats:
-        return stats[node]
+        return {
+            "pos": float(stats.pos[node]),
+            "neg": float(stats.neg[node]),
+            "total": float(stats.total[node]),
+            "pos_ratio": float(stats.pos_ratio[node]),
+            "neg_ratio": float(stats.neg_ratio[node]),
+        }
     return {"pos": 0.0, "neg": 0.0, "total": 0.0, "pos_ratio": 0.0, "neg_ratio": 0.0}
 
 
-def build_edge_features(edges: Sequence[Tuple[int, int]], stats: NodeStats) -> List[List[float]]:
-    features: List[List[float]] = []
-    for source, target in edges:
-        src = get_node_info(stats, source)
-        tgt = get_node_info(stats, target)
-        src_total = src["total"]
-        tgt_total = tgt["total"]
-        src_pos_ratio = src["pos_ratio"]
-        tgt_pos_ratio = tgt["pos_ratio"]
-
-        feature_vector = [
-            src_total,
-            tgt_total,
-            src["pos"],
-            tgt["pos"],
-            src["neg"],
-            tgt["neg"],
-            src_pos_ratio,
-            tgt_pos_ratio,
-            (src_pos_ratio + tgt_pos_ratio) / 2.0,
-            src_pos_ratio - tgt_pos_ratio,
-            src_pos_ratio * tgt_pos_ratio,
-            src_total + tgt_total,
-            src_total - tgt_total,
-            src_total * tgt_total,
-            min(src_total, tgt_total),
-            max(src_total, tgt_total),
-            1.0 if source == target else 0.0,
-        ]
-        features.append(feature_vector)
+def build_edge_features(edges: Sequence[Tuple[int, int]], stats: NodeStats) -> np.ndarray:
+    """一次性为所有边构造 (E, 17) 的 float32 特征矩阵"""
+    edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    sources, targets = edge_array[:, 0], edge_array[:, 1]
+    src_pos, src_neg, src_total, src_pos_ratio = stats.gather(sources)
+    tgt_pos, tgt_neg, tgt_total, tgt_pos_ratio = stats.gather(targets)
+
+    features = np.empty((len(edge_array), N_EDGE_FEATURES), dtype=np.float32)
+    features[:, 0] = src_total
+    features[:, 1] = tgt_total
+    features[:, 2] = src_pos
+    features[:, 3] = tgt_pos
+    features[:, 4] = src_neg
+    features[:, 5] = tgt_neg
+    features[:, 6] = src_pos_ratio
+    features[:, 7] = tgt_pos_ratio
+    features[:, 8] = (src_pos_ratio + tgt_pos_ratio) / 2.0
+    features[:, 9] = src_pos_ratio - tgt_pos_ratio
+    features[:, 10] = src_pos_ratio * tgt_pos_ratio
+    features[:, 11] = src_total + tgt_total
+    features[:, 12] = src_total - tgt_total
+    features[:, 13] = src_total * tgt_total
+    features[:, 14] = np.minimum(src_total, tgt_total)
+    features[:, 15] = np.maximum(src_total, tgt_total)
+    features[:, 16] = sources == targets
+    return features
+
+
+def build_features(
+    edges: Sequence[Tuple[int, int]],
+    stats: NodeStats,
+    spatial: Optional[Callable[[Sequence[Tuple[int, int]]], np.ndarray]] = None,
+) -> np.ndarray:
+    """图结构特征，提供 spatial 时在右侧拼接空间转录组特征"""
+    features = build_edge_features(edges, stats)
+    if spatial is not None:
+        features = np.hstack([features, spatial(edges)])
     return features
 
 
 def standardize(
-    features: List[List[float]],
-    mean: List[float] | None = None,
-    std: List[float] | None = None,
-) -> Tuple[List[List[float]], List[float], List[float]]:
-    if not features:
+    features,
+    mean=None,
+    std=None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按列标准化，返回 (标准化后的矩阵, 均值, 标准差)；方差接近 0 的列标准差取 1"""
+    features = np.asarray(features, dtype=np.float64)
+    if features.size == 0:
         raise ValueError("Features list is empty")
-    n_samples = len(features)
-    n_features = len(features[0])
     if mean is None:
-        mean = [0.0] * n_features
-        for j in range(n_features):
-            mean[j] = sum(sample[j] for sample in features) / n_samples
+        mean = features.mean(axis=0)
     if std is None:
-        std = [0.0] * n_features
-        for j in range(n_features):
-            variance = sum((sample[j] - mean[j]) ** 2 for sample in features) / n_samples
-            std[j] = math.sqrt(variance)
-            if std[j] < 1e-6:
-                std[j] = 1.0
-    normalized = []
-    for sample in features:
-        normalized.append([(sample[j] - mean[j]) / std[j] for j in range(n_features)])
-    return normalized, mean, std
+        std = features.std(axis=0)
+        std = np.where(std < 1e-6, 1.0, std)
+    mean = np.asarray(mean, dtype=np.float64)
+    std = np.asarray(std, dtype=np.float64)
+    return (features - mean) / std, mean, std
 
 
-def dot_product(a: Sequence[float], b: Sequence[float]) -> float:
-    return sum(x * y for x, y in zip(a, b))
+def sigmoid(z):
+    """数值稳定的 sigmoid，支持标量和数组"""
+    z = np.asarray(z, dtype=np.float64)
+    exp_neg_abs = np.exp(-np.abs(z))
+    out = np.where(z >= 0, 1.0 / (1.0 + exp_neg_abs), exp_neg_abs / (1.0 + exp_neg_abs))
+    return out if out.ndim else float(out)
 
 
-def sigmoid(z: float) -> float:
-    if z >= 0:
-        exp_neg = math.exp(-z)
-        return 1.0 / (1.0 + exp_neg)
-    exp_pos = math.exp(z)
-    return exp_pos / (1.0 + exp_pos)
+def log_loss(pred: np.ndarray, labels: np.ndarray, weights: np.ndarray, l2: float) -> float:
+    """对数损失 + L2 正则"""
+    loss = -(labels * np.log(pred + 1e-9) + (1 - labels) * np.log(1 - pred + 1e-9)).mean()
+    return float(loss + (l2 / 2.0) * np.dot(weights, weights))
 
 
 def train_logistic_regression(
-    features: List[List[float]],
+    features,
     labels: Sequence[int],
     learning_rate: float = 0.05,
     epochs: int = 300,
     l2: float = 1e-4,
-) -> Tuple[List[float], float]:
-    n_samples = len(features)
-    n_features = len(features[0])
-    weights = [0.0] * n_features
+    batch_size: Optional[int] = None,
+    seed: int = 0,
+    verbose: bool = True,
+) -> Tuple[np.ndarray, float]:
+    """
+    梯度下降训练 Logistic Regression，返回 (weights, bias)
+
+    batch_size 为 None 时每个 epoch 用全部样本计算一次梯度；
+    否则每个 epoch 打乱样本后按 batch_size 分批更新（小批量 SGD）。
+    """
+    X = np.asarray(features, dtype=np.float64)
+    y = np.asarray(labels, dtype=np.float64)
+    n_samples, n_features = X.shape
+    weights = np.zeros(n_features, dtype=np.float64)
     bias = 0.0
+    rng = np.random.default_rng(seed)
+
+    full_batch = batch_size is None or batch_size >= n_samples
 
     for epoch in range(epochs):
-        grad_w = [0.0] * n_features
-        grad_b = 0.0
-        loss = 0.0
-
-        for x, y in zip(features, labels):
-            z = dot_product(weights, x) + bias
-            pred = sigmoid(z)
-            error = pred - y
-            for j in range(n_features):
-                grad_w[j] += error * x[j]
-            grad_b += error
-
-            # 对数损失
-            loss += -(y * math.log(pred + 1e-9) + (1 - y) * math.log(1 - pred + 1e-9))
-
-        # 平均梯度 + L2 正则
-        for j in range(n_features):
-            grad_w[j] = grad_w[j] / n_samples + l2 * weights[j]
-        grad_b /= n_samples
-        loss = loss / n_samples + (l2 / 2.0) * sum(w * w for w in weights)
-
-        # 参数更新
-        for j in range(n_features):
-            weights[j] -= learning_rate * grad_w[j]
-        bias -= learning_rate * grad_b
-
-        if epoch % 50 == 0 or epoch == epochs - 1:
+        report = verbose and (epoch % 50 == 0 or epoch == epochs - 1)
+        if full_batch:
+            batches = (slice(None),)
+        else:
+            order = rng.permutation(n_samples)
+            batches = [order[i:i + batch_size] for i in range(0, n_samples, batch_size)]
+
+        for batch in batches:
+            X_batch = X[batch]
+            pred = sigmoid(X_batch @ weights + bias)
+            error = pred - y[batch]
+
+            # 平均梯度 + L2 正则
+            grad_w = X_batch.T @ error / len(error) + l2 * weights
+            grad_b = error.mean()
+            if report and full_batch:
+                loss = log_loss(pred, y, weights, l2)
+
+            # 参数更新
+            weights -= learning_rate * grad_w
+            bias -= learning_rate * grad_b
+
+        if report:
+            if not full_batch:
+                loss = log_loss(sigmoid(X @ weights + bias), y, weights, l2)
             print(f"Epoch {epoch:3d} | loss={loss:.4f}")
 
     return weights, bias
 
 
-def predict_probabilities(features: List[List[float]], weights: Sequence[float], bias: float) -> List[float]:
-    return [sigmoid(dot_product(weights, x) + bias) for x in features]
+def predict_probabilities(features, weights, bias: float) -> np.ndarray:
+    return sigmoid(np.asarray(features, dtype=np.float64) @ np.asarray(weights, dtype=np.float64) + bias)
 
 
-def predict_labels(probs: Iterable[float], threshold: float = 0.5) -> List[int]:
-    return [1 if p >= threshold else 0 for p in probs]
+def predict_labels(probs: Iterable[float], threshold: float = 0.5) -> np.ndarray:
+    return (np.asarray(probs) >= threshold).astype(np.int64)
 
 
 def compute_metrics(y_true: Sequence[int], y_pred: Sequence[int]) -> Tuple[float, float]:
@@ -221,17 +280,18 @@ def main() -> None:
     train_edges = read_edges(dataset_dir / "train_edges.csv", expect_label=True)
     val_edges = read_edges(dataset_dir / "val_edges.csv", expect_label=True)
     test_edges = read_edges_without_label(dataset_dir / "test_edges.csv")
+    spatial = spatial_featurizer(dataset_dir)
 
     # 训练阶段：仅用训练集统计节点特征
     train_stats = compute_node_stats(train_edges)
-    train_features = build_edge_features([(s, t) for s, t, _ in train_edges], train_stats)
+    train_features = build_features([(s, t) for s, t, _ in train_edges], train_stats, spatial)
     train_labels = [label for _, _, label in train_edges]
 
     train_features_std, mean, std = standardize(train_features)
     weights, bias = train_logistic_regression(train_features_std, train_labels)
 
     # 验证集评估
-    val_features = build_edge_features([(s, t) for s, t, _ in val_edges], train_stats)
+    val_features = build_features([(s, t) for s, t, _ in val_edges], train_stats, spatial)
     val_features_std, _, _ = standardize(val_features, mean=mean, std=std)
     val_labels = [label for _, _, label in val_edges]
     val_probs = predict_probabilities(val_features_std, weights, bias)
@@ -242,13 +302,13 @@ def main() -> None:
     # 使用 train + val 重新训练
     full_edges = train_edges + val_edges
     full_stats = compute_node_stats(full_edges)
-    full_features = build_edge_features([(s, t) for s, t, _ in full_edges], full_stats)
+    full_features = build_features([(s, t) for s, t, _ in full_edges], full_stats, spatial)
     full_labels = [label for _, _, label in full_edges]
     full_features_std, full_mean, full_std = standardize(full_features)
     final_weights, final_bias = train_logistic_regression(full_features_std, full_labels)
 
     # 生成测试集预测
-    test_features = build_edge_features(test_edges, full_stats)
+    test_features = build_features(test_edges, full_stats, spatial)
     test_features_std, _, _ = standardize(test_features, mean=full_mean, std=full_std)
     test_probs = predict_probabilities(test_features_std, final_weights, final_bias)
     test_preds = predict_labels(test_probs, threshold=0.5)
@@ -0,0 +1,238 @@
+"""
+CCI 基线的超参数与阈值并行搜索
+
+在进程池中评估 learning_rate / epochs / l2 / batch_size 的网格或随机组合：
+1. 标准化后的训练集、验证集特征矩阵只在主进程计算一次，
+   通过进程池 initializer 传给每个工作进程，所有试验共用
+2. 每次试验在训练集上训练，在 val_edges.csv 上选出使平台加权得分
+   （与 backend/scoring_core.py 的 final_score 公式相同）最高的阈值
+3. 所有试验的结果按得分排序写入 CSV 表格
+
+用法：
+    python cci_search.py [--mode grid|random] [--trials 50] [--workers 8] [--output cci_search_results.csv]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cci_ml_baseline import (
+    build_features,
+    compute_node_stats,
+    predict_probabilities,
+    read_edges,
+    standardize,
+    train_logistic_regression,
+)
+from cci_spatial_features import spatial_featurizer
+
+# 平台评分的权重。本脚本在 baselines/ 目录中独立运行，不导入后端模块，
+# 与 backend/scoring_core.py 的 SCORE_WEIGHTS 相同（由 tests/test_cci_baselines.py 检查）
+SCORE_WEIGHTS = {
+    "accuracy": 0.3,
+    "precision": 0.2,
+    "recall": 0.2,
+    "f1": 0.3,
+}
+
+DEFAULT_GRID = {
+    "learning_rate": [0.01, 0.05, 0.1, 0.3],
+    "epochs": [100, 300, 600],
+    "l2": [0.0, 1e-4, 1e-3, 1e-2],
+    "batch_size": [None],
+}
+
+RESULT_COLUMNS = [
+    "learning_rate", "epochs", "l2", "batch_size", "threshold",
+    "final_score", "accuracy", "precision", "recall", "f1", "final_score_at_0.5", "seconds",
+]
+
+# 工作进程中缓存的特征矩阵：(X_train, y_train, X_val, y_val)
+_DATA: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+
+
+def load_matrices(dataset_dir: Path) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """与 cci_ml_baseline.main 相同的训练/验证特征（只用训练集统计节点特征）"""
+    train_edges = read_edges(dataset_dir / "train_edges.csv", expect_label=True)
+    val_edges = read_edges(dataset_dir / "val_edges.csv", expect_label=True)
+
+    spatial = spatial_featurizer(dataset_dir)
+    train_stats = compute_node_stats(train_edges)
+    X_train, mean, std = standardize(build_features([(s, t) for s, t, _ in train_edges], train_stats, spatial))
+    X_val, _, _ = standardize(build_features([(s, t) for s, t, _ in val_edges], train_stats, spatial), mean=mean, std=std)
+    y_train = np.array([label for _, _, label in train_edges], dtype=np.int64)
+    y_val = np.array([label for _, _, label in val_edges], dtype=np.int64)
+    return X_train, y_train, X_val, y_val
+
+
+def weighted_score(accuracy, precision, recall, f1):
+    """平台的加权得分，参数可以是标量或 numpy 数组"""
+    return (
+        accuracy * SCORE_WEIGHTS["accuracy"]
+        + precision * SCORE_WEIGHTS["precision"]
+        + recall * SCORE_WEIGHTS["recall"]
+        + f1 * SCORE_WEIGHTS["f1"]
+    )
+
+
+def compute_metrics(tp: int, tn: int, fp: int, fn: int) -> Dict:
+    """根据混淆矩阵计算各项指标和平台的加权得分"""
+    total = tp + tn + fp + fn
+    accuracy = (tp + tn) / total if total > 0 else 0.0
+    precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
+    recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
+    final_score = weighted_score(accuracy, precision, recall, f1)
+    return {"accuracy": accuracy, "precision": precision, "recall": recall, "f1": f1, "final_score": final_score}
+
+
+def best_threshold(y_true: np.ndarray, probs: np.ndarray) -> Tuple[float, Dict]:
+    """
+    找出使加权得分最高的阈值（预测规则 prob >= threshold）
+
+    按概率降序排列后，每个不同的概率值都是一个候选阈值，
+    各候选的混淆矩阵由累加和一次算出。
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    probs = np.asarray(probs, dtype=np.float64)
+    order = np.argsort(-probs, kind="stable")
+    p_sorted = probs[order]
+    y_sorted = y_true[order]
+
+    # 每组相同概率的最后一个位置：阈值取该概率时前 idx+1 个样本预测为正
+    idx = np.flatnonzero(np.r_[p_sorted[1:] != p_sorted[:-1], True])
+    tp = np.cumsum(y_sorted)[idx]
+    fp = (idx + 1) - tp
+    positives = int(y_true.sum())
+    negatives = len(y_true) - positives
+    fn = positives - tp
+    tn = negatives - fp
+
+    total = len(y_true)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy = (tp + tn) / total
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / np.maximum(tp + fn, 1), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    scores = weighted_score(accuracy, precision, recall, f1)
+
+    best = int(np.argmax(scores))
+    metrics = compute_metrics(int(tp[best]), int(tn[best]), int(fp[best]), int(fn[best]))
+    return float(p_sorted[idx[best]]), metrics
+
+
+def score_at(y_true: np.ndarray, probs: np.ndarray, threshold: float) -> Dict:
+    y_pred = (probs >= threshold).astype(np.int64)
+    counts = np.bincount(y_true * 2 + y_pred, minlength=4)
+    return compute_metrics(tp=int(counts[3]), tn=int(counts[0]), fp=int(counts[1]), fn=int(counts[2]))
+
+
+def _init_worker(X_train, y_train, X_val, y_val) -> None:
+    global _DATA
+    _DATA = (X_train, y_train, X_val, y_val)
+
+
+def run_trial(params: Dict) -> Dict:
+    """在工作进程中训练一组参数并选阈值"""
+    X_train, y_train, X_val, y_val = _DATA
+    started = time.perf_counter()
+    weights, bias = train_logistic_regression(
+        X_train,
+        y_train,
+        learning_rate=params["learning_rate"],
+        epochs=params["epochs"],
+        l2=params["l2"],
+        batch_size=params["batch_size"],
+        verbose=False,
+    )
+    probs = predict_probabilities(X_val, weights, bias)
+    threshold, metrics = best_threshold(y_val, probs)
+    return {
+        **params,
+        "threshold": threshold,
+        "final_score": metrics["final_score"],
+        "accuracy": metrics["accuracy"],
+        "precision": metrics["precision"],
+        "recall": metrics["recall"],
+        "f1": metrics["f1"],
+        "final_score_at_0.5": score_at(y_val, probs, 0.5)["final_score"],
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def grid_trials(grid: Dict[str, List]) -> List[Dict]:
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def random_trials(n: int, seed: int = 0) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(n):
+        batch_size = rng.choice([0, 64, 256, 1024])
+        trials.append({
+            "learning_rate": float(10 ** rng.uniform(-3, 0)),
+            "epochs": int(rng.integers(50, 1001)),
+            "l2": float(10 ** rng.uniform(-6, -1)),
+            "batch_size": int(batch_size) if batch_size else None,
+        })
+    return trials
+
+
+def run_search(dataset_dir: Path, trials: List[Dict], workers: Optional[int] = None) -> List[Dict]:
+    """并行评估所有试验，按 final_score 降序返回"""
+    matrices = load_matrices(dataset_dir)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=matrices) as pool:
+        results = list(pool.map(run_trial, trials))
+    results.sort(key=lambda r: r["final_score"], reverse=True)
+    return results
+
+
+def write_results(results: List[Dict], output_path: Path) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow({key: result[key] for key in RESULT_COLUMNS})
+
+
+def print_results(results: List[Dict], top: int = 10) -> None:
+    print(f"{'lr':>8} {'epochs':>6} {'l2':>8} {'batch':>6} {'thresh':>7} {'score':>7} {'@0.5':>7}")
+    for r in results[:top]:
+        batch = r["batch_size"] if r["batch_size"] else "full"
+        print(f"{r['learning_rate']:8.4f} {r['epochs']:6d} {r['l2']:8.1e} {batch:>6} "
+              f"{r['threshold']:7.4f} {r['final_score']:7.4f} {r['final_score_at_0.5']:7.4f}")
+
+
+def main() -> None:
+    repo_root = Path(__file__).resolve().parents[2]
+    parser = argparse.ArgumentParser(description="CCI 基线超参数与阈值搜索")
+    parser.add_argument("--mode", choices=["grid", "random"], default="grid")
+    parser.add_argument("--trials", type=int, default=50, help="随机搜索的试验次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数（默认CPU核数）")
+    parser.add_argument("--output", type=Path, default=Path("cci_search_results.csv"))
+    args = parser.parse_args()
+
+    trials = grid_trials(DEFAULT_GRID) if args.mode == "grid" else random_trials(args.trials, args.seed)
+    started = time.perf_counter()
+    results = run_search(repo_root / "cci test" / "dataset", trials, args.workers)
+    write_results(results, args.output)
+
+    print_results(results)
+    print(f"✅ {len(results)} 组参数搜索完成（{time.perf_counter() - started:.1f}s），结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
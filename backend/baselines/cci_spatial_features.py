@@ -0,0 +1,292 @@
+"""
+CCI 空间转录组特征：配体-受体共表达与空间距离
+
+README 中的 h5ad 表达矩阵有 4,898 个细胞 × 36,601 个基因，这里只保留
+celltalk_human_lr_pair.txt 中出现的配体/受体基因，始终以稀疏 CSR 矩阵处理，不会展开成稠密矩阵：
+
+1. 表达矩阵取 log1p 后按 L-R 对拆成两个 (细胞 × L-R对) 矩阵：配体表达 L、受体表达 R
+2. 边 (source, target) 的共表达为 L[source] ⊙ R[target]，按批次对整批边做稀疏逐元素乘法，
+   汇总为总分、激活的 L-R 对数、最大值；反方向 (target → source) 同样计算
+3. 空间坐标建 KD-tree，得到边的距离（以相邻 spot 间距为单位）、是否互为近邻、两端细胞的邻域密度
+
+精简后的表达矩阵和每组边的特征都缓存在磁盘上，键为输入文件和边列表的哈希，
+输入不变时直接读取缓存。
+
+依赖 anndata 和 scipy（可选）：pip install anndata scipy
+
+用法：
+    python cci_spatial_features.py [--h5ad path/to/file.h5ad]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import importlib.util
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+H5AD_NAME = "Visium_Human_Breast_Cancer_filtered_feature_bc_matrix.h5ad"
+LR_PAIR_NAME = "celltalk_human_lr_pair.txt"
+
+# 特征格式变化时增加，使旧缓存失效
+FEATURE_VERSION = 1
+
+# 每批计算共表达的边数
+BATCH_SIZE = 20000
+
+# Visium spot 为六边形排列，每个 spot 有 6 个直接相邻的 spot
+NEIGHBOR_K = 6
+# 邻域密度的半径（相邻 spot 间距的倍数）
+DENSITY_RADIUS = 3.0
+
+COEXPRESSION_FEATURE_NAMES = [
+    "lr_score", "lr_active_pairs", "lr_max",
+    "rl_score", "rl_active_pairs", "rl_max",
+]
+SPATIAL_FEATURE_NAMES = [
+    "distance", "log_distance", "is_neighbor", "source_density", "target_density",
+]
+FEATURE_NAMES = COEXPRESSION_FEATURE_NAMES + SPATIAL_FEATURE_NAMES
+
+
+def _require_scipy():
+    try:
+        from scipy import sparse
+        from scipy.spatial import cKDTree
+    except ImportError as exc:
+        raise ImportError("空间特征需要 scipy: pip install scipy") from exc
+    return sparse, cKDTree
+
+
+def _file_key(path: Path) -> str:
+    stat = path.stat()
+    return f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _digest(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def load_lr_pairs(path: Path) -> List[Tuple[str, str]]:
+    """读取 celltalk 表中的 (配体基因, 受体基因)，去重并保持原顺序"""
+    pairs = []
+    seen = set()
+    with Path(path).open("r", newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            pair = (row["ligand_gene_symbol"], row["receptor_gene_symbol"])
+            if pair not in seen:
+                seen.add(pair)
+                pairs.append(pair)
+    return pairs
+
+
+@dataclass
+class SpatialData:
+    """只含 L-R 基因的表达矩阵与空间坐标"""
+
+    ligand: sparse.csr_matrix    # (细胞, L-R对) 配体表达
+    receptor: sparse.csr_matrix  # (细胞, L-R对) 受体表达
+    coords: np.ndarray           # (细胞, 2)
+    pairs: List[Tuple[str, str]] # 两个基因都在表达矩阵中的 L-R 对
+
+    @property
+    def n_cells(self) -> int:
+        return self.coords.shape[0]
+
+
+def _read_h5ad(h5ad_path: Path, lr_pairs: Sequence[Tuple[str, str]]) -> SpatialData:
+    sparse, _ = _require_scipy()
+    try:
+        import anndata
+    except ImportError as exc:
+        raise ImportError("读取 h5ad 需要 anndata: pip install anndata") from exc
+
+    adata = anndata.read_h5ad(h5ad_path)
+    gene_index = {gene: i for i, gene in enumerate(adata.var_names)}
+    kept = [(lig, rec) for lig, rec in lr_pairs if lig in gene_index and rec in gene_index]
+    if not kept:
+        raise ValueError("表达矩阵中没有找到任何配体-受体基因")
+
+    # 先按列取出 L-R 基因，后续只在这几百列上计算
+    genes = sorted({gene_index[gene] for pair in kept for gene in pair})
+    local = {gene: j for j, gene in enumerate(genes)}
+    expression = sparse.csr_matrix(adata.X)[:, genes].astype(np.float32)
+    expression.data = np.log1p(expression.data)
+
+    ligand_cols = [local[gene_index[lig]] for lig, _ in kept]
+    receptor_cols = [local[gene_index[rec]] for _, rec in kept]
+    return SpatialData(
+        ligand=expression[:, ligand_cols].tocsr(),
+        receptor=expression[:, receptor_cols].tocsr(),
+        coords=np.asarray(adata.obsm["spatial"], dtype=np.float64)[:, :2],
+        pairs=kept,
+    )
+
+
+def load_spatial_data(h5ad_path: Path, lr_path: Path, cache_dir: Optional[Path] = None) -> SpatialData:
+    """读取精简后的表达矩阵；有缓存时不再解析 h5ad"""
+    sparse, _ = _require_scipy()
+    lr_pairs = load_lr_pairs(lr_path)
+    cache_path = None
+    if cache_dir is not None:
+        key = _digest(FEATURE_VERSION, _file_key(h5ad_path), _file_key(lr_path))
+        cache_path = Path(cache_dir) / f"lr_expression_{key}.npz"
+        if cache_path.exists():
+            with np.load(cache_path, allow_pickle=False) as cached:
+                shape = tuple(cached["shape"])
+                return SpatialData(
+                    ligand=sparse.csr_matrix((cached["ligand_data"], cached["ligand_indices"], cached["ligand_indptr"]), shape=shape),
+                    receptor=sparse.csr_matrix((cached["receptor_data"], cached["receptor_indices"], cached["receptor_indptr"]), shape=shape),
+                    coords=cached["coords"],
+                    pairs=[tuple(pair.split("\t")) for pair in cached["pairs"].tolist()],
+                )
+
+    data = _read_h5ad(h5ad_path, lr_pairs)
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(cache_path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            shape=np.asarray(data.ligand.shape),
+            ligand_data=data.ligand.data, ligand_indices=data.ligand.indices, ligand_indptr=data.ligand.indptr,
+            receptor_data=data.receptor.data, receptor_indices=data.receptor.indices, receptor_indptr=data.receptor.indptr,
+            coords=data.coords,
+            pairs=np.asarray([f"{lig}\t{rec}" for lig, rec in data.pairs]),
+        )
+        os.replace(tmp, cache_path)
+    return data
+
+
+def coexpression_features(data: SpatialData, sources: np.ndarray, targets: np.ndarray, batch_size: int = BATCH_SIZE) -> np.ndarray:
+    """(E, 6) 的 L-R 共表达特征，按批次做稀疏逐元素乘法"""
+    features = np.zeros((len(sources), len(COEXPRESSION_FEATURE_NAMES)), dtype=np.float32)
+    for start in range(0, len(sources), batch_size):
+        batch = slice(start, start + batch_size)
+        src, tgt = sources[batch], targets[batch]
+        for offset, (lig_cells, rec_cells) in enumerate(((src, tgt), (tgt, src))):
+            product = data.ligand[lig_cells].multiply(data.receptor[rec_cells]).tocsr()
+            product.eliminate_zeros()
+            col = offset * 3
+            features[batch, col] = np.asarray(product.sum(axis=1)).ravel()
+            features[batch, col + 1] = np.diff(product.indptr)
+            features[batch, col + 2] = product.max(axis=1).toarray().ravel()
+    return features
+
+
+def spatial_features(coords: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """(E, 5) 的空间特征：距离以最近邻间距的中位数为单位"""
+    _, cKDTree = _require_scipy()
+    tree = cKDTree(coords)
+    k = min(NEIGHBOR_K + 1, len(coords))
+    neighbor_dist, neighbors = tree.query(coords, k=k)
+    spacing = float(np.median(neighbor_dist[:, 1])) if k > 1 else 1.0
+    spacing = spacing if spacing > 0 else 1.0
+
+    distance = np.linalg.norm(coords[sources] - coords[targets], axis=1) / spacing
+    is_neighbor = (neighbors[sources, 1:] == targets[:, None]).any(axis=1)
+    density = tree.query_ball_point(coords, r=DENSITY_RADIUS * spacing, return_length=True) - 1
+
+    return np.column_stack([
+        distance,
+        np.log1p(distance),
+        is_neighbor,
+        density[sources],
+        density[targets],
+    ]).astype(np.float32)
+
+
+def featurize(data: SpatialData, edges: Sequence[Tuple[int, int]]) -> np.ndarray:
+    """(E, 11) 特征矩阵，列顺序见 FEATURE_NAMES"""
+    pairs = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    sources, targets = pairs[:, 0], pairs[:, 1]
+    if len(pairs) and max(sources.max(), targets.max()) >= data.n_cells:
+        raise ValueError(f"边中的细胞编号超出表达矩阵范围（{data.n_cells} 个细胞）")
+    return np.hstack([
+        coexpression_features(data, sources, targets),
+        spatial_features(data.coords, sources, targets),
+    ])
+
+
+class SpatialFeaturizer:
+    """按边列表计算空间特征，结果按 (输入文件, 边列表) 缓存到磁盘"""
+
+    def __init__(self, h5ad_path: Path, lr_path: Path, cache_dir: Path):
+        self.h5ad_path = Path(h5ad_path)
+        self.lr_path = Path(lr_path)
+        self.cache_dir = Path(cache_dir)
+        self._data: Optional[SpatialData] = None
+
+    @property
+    def data(self) -> SpatialData:
+        if self._data is None:
+            self._data = load_spatial_data(self.h5ad_path, self.lr_path, self.cache_dir)
+        return self._data
+
+    def __call__(self, edges: Sequence[Tuple[int, int]]) -> np.ndarray:
+        pairs = np.ascontiguousarray(np.asarray(edges, dtype=np.int64).reshape(-1, 2))
+        key = _digest(FEATURE_VERSION, _file_key(self.h5ad_path), _file_key(self.lr_path), pairs.tobytes())
+        cache_path = self.cache_dir / f"edge_features_{key}.npy"
+        if cache_path.exists():
+            return np.load(cache_path, allow_pickle=False)
+
+        features = featurize(self.data, pairs)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(cache_path.name + ".tmp.npy")
+        np.save(tmp, features)
+        os.replace(tmp, cache_path)
+        return features
+
+
+def spatial_featurizer(dataset_dir: Path, h5ad_path: Optional[Path] = None) -> Optional[Callable[[Sequence[Tuple[int, int]]], np.ndarray]]:
+    """数据集目录中有 h5ad 且依赖已安装时返回特征函数，否则返回 None"""
+    dataset_dir = Path(dataset_dir)
+    h5ad_path = Path(h5ad_path) if h5ad_path is not None else dataset_dir / H5AD_NAME
+    if not h5ad_path.exists():
+        print(f"⚠️  未找到表达矩阵 {h5ad_path.name}，只使用图结构特征")
+        return None
+    missing = [name for name in ("anndata", "scipy") if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"⚠️  未安装 {', '.join(missing)}，只使用图结构特征")
+        return None
+    return SpatialFeaturizer(h5ad_path, dataset_dir / LR_PAIR_NAME, dataset_dir / "feature_cache")
+
+
+def main() -> None:
+    repo_root = Path(__file__).resolve().parents[2]
+    dataset_dir = repo_root / "cci test" / "dataset"
+    parser = argparse.ArgumentParser(description="预先计算 CCI 边的空间转录组特征并写入缓存")
+    parser.add_argument("--h5ad", type=Path, default=None, help=f"表达矩阵路径（默认数据集目录下的 {H5AD_NAME}）")
+    args = parser.parse_args()
+
+    featurizer = spatial_featurizer(dataset_dir, args.h5ad)
+    if featurizer is None:
+        raise SystemExit(1)
+
+    from cci_ml_baseline import read_edges, read_edges_without_label
+
+    started = time.perf_counter()
+    for name in ("train_edges.csv", "val_edges.csv"):
+        edges = [(s, t) for s, t, _ in read_edges(dataset_dir / name, expect_label=True)]
+        features = featurizer(edges)
+        print(f"  {name}: {features.shape}")
+    features = featurizer(read_edges_without_label(dataset_dir / "test_edges.csv"))
+    print(f"  test_edges.csv: {features.shape}")
+    print(f"✅ 空间特征计算完成（{time.perf_counter() - started:.1f}s），{len(featurizer.data.pairs)} 个 L-R 对")
+
+
+if __name__ == "__main__":
+    main()
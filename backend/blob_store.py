@@ -0,0 +1,315 @@
+"""
+提交文件存储 - 按内容寻址、压缩保存的 blob 存储
+
+提交文件按内容的 SHA-256 保存为 {root}/ab/cd/{sha256}.csv.gz：
+- 两级哈希分片，单个目录内的文件数保持在较小规模
+- 写入时透明压缩（默认 gzip；安装 zstandard 后可用 BLOB_COMPRESSION=zstd）
+- 相同内容只保存一份，Submission.content_hash 即为其在存储中的键
+
+compact() 按保留策略清理不再需要的 blob：每个用户在每个竞赛中保留最佳提交
+和最近 N 次提交的文件，等待评分的提交文件始终保留。删除文件不影响提交记录和
+已保存的评分结果。早期直接保存在 submissions/ 下的文件由数据库迁移一次性迁入
+存储（见 import_legacy_files）。
+"""
+import asyncio
+import gzip
+import hashlib
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Set
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import LeaderboardRecord, SessionLocal, Submission
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+BASE_DIR = Path(__file__).resolve().parent
+SUBMISSIONS_DIR = BASE_DIR.parent / "submissions"
+
+# 存储目录与压缩方式
+BLOB_STORE_DIR = Path(os.getenv("BLOB_STORE_DIR") or SUBMISSIONS_DIR / "blobs")
+BLOB_COMPRESSION = os.getenv("BLOB_COMPRESSION", "gzip").lower()
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+
+# 保留策略：每个用户在每个竞赛中保留最近 N 次提交的文件（最佳提交始终保留）
+BLOB_RETENTION_LAST_N = int(os.getenv("BLOB_RETENTION_LAST_N", "5"))
+
+# 后台整理间隔（秒），以及新写入的 blob 在整理时受保护的时间
+BLOB_COMPACTION_INTERVAL = int(os.getenv("BLOB_COMPACTION_INTERVAL", "3600"))
+BLOB_GRACE_SECONDS = int(os.getenv("BLOB_GRACE_SECONDS", "3600"))
+
+# 早期按内容哈希命名的提交文件
+_HASH_NAME = re.compile(r"[0-9a-f]{64}")
+
+# 压缩方式 -> 文件后缀
+SUFFIXES = {"gzip": ".csv.gz", "zstd": ".csv.zst", "none": ".csv"}
+
+
+def open_blob(path) -> BinaryIO:
+    """按后缀打开（并解压）提交文件，返回二进制文件对象"""
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 文件需要安装 zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+class BlobWriter:
+    """边写入边压缩、边计算内容哈希；commit() 后才出现在存储中"""
+
+    def __init__(self, store: "BlobStore"):
+        self.store = store
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+        tmp_dir = store.root / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = tmp_dir / f"{uuid.uuid4().hex}{store.suffix}"
+        self._raw = open(self._tmp_path, "wb")
+        if store.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=store.level, mtime=0)
+        elif store.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=store.level).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._closed = False
+
+    def write(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        self._stream.write(chunk)
+
+    def _close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+
+    def commit(self) -> str:
+        """完成写入并放入存储，返回内容哈希；相同内容已存在时丢弃本次写入"""
+        self._close()
+        content_hash = self._digest.hexdigest()
+        existing = self.store.locate(content_hash)
+        if existing is not None:
+            # 刷新修改时间，整理时新引用的 blob 处于保护期内
+            os.utime(existing)
+            self._tmp_path.unlink()
+        else:
+            target = self.store.path_for(content_hash)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._tmp_path, target)
+        return content_hash
+
+    def discard(self) -> None:
+        self._close()
+        if self._tmp_path.exists():
+            self._tmp_path.unlink()
+
+    def __enter__(self) -> "BlobWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None or not self._closed:
+            self.discard()
+
+
+class BlobStore:
+    """按 SHA-256 分片保存的压缩文件存储"""
+
+    def __init__(self, root: Path, compression: str = BLOB_COMPRESSION, level: int = BLOB_COMPRESSION_LEVEL):
+        if compression == "zstd" and zstandard is None:
+            print("⚠️  未安装 zstandard，提交文件改用 gzip 压缩")
+            compression = "gzip"
+        if compression not in SUFFIXES:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.root = Path(root)
+        self.compression = compression
+        self.level = level
+        self.suffix = SUFFIXES[compression]
+
+    def path_for(self, content_hash: str, suffix: Optional[str] = None) -> Path:
+        """内容哈希对应的存储路径（按当前压缩方式）"""
+        return self.root / content_hash[:2] / content_hash[2:4] / f"{content_hash}{suffix or self.suffix}"
+
+    def locate(self, content_hash: str) -> Optional[Path]:
+        """查找已保存的 blob（压缩方式可能与当前配置不同），不存在时返回 None"""
+        for suffix in dict.fromkeys([self.suffix, *SUFFIXES.values()]):
+            path = self.path_for(content_hash, suffix)
+            if path.exists():
+                return path
+        return None
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def put_file(self, path: Path) -> str:
+        """把未压缩的文件导入存储，返回内容哈希"""
+        with self.writer() as writer, open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                writer.write(chunk)
+            return writer.commit()
+
+    def delete(self, content_hash: str) -> bool:
+        path = self.locate(content_hash)
+        if path is None:
+            return False
+        path.unlink()
+        return True
+
+    def iter_blobs(self) -> Iterator[Path]:
+        """遍历存储中的所有 blob"""
+        for shard in self.root.glob("[0-9a-f][0-9a-f]/[0-9a-f][0-9a-f]"):
+            yield from shard.iterdir()
+
+    def usage(self) -> Dict:
+        """blob 数量和占用字节数"""
+        count = size = 0
+        for path in self.iter_blobs():
+            count += 1
+            size += path.stat().st_size
+        return {"blobs": count, "bytes": size, "compression": self.compression}
+
+
+def submission_file_path(submission: Submission, store: "BlobStore" = None) -> Path:
+    """
+    提交文件的位置
+
+    有内容哈希的提交保存在 blob 存储中；早期的提交直接保存在 submissions/ 下，
+    在数据库迁移把它们迁入存储之前仍从原位置读取。
+    """
+    store = store or blob_store
+    if submission.content_hash:
+        path = store.locate(submission.content_hash)
+        if path is not None:
+            return path
+        legacy = SUBMISSIONS_DIR / f"{submission.content_hash}.csv"
+        return legacy if legacy.exists() else store.path_for(submission.content_hash)
+    return SUBMISSIONS_DIR / submission.filename
+
+
+def retained_hashes(db: Session, last_n: int = BLOB_RETENTION_LAST_N) -> Set[str]:
+    """按保留策略需要保留文件的内容哈希"""
+    # 等待评分的提交
+    keep = set(db.scalars(
+        select(Submission.content_hash).where(
+            Submission.status == 'pending', Submission.content_hash.isnot(None)
+        )
+    ))
+
+    # 每个用户在每个竞赛中的最佳提交
+    keep.update(db.scalars(
+        select(Submission.content_hash)
+        .join(LeaderboardRecord, LeaderboardRecord.best_submission_id == Submission.id)
+        .where(Submission.content_hash.isnot(None))
+    ))
+
+    # 每个用户在每个竞赛中最近 N 次提交
+    if last_n > 0:
+        recent = select(
+            Submission.content_hash,
+            func.row_number().over(
+                partition_by=(Submission.user_id, Submission.competition_id),
+                order_by=(Submission.submitted_at.desc(), Submission.id.desc()),
+            ).label("recency"),
+        ).where(Submission.content_hash.isnot(None)).subquery()
+        keep.update(db.scalars(select(recent.c.content_hash).where(recent.c.recency <= last_n)))
+    return keep
+
+
+def import_legacy_files(db: Session, store: "BlobStore" = None) -> int:
+    """
+    把直接保存在 submissions/ 下的提交文件迁入存储，返回迁入的文件数（不提交事务）
+
+    在数据库迁移中执行一次（评分任务启动之前）。早期文件有两种：
+    没有内容哈希的提交按 filename 保存；有内容哈希的提交保存为 {content_hash}.csv，
+    后者直接按文件名迁入，不需要遍历提交记录。原文件在所有记录更新之后才删除。
+    """
+    store = store or blob_store
+    migrated = []
+
+    rows = db.execute(
+        select(Submission.id, Submission.filename).where(Submission.content_hash.is_(None))
+    ).all()
+    for submission_id, filename in rows:
+        legacy = SUBMISSIONS_DIR / filename
+        if not legacy.is_file():
+            continue
+        content_hash = store.put_file(legacy)
+        db.execute(
+            update(Submission).where(Submission.id == submission_id).values(content_hash=content_hash)
+        )
+        migrated.append(legacy)
+
+    if SUBMISSIONS_DIR.is_dir():
+        for legacy in SUBMISSIONS_DIR.glob("*.csv"):
+            if _HASH_NAME.fullmatch(legacy.stem) and legacy not in migrated:
+                store.put_file(legacy)
+                migrated.append(legacy)
+
+    db.flush()
+    for legacy in set(migrated):
+        legacy.unlink()
+    return len(set(migrated))
+
+
+def compact(store: "BlobStore" = None, last_n: int = BLOB_RETENTION_LAST_N, grace_seconds: int = BLOB_GRACE_SECONDS) -> Dict:
+    """
+    整理存储：删除保留策略之外的 blob 和残留的临时文件
+
+    最近 grace_seconds 内写入的 blob 不会被删除（其提交记录可能尚未提交）。
+    """
+    store = store or blob_store
+    db = SessionLocal()
+    try:
+        keep = retained_hashes(db, last_n)
+    finally:
+        db.close()
+
+    cutoff = time.time() - grace_seconds
+    removed = freed = 0
+    for path in list(store.iter_blobs()):
+        content_hash = path.name.split(".", 1)[0]
+        stat = path.stat()
+        if content_hash in keep or stat.st_mtime > cutoff:
+            continue
+        path.unlink()
+        removed += 1
+        freed += stat.st_size
+
+    tmp_dir = store.root / "tmp"
+    if tmp_dir.is_dir():
+        for path in tmp_dir.iterdir():
+            if path.stat().st_mtime <= cutoff:
+                path.unlink()
+
+    return {"removed": removed, "freed_bytes": freed}
+
+
+async def compaction_loop(store: "BlobStore" = None, interval: int = BLOB_COMPACTION_INTERVAL) -> None:
+    """后台定期整理存储，在应用 lifespan 中启动、关闭时取消"""
+    while True:
+        try:
+            result = await run_in_threadpool(compact, store)
+            if result["removed"]:
+                print(f"✅ 提交文件整理完成: 删除 {result['removed']} 个, 释放 {result['freed_bytes']} 字节")
+        except Exception as e:
+            print(f"⚠️  提交文件整理失败: {e}")
+        await asyncio.sleep(interval)
+
+
+# 全局提交文件存储
+blob_store = BlobStore(BLOB_STORE_DIR)
@@ -0,0 +1,112 @@
+"""
+竞赛统计 - 维护 competition_stats 累计值并提供统计查询
+
+每次提交评分成功时在同一事务中累加提交数、分数总和与参与人数，
+/api/statistics 指定竞赛时只需读取一行。
+"""
+from typing import Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import CompetitionStats, LeaderboardRecord, Submission
+from schemas import Statistics
+
+
+def update_statistics(db: Session, submission: Submission, is_new_user: bool) -> None:
+    """
+    把一次成功的提交计入竞赛统计（不提交事务）
+
+    is_new_user: 该用户是否第一次在此竞赛中提交成功
+    """
+    score = submission.final_score
+
+    updated = db.query(CompetitionStats).filter(
+        CompetitionStats.competition_id == submission.competition_id
+    ).update({
+        CompetitionStats.total_users: CompetitionStats.total_users + (1 if is_new_user else 0),
+        CompetitionStats.total_submissions: CompetitionStats.total_submissions + 1,
+        CompetitionStats.score_sum: CompetitionStats.score_sum + score,
+        CompetitionStats.best_score: case(
+            (CompetitionStats.best_score.is_(None), score),
+            (CompetitionStats.best_score < score, score),
+            else_=CompetitionStats.best_score,
+        ),
+    }, synchronize_session=False)
+
+    if updated == 0:
+        try:
+            with db.begin_nested():
+                db.add(CompetitionStats(
+                    competition_id=submission.competition_id,
+                    total_users=1 if is_new_user else 0,
+                    total_submissions=1,
+                    score_sum=score,
+                    best_score=score,
+                ))
+        except IntegrityError:
+            # 并发写入时另一事务已创建该行，改为更新
+            update_statistics(db, submission, is_new_user)
+
+
+def rebuild_statistics(db: Session) -> int:
+    """根据 submissions 表重建各竞赛的统计（不提交事务），返回竞赛数"""
+    db.query(CompetitionStats).delete(synchronize_session=False)
+
+    rows = db.query(
+        Submission.competition_id,
+        func.count(func.distinct(Submission.user_id)),
+        func.count(Submission.id),
+        func.coalesce(func.sum(Submission.final_score), 0.0),
+        func.max(Submission.final_score),
+    ).filter(
+        Submission.status == 'success'
+    ).group_by(Submission.competition_id).all()
+
+    for competition_id, total_users, total_submissions, score_sum, best_score in rows:
+        db.add(CompetitionStats(
+            competition_id=competition_id,
+            total_users=total_users,
+            total_submissions=total_submissions,
+            score_sum=score_sum,
+            best_score=best_score,
+        ))
+    return len(rows)
+
+
+async def get_statistics(db: AsyncSession, competition_id: Optional[int] = None) -> Statistics:
+    """
+    查询统计信息
+
+    指定竞赛时读取累计值；不指定时在一次查询中汇总所有竞赛
+    （参与人数按用户去重，来自排行榜表）。
+    """
+    if competition_id:
+        stats = await db.get(CompetitionStats, competition_id)
+        if stats is None or stats.total_submissions == 0:
+            return Statistics(total_users=0, total_submissions=0, avg_score=0, best_score=0)
+        return Statistics(
+            total_users=stats.total_users,
+            total_submissions=stats.total_submissions,
+            avg_score=stats.score_sum / stats.total_submissions,
+            best_score=stats.best_score or 0,
+        )
+
+    total_users = select(func.count(func.distinct(LeaderboardRecord.user_id))).scalar_subquery()
+    total_users, total_submissions, score_sum, best_score = (await db.execute(
+        select(
+            total_users,
+            func.coalesce(func.sum(CompetitionStats.total_submissions), 0),
+            func.coalesce(func.sum(CompetitionStats.score_sum), 0.0),
+            func.max(CompetitionStats.best_score),
+        )
+    )).one()
+
+    return Statistics(
+        total_users=total_users or 0,
+        total_submissions=total_submissions,
+        avg_score=score_sum / total_submissions if total_submissions else 0,
+        best_score=best_score or 0,
+    )
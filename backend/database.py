@@ -1,28 +1,155 @@
 """
 数据库配置和模型定义
 """
+import os
 from datetime import datetime
 from pathlib import Path
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Text, create_engine
+from dotenv import load_dotenv
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 
 # 统一的路径设置
 BASE_DIR = Path(__file__).resolve().parent
 DATABASE_PATH = BASE_DIR / "quiz_platform.db"
 
-# 数据库URL - 使用SQLite（路径固定在backend目录下）
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+# 数据库配置在导入时读取，先加载项目根目录的 .env
+load_dotenv(dotenv_path=BASE_DIR.parent / ".env")
+
+# 数据库URL - 默认使用SQLite（路径固定在backend目录下），可用环境变量切换到服务器数据库
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or f"sqlite:///{DATABASE_PATH}"
+
+# SQLite 调优参数（每个连接建立时通过 PRAGMA 设置）
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),           # 读写互不阻塞
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),          # WAL 下 NORMAL 已足够安全
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),  # 等待写锁而不是立即报 database is locked
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),       # 负数表示 KiB，即 64MB
+}
+
+# 连接池参数
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def is_sqlite_url(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_sqlite_memory_url(url: str) -> bool:
+    database = make_url(url).database
+    return database in (None, "", ":memory:")
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """连接建立时应用 SQLite PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url: str):
+    """
+    按数据库类型选择引擎配置
+
+    - SQLite 文件：QueuePool 复用连接，并在 connect 事件中设置 WAL 等 PRAGMA
+    - SQLite 内存库：StaticPool，所有会话共享同一个连接
+    - 其他数据库：QueuePool，并在取出连接前检测连接是否可用
+    """
+    if is_sqlite_url(url):
+        connect_args = {"check_same_thread": False}  # SQLite特有配置
+        if is_sqlite_memory_url(url):
+            db_engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+        else:
+            db_engine = create_engine(
+                url,
+                connect_args=connect_args,
+                poolclass=QueuePool,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+            )
+        event.listen(db_engine, "connect", set_sqlite_pragmas)
+        return db_engine
+
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+# 同步驱动对应的异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def to_async_url(url: str) -> str:
+    """把数据库URL转换为异步驱动的URL（可用 ASYNC_DATABASE_URL 直接指定）"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"不支持的异步数据库类型: {backend}")
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str):
+    """异步引擎，连接池和 PRAGMA 配置与 create_db_engine 保持一致"""
+    if is_sqlite_url(url):
+        connect_args = {"check_same_thread": False}
+        if is_sqlite_memory_url(url):
+            db_engine = create_async_engine(url, connect_args=connect_args, poolclass=StaticPool)
+        else:
+            # aiosqlite 对文件数据库默认使用 NullPool，每个会话都要重新建连接和设置 PRAGMA
+            db_engine = create_async_engine(
+                url,
+                connect_args=connect_args,
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+            )
+        event.listen(db_engine.sync_engine, "connect", set_sqlite_pragmas)
+        return db_engine
+
+    return create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
 
 # 创建数据库引擎
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # SQLite特有配置
-)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+
+# 异步引擎：供读多写少的接口使用，不占用FastAPI的线程池
+# 注意：SQLite 内存库在两个引擎之间不共享数据
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
 
 # 创建Session工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # 创建基类
 Base = declarative_base()
@@ -86,15 +213,150 @@ class Submission(Base):
     status = Column(String(20), default="pending")  # pending, success, error
     error_message = Column(Text, nullable=True)
     
+    # 提交文件内容的 SHA-256 与评分所用答案文件的版本，用于复用相同文件的评分结果
+    content_hash = Column(String(64), nullable=True)
+    answer_version = Column(String(64), nullable=True)
+    
+    # 评分租约：负责评分的进程 PID 和最后一次心跳，心跳过期的待评分提交会被重新排队
+    scoring_owner = Column(Integer, nullable=True)
+    scoring_heartbeat = Column(DateTime, nullable=True)
+    
     # 关联关系
     user = relationship("User", back_populates="submissions")
     competition = relationship("Competition", back_populates="submissions")
+    
+    # 复合索引：排行榜/统计按竞赛和状态筛选、按用户分组；个人记录按时间排序
+    __table_args__ = (
+        Index("ix_submissions_competition_status_user_score", "competition_id", "status", "user_id", "final_score"),
+        Index("ix_submissions_user_submitted_at", "user_id", "submitted_at"),
+        Index("ix_submissions_status", "status"),
+        Index("ix_submissions_competition_content_hash", "competition_id", "content_hash"),
+    )
+
+
+# 排行榜物化表：每个竞赛中每个用户一行，评分成功时在同一事务中更新
+class LeaderboardRecord(Base):
+    __tablename__ = "leaderboard_entries"
+    
+    competition_id = Column(Integer, ForeignKey("competitions.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    
+    # 最佳提交（同分时取最早达到该分数的提交）
+    best_submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=False)
+    best_score = Column(Float, nullable=False)
+    best_accuracy = Column(Float, nullable=False)
+    best_precision = Column(Float, nullable=False)
+    best_recall = Column(Float, nullable=False)
+    best_f1_score = Column(Float, nullable=False)
+    best_submitted_at = Column(DateTime, nullable=False)
+    
+    # 成功提交次数和最近一次成功提交时间
+    submission_count = Column(Integer, nullable=False, default=0)
+    last_submission = Column(DateTime, nullable=False)
+    
+    # 关联关系
+    user = relationship("User")
+
+
+# 排名顺序：分数降序，同分先达到者优先，最后按用户ID
+Index(
+    "ix_leaderboard_entries_rank",
+    LeaderboardRecord.competition_id,
+    LeaderboardRecord.best_score.desc(),
+    LeaderboardRecord.best_submitted_at,
+    LeaderboardRecord.user_id,
+)
+
+
+# 跨竞赛排行榜：每个用户在所有竞赛中的最佳成绩，与 leaderboard_entries 在同一事务中更新
+class OverallLeaderboardRecord(Base):
+    __tablename__ = "overall_leaderboard_entries"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    best_submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=False)
+    best_score = Column(Float, nullable=False)
+    best_accuracy = Column(Float, nullable=False)
+    best_precision = Column(Float, nullable=False)
+    best_recall = Column(Float, nullable=False)
+    best_f1_score = Column(Float, nullable=False)
+    best_submitted_at = Column(DateTime, nullable=False)
+
+    # 所有竞赛合计
+    submission_count = Column(Integer, nullable=False, default=0)
+    last_submission = Column(DateTime, nullable=False)
+
+
+Index(
+    "ix_overall_leaderboard_entries_rank",
+    OverallLeaderboardRecord.best_score.desc(),
+    OverallLeaderboardRecord.best_submitted_at,
+    OverallLeaderboardRecord.user_id,
+)
+
+
+# 竞赛统计：按竞赛累计的成功提交数、参与人数和分数，评分成功时在同一事务中更新
+class CompetitionStats(Base):
+    __tablename__ = "competition_stats"
+    
+    competition_id = Column(Integer, ForeignKey("competitions.id"), primary_key=True)
+    total_users = Column(Integer, nullable=False, default=0)
+    total_submissions = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    best_score = Column(Float, nullable=True)
+
+
+# 多进程部署时的跨进程通知（缓存失效、实时事件），各进程轮询新行，旧行定期清理
+class WorkerEvent(Base):
+    __tablename__ = "worker_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    origin = Column(Integer, nullable=False)  # 发出通知的进程 PID，本进程已直接处理
+    kind = Column(String(20), nullable=False)
+    competition_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    name = Column(String(50), nullable=True)
+    payload = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+# 提交频率限制的令牌桶（多进程部署时各进程共用）
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(64), primary_key=True)  # 如 "submit:{user_id}:{competition_id}"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # Unix 时间戳（秒）
+
+
+# 实时事件流（SSE）的一次性票据：EventSource 不能设置请求头，用它代替在 URL 中传 JWT
+class EventTicket(Base):
+    __tablename__ = "event_tickets"
+
+    ticket = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    competition_id = Column(Integer, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)  # Unix 时间戳（秒）
+
+
+# 数据库迁移记录
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+    
+    version = Column(Integer, primary_key=True)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
 
 
 # 创建所有表
 def init_db():
+    # create_all 只会创建缺失的表，已有表的变更由迁移完成
     Base.metadata.create_all(bind=engine)
     
+    from migrations import run_migrations
+    for version, description in run_migrations(engine):
+        print(f"✅ 已应用数据库迁移 {version}: {description}")
+    
     # 初始化竞赛数据
     db = SessionLocal()
     try:
@@ -163,3 +425,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# 异步数据库依赖
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
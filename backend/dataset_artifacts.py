@@ -0,0 +1,202 @@
+"""
+数据集分文件下载 - 启动时为每个数据集文件生成独立的压缩包和清单
+
+竞赛的 dataset_path 指向整个数据集的 tar.gz（如 kaggle_dataset.tar.gz），
+对应的源目录为去掉 .tar.gz 后缀的目录（如 kaggle_dataset/）。启动时把源目录中的
+每个文件单独压缩为 dataset_artifacts/{竞赛名}/{文件名}.gz，并写出 manifest.json
+（原始大小、SHA-256、压缩后大小）。源文件未变化（size、mtime 相同）时直接复用上次的结果。
+
+学生可以先获取清单，再只下载需要的文件（如 test.csv）。PPI 数据集另外提供
+列式格式的 ppi_columnar.npz（序列去重，见 ppi_columnar.py）。
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BASE_DIR.parent
+
+# 压缩结果输出目录
+DATASET_ARTIFACTS_DIR = Path(os.getenv("DATASET_ARTIFACTS_DIR") or ROOT_DIR / "dataset_artifacts")
+
+MANIFEST_NAME = "manifest.json"
+ARCHIVE_SUFFIX = ".tar.gz"
+
+
+def _build_ppi_columnar(source_dir: Path, target: Path) -> None:
+    from ppi_columnar import convert
+    convert(source_dir, npz_path=target)
+
+
+# 由源文件派生的额外下载文件：竞赛名 -> (文件名, 生成函数)
+DERIVED_ARTIFACTS: Dict[str, tuple] = {
+    "ppi": ("ppi_columnar.npz", _build_ppi_columnar),
+}
+
+
+def dataset_source_dir(dataset_path: Path) -> Path:
+    """整包数据集对应的源目录"""
+    path = str(dataset_path)
+    if path.endswith(ARCHIVE_SUFFIX):
+        path = path[:-len(ARCHIVE_SUFFIX)]
+    return Path(path)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _compress(source: Path, target: Path) -> None:
+    tmp = target.with_name(target.name + ".tmp")
+    with open(source, "rb") as src, open(tmp, "wb") as raw:
+        # mtime=0 使相同内容得到相同的压缩文件
+        with gzip.GzipFile(filename=source.name, fileobj=raw, mode="wb", compresslevel=9, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp, target)
+
+
+def _load_manifest(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _build_derived(source_dir: Path, target: Path, builder: Callable[[Path, Path], None]) -> Dict:
+    builder(source_dir, target)
+    stat = target.stat()
+    return {
+        "name": target.name,
+        "artifact": target.name,
+        "media_type": "application/octet-stream",
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _sha256(target),
+        "compressed_size": stat.st_size,
+    }
+
+
+def build_artifacts(competition_name: str, source_dir: Path) -> Dict:
+    """压缩源目录中的每个文件并写出清单，返回清单内容"""
+    output_dir = DATASET_ARTIFACTS_DIR / competition_name
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+
+    previous = _load_manifest(manifest_path) or {}
+    previous_files = {entry["name"]: entry for entry in previous.get("files", [])}
+
+    files: List[Dict] = []
+    for source in sorted(source_dir.iterdir()):
+        if not source.is_file() or source.name.startswith("."):
+            continue
+        stat = source.stat()
+        artifact = output_dir / f"{source.name}.gz"
+
+        entry = previous_files.get(source.name)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and artifact.exists()
+        ):
+            files.append(entry)
+            continue
+
+        _compress(source, artifact)
+        files.append({
+            "name": source.name,
+            "artifact": artifact.name,
+            "media_type": mimetypes.guess_type(source.name)[0] or "application/octet-stream",
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": _sha256(source),
+            "compressed_size": artifact.stat().st_size,
+        })
+
+    # 源文件有变化时重新生成派生文件
+    derived = DERIVED_ARTIFACTS.get(competition_name)
+    if derived is not None:
+        name, builder = derived
+        target = output_dir / name
+        entry = previous_files.get(name)
+        previous_sources = [e for e in previous.get("files", []) if e["name"] != name]
+        if entry is not None and target.exists() and files == previous_sources:
+            files.append(entry)
+        else:
+            # 派生文件生成失败（如源数据格式错误）时只跳过这一个文件，其余文件照常提供
+            try:
+                files.append(_build_derived(source_dir, target, builder))
+            except (OSError, ValueError) as e:
+                print(f"⚠️  派生文件生成失败，跳过 [{competition_name}/{name}]: {e}")
+
+    # 删除源目录中已不存在的文件的压缩结果
+    names = {entry["artifact"] for entry in files}
+    for path in output_dir.iterdir():
+        if path.name != MANIFEST_NAME and path.name not in names:
+            path.unlink()
+
+    manifest = {
+        "competition": competition_name,
+        "generated_at": previous.get("generated_at") if files == previous.get("files") else datetime.utcnow().isoformat(),
+        "files": files,
+    }
+    tmp = manifest_path.with_name(MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, manifest_path)
+    return manifest
+
+
+class ArtifactRegistry:
+    """启动时生成的各竞赛清单"""
+
+    def __init__(self):
+        self._manifests: Dict[str, Dict] = {}
+
+    def build(self, competitions) -> None:
+        """
+        competitions: (竞赛名, 整包数据集路径) 列表
+
+        源目录不存在或打包失败（输出目录不可写、读写出错、派生文件生成失败）的竞赛跳过，
+        没有清单、不提供分文件下载，整包下载和应用启动不受影响。
+        """
+        for name, dataset_path in competitions:
+            self._manifests.pop(name, None)
+            source_dir = dataset_source_dir(dataset_path)
+            if not source_dir.is_dir():
+                print(f"⚠️  数据集目录不存在，跳过分文件打包 [{name}]: {source_dir}")
+                continue
+            try:
+                manifest = build_artifacts(name, source_dir)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  数据集分文件打包失败，跳过 [{name}]: {e}")
+                continue
+            self._manifests[name] = manifest
+            print(f"✅ 数据集分文件打包完成 [{name}]: {len(manifest['files'])} 个文件")
+
+    def manifest(self, competition_name: str) -> Optional[Dict]:
+        return self._manifests.get(competition_name)
+
+    def artifact_path(self, competition_name: str, filename: str) -> Optional[Path]:
+        """清单中文件的压缩包路径；只接受清单中列出的文件名"""
+        manifest = self._manifests.get(competition_name)
+        if manifest is None:
+            return None
+        for entry in manifest["files"]:
+            if entry["name"] == filename:
+                return DATASET_ARTIFACTS_DIR / competition_name / entry["artifact"]
+        return None
+
+
+artifact_registry = ArtifactRegistry()
@@ -0,0 +1,219 @@
+"""
+实时事件 - 排行榜变化和评分状态的 Server-Sent Events 推送
+
+每个竞赛一个频道，GET /api/competitions/{id}/events 建立一条长连接，代替对
+排行榜和提交详情的轮询。提交接口和评分结果写回时发布事件：
+
+    event: submission    当前用户的提交状态变化（数据同 SubmissionDetail），只推送给提交者
+    event: leaderboard   排行榜上某个用户的新成绩（数据同 LeaderboardEntry，rank 为最新名次）
+    event: resync        推送积压过多、部分事件被丢弃，客户端应重新请求完整数据
+
+事件在进程内分发（发布方可以在任意线程中调用 publish），每个连接有一个有界队列，
+客户端读取过慢时清空积压并改发 resync，不会占用无限内存。多进程部署时事件同时
+转发给其他工作进程（见 worker_sync.py），连接在哪个进程上都能收到。
+连接超过 SSE_MAX_STREAM_SECONDS 后由服务器关闭，EventSource 会自动重连，
+这样服务器关闭时不会被长连接一直挡住。
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional, Set
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from database import Submission
+from leaderboard import get_leaderboard_entry
+from schemas import SubmissionDetail
+from worker_sync import worker_sync
+
+# 空闲时发送心跳注释的间隔（秒），防止代理断开空闲连接
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# 单条连接的最长时间（秒），到期后客户端自动重连
+SSE_MAX_STREAM_SECONDS = float(os.getenv("SSE_MAX_STREAM_SECONDS", "300"))
+# 每个连接最多积压的事件数
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+# 每个进程同时保持的连接数上限
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "1000"))
+# 客户端断线后的重连间隔（毫秒）
+SSE_RETRY_MS = 3000
+
+RESYNC_MESSAGE = "event: resync\ndata: {}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("competition_id", "user_id", "queue")
+
+    def __init__(self, competition_id: int, user_id: Optional[int]):
+        self.competition_id = competition_id
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+
+
+class EventBroker:
+    """进程内的发布/订阅，按竞赛分频道"""
+
+    def __init__(self, max_connections: int = SSE_MAX_CONNECTIONS):
+        self.max_connections = max(1, max_connections)
+        self._channels: Dict[int, Set[Subscriber]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_id = 0
+        self.connections = 0
+        self.published = 0
+        self.resyncs = 0
+
+    def start(self) -> None:
+        """记录事件循环，其他线程发布的事件转到这个循环中分发"""
+        self._loop = asyncio.get_running_loop()
+
+    def close(self) -> None:
+        """结束所有连接"""
+        for subscribers in self._channels.values():
+            for subscriber in subscribers:
+                self._drain(subscriber.queue)
+                subscriber.queue.put_nowait(None)
+        self._loop = None
+
+    def has_subscribers(self, competition_id: int) -> bool:
+        return bool(self._channels.get(competition_id))
+
+    def wanted(self, competition_id: int) -> bool:
+        """是否需要生成该竞赛的事件（其他工作进程上可能有订阅者）"""
+        return worker_sync.enabled or self.has_subscribers(competition_id)
+
+    def publish(self, competition_id: int, event: str, data: Any, user_id: Optional[int] = None) -> None:
+        """
+        发布事件（可在任意线程中调用）
+
+        user_id 不为空时只推送给该用户的连接。
+        """
+        loop = self._loop
+        if loop is None or not self.wanted(competition_id):
+            return
+        payload = json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":"))
+        worker_sync.send("event", competition_id, user_id, name=event, payload=payload)
+        if not self.has_subscribers(competition_id):
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(competition_id, event, payload, user_id)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, competition_id, event, payload, user_id)
+
+    @staticmethod
+    def _drain(queue: asyncio.Queue) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+
+    def _dispatch(self, competition_id: int, event: str, payload: str, user_id: Optional[int]) -> None:
+        self._next_id += 1
+        self.published += 1
+        message = f"id: {self._next_id}\nevent: {event}\ndata: {payload}\n\n"
+        for subscriber in list(self._channels.get(competition_id, ())):
+            if user_id is not None and subscriber.user_id != user_id:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 客户端跟不上：丢弃积压，让客户端重新拉取完整数据
+                self.resyncs += 1
+                self._drain(subscriber.queue)
+                subscriber.queue.put_nowait(RESYNC_MESSAGE)
+
+    def subscribe(self, competition_id: int, user_id: Optional[int]) -> Subscriber:
+        subscriber = Subscriber(competition_id, user_id)
+        self._channels.setdefault(competition_id, set()).add(subscriber)
+        self.connections += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._channels.get(subscriber.competition_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._channels[subscriber.competition_id]
+        self.connections -= 1
+
+    async def _messages(self, competition_id: int, user_id: Optional[int]):
+        # 在生成器内订阅：响应开始发送前客户端就断开时不会留下订阅
+        subscriber = self.subscribe(competition_id, user_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SSE_MAX_STREAM_SECONDS
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while True:
+                timeout = min(SSE_HEARTBEAT_SECONDS, deadline - loop.time())
+                if timeout <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stream(self, competition_id: int, user_id: Optional[int]) -> StreamingResponse:
+        """订阅竞赛频道并返回 SSE 响应；客户端断开时自动取消订阅，连接数已满时抛出 503"""
+        if self.connections >= self.max_connections:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="实时连接数过多，请稍后重试",
+                headers={"Retry-After": str(SSE_RETRY_MS // 1000)},
+            )
+        return StreamingResponse(
+            self._messages(competition_id, user_id),
+            media_type="text/event-stream",
+            headers={
+                "cache-control": "no-cache",
+                # 关闭 nginx 的响应缓冲，事件才能立即送达
+                "x-accel-buffering": "no",
+            },
+        )
+
+    def metrics(self) -> Dict:
+        return {
+            "connections": self.connections,
+            "max_connections": self.max_connections,
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+
+event_broker = EventBroker()
+
+
+def publish_submission(submission: Submission) -> None:
+    """推送提交状态给提交者"""
+    if not event_broker.wanted(submission.competition_id):
+        return
+    event_broker.publish(
+        submission.competition_id,
+        "submission",
+        SubmissionDetail.model_validate(submission),
+        user_id=submission.user_id,
+    )
+
+
+def publish_leaderboard(db: Session, submission: Submission) -> None:
+    """推送提交者在排行榜上的最新成绩和名次（在事务提交之后调用）"""
+    if not event_broker.wanted(submission.competition_id):
+        return
+    entry = get_leaderboard_entry(db, submission.competition_id, submission.user_id)
+    if entry is not None:
+        event_broker.publish(submission.competition_id, "leaderboard", entry)
+
+
+worker_sync.on(
+    "event",
+    lambda row: event_broker._dispatch(row.competition_id, row.name, row.payload, row.user_id),
+)
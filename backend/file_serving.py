@@ -0,0 +1,228 @@
+"""
+文件下载 - 数据集等大文件的条件请求、断点续传与并发限制
+
+- 强 ETag：文件内容的 SHA-256，按 (路径, mtime, size) 缓存，每个文件只计算一次
+- If-None-Match 命中时返回 304
+- 单个 Range 请求返回 206（支持 If-Range），无法满足的范围返回 416
+- 文件在线程池中用 pread 按块读取发送，不阻塞事件循环
+- 同时进行的下载数超过 DOWNLOAD_CONCURRENCY 时返回 503 和 Retry-After，
+  避免下载占满工作线程、拖慢评分
+"""
+import hashlib
+import os
+import re
+import threading
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# 同时进行的下载数上限，以及达到上限时建议客户端等待的秒数
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "8"))
+DOWNLOAD_RETRY_AFTER = int(os.getenv("DOWNLOAD_RETRY_AFTER", "5"))
+
+# 每次读取发送的字节数
+SEND_CHUNK_SIZE = 256 * 1024
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class ETagCache:
+    """按文件 (mtime, size) 缓存的强 ETag"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, stat: os.stat_result) -> str:
+        key = str(path)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()}"'
+        with self._lock:
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, etag)
+        return etag
+
+
+etag_cache = ETagCache()
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围，返回闭区间 (start, end)
+
+    不是单个字节范围（如多段范围）时返回 None，按完整文件响应；
+    范围无法满足时抛出 ValueError。
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # bytes=-N：最后 N 个字节
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class RangeFileResponse(Response):
+    """发送文件的全部或一个字节范围，发送结束后调用 on_complete"""
+
+    def __init__(
+        self,
+        path: Path,
+        start: int,
+        length: int,
+        status_code: int,
+        headers: Dict[str, str],
+        media_type: str,
+        on_complete=None,
+    ):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.length = length
+        self.on_complete = on_complete
+        # Response 默认按空 body 设置了 content-length，这里改为实际发送的长度
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            if scope.get("method") == "HEAD" or self.length == 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+
+            fd = await run_in_threadpool(os.open, str(self.path), os.O_RDONLY)
+            try:
+                offset = self.start
+                remaining = self.length
+                while remaining > 0:
+                    chunk = await run_in_threadpool(os.pread, fd, min(SEND_CHUNK_SIZE, remaining), offset)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+            finally:
+                os.close(fd)
+        finally:
+            if self.on_complete is not None:
+                self.on_complete()
+
+
+class DownloadLimiter:
+    """限制同时进行的下载数，超过上限时立即拒绝而不是排队"""
+
+    def __init__(self, limit: int = DOWNLOAD_CONCURRENCY):
+        self.limit = max(1, limit)
+        self.active = 0
+        self.rejected = 0
+
+    def acquire(self) -> None:
+        """占用一个下载名额，已满时抛出 503"""
+        if self.active >= self.limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="下载人数过多，请稍后重试",
+                headers={"Retry-After": str(DOWNLOAD_RETRY_AFTER)},
+            )
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+
+    def metrics(self) -> Dict:
+        return {"active": self.active, "limit": self.limit, "rejected": self.rejected}
+
+
+download_limiter = DownloadLimiter()
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+async def serve_file(request: Request, path: Path, filename: str, media_type: str) -> Response:
+    """按请求头返回 200/206/304/416 响应，文件不存在时抛出 FileNotFoundError"""
+    stat = await run_in_threadpool(os.stat, path)
+    etag = await run_in_threadpool(etag_cache.get, path, stat)
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    size = stat.st_size
+    start, length, status_code = 0, size, status.HTTP_200_OK
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range 与当前 ETag 不一致说明文件已变化，返回完整文件
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "content-range": f"bytes */{size}"},
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+    headers["content-disposition"] = content_disposition(filename)
+
+    download_limiter.acquire()
+    return RangeFileResponse(
+        path=path,
+        start=start,
+        length=length,
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+        on_complete=download_limiter.release,
+    )
@@ -0,0 +1,320 @@
+"""
+排行榜 - 维护 leaderboard_entries 物化表并提供排名查询
+
+提交评分成功时调用 update_leaderboard()，与提交状态在同一事务中更新；
+查询排行榜时只需按索引 (competition_id, best_score DESC, best_submitted_at, user_id)
+做一次范围扫描，代价只与返回的行数有关；翻页使用该排序键作为游标（keyset 分页）。
+跨竞赛排行榜同样维护在 overall_leaderboard_entries 表中（每个用户一行），
+按索引 (best_score DESC, best_submitted_at, user_id) 分页。
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, asc, case, desc, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import CompetitionStats, LeaderboardRecord, OverallLeaderboardRecord, Submission, User
+from pagination import decode_cursor, encode_cursor
+from schemas import LeaderboardEntry
+
+def rank_order(model=LeaderboardRecord):
+    """排名顺序：分数降序，同分先达到者优先，最后按用户ID"""
+    return (
+        desc(model.best_score),
+        asc(model.best_submitted_at),
+        asc(model.user_id),
+    )
+
+
+RANK_ORDER = rank_order()
+
+
+def _best_fields(model, submission: Submission) -> dict:
+    return {
+        model.best_submission_id: submission.id,
+        model.best_score: submission.final_score,
+        model.best_accuracy: submission.accuracy,
+        model.best_precision: submission.precision,
+        model.best_recall: submission.recall,
+        model.best_f1_score: submission.f1_score,
+        model.best_submitted_at: submission.submitted_at,
+    }
+
+
+def update_leaderboard(db: Session, submission: Submission) -> bool:
+    """
+    把一次成功的提交计入该竞赛和跨竞赛排行榜（不提交事务）
+
+    计数和最佳成绩都用带条件的 UPDATE 原子地完成，
+    多个评分结果同时写入时不会丢失更新。
+    返回该用户是否第一次出现在此竞赛的排行榜中。
+    """
+    is_new_user = _record_submission(
+        db, LeaderboardRecord,
+        and_(
+            LeaderboardRecord.competition_id == submission.competition_id,
+            LeaderboardRecord.user_id == submission.user_id,
+        ),
+        {"competition_id": submission.competition_id, "user_id": submission.user_id},
+        submission,
+    )
+    _record_submission(
+        db, OverallLeaderboardRecord,
+        OverallLeaderboardRecord.user_id == submission.user_id,
+        {"user_id": submission.user_id},
+        submission,
+    )
+    return is_new_user
+
+
+def _record_submission(db: Session, model, key, identity: dict, submission: Submission) -> bool:
+    """在 model 表中 key 对应的行上计入提交，该行不存在时创建并返回 True"""
+    submitted_at = submission.submitted_at
+
+    updated = db.query(model).filter(key).update({
+        model.submission_count: model.submission_count + 1,
+        model.last_submission: case(
+            (model.last_submission < submitted_at, submitted_at),
+            else_=model.last_submission,
+        ),
+    }, synchronize_session=False)
+
+    if updated == 0:
+        try:
+            with db.begin_nested():
+                db.add(model(
+                    **identity,
+                    best_submission_id=submission.id,
+                    best_score=submission.final_score,
+                    best_accuracy=submission.accuracy,
+                    best_precision=submission.precision,
+                    best_recall=submission.recall,
+                    best_f1_score=submission.f1_score,
+                    best_submitted_at=submitted_at,
+                    submission_count=1,
+                    last_submission=submitted_at,
+                ))
+            return True
+        except IntegrityError:
+            # 并发写入时另一事务已创建该行，改为更新
+            return _record_submission(db, model, key, identity, submission)
+
+    score = submission.final_score
+    db.query(model).filter(
+        key,
+        or_(
+            model.best_score < score,
+            and_(
+                model.best_score == score,
+                model.best_submitted_at > submitted_at,
+            ),
+        ),
+    ).update(_best_fields(model, submission), synchronize_session=False)
+    return False
+
+
+def rebuild_leaderboard(db: Session, competition_id: Optional[int] = None) -> int:
+    """根据 submissions 表重建排行榜（不提交事务），返回写入的记录数"""
+    delete_query = db.query(LeaderboardRecord)
+    # 只查询需要的列，迁移中调用时不依赖 submissions 表的其他新列
+    submission_query = db.query(
+        Submission.id,
+        Submission.competition_id,
+        Submission.user_id,
+        Submission.final_score,
+        Submission.accuracy,
+        Submission.precision,
+        Submission.recall,
+        Submission.f1_score,
+        Submission.submitted_at,
+    ).filter(Submission.status == 'success')
+    if competition_id:
+        delete_query = delete_query.filter(LeaderboardRecord.competition_id == competition_id)
+        submission_query = submission_query.filter(Submission.competition_id == competition_id)
+    delete_query.delete(synchronize_session=False)
+
+    # 每组 (competition_id, user_id) 中排在最前的就是最佳提交
+    submissions = submission_query.order_by(
+        Submission.competition_id,
+        Submission.user_id,
+        desc(Submission.final_score),
+        asc(Submission.submitted_at),
+    ).yield_per(1000)
+
+    records = {}
+    for submission in submissions:
+        key = (submission.competition_id, submission.user_id)
+        record = records.get(key)
+        if record is None:
+            records[key] = LeaderboardRecord(
+                competition_id=submission.competition_id,
+                user_id=submission.user_id,
+                best_submission_id=submission.id,
+                best_score=submission.final_score,
+                best_accuracy=submission.accuracy,
+                best_precision=submission.precision,
+                best_recall=submission.recall,
+                best_f1_score=submission.f1_score,
+                best_submitted_at=submission.submitted_at,
+                submission_count=1,
+                last_submission=submission.submitted_at,
+            )
+        else:
+            record.submission_count += 1
+            if submission.submitted_at > record.last_submission:
+                record.last_submission = submission.submitted_at
+
+    db.add_all(records.values())
+    db.flush()
+    rebuild_overall_leaderboard(db)
+    return len(records)
+
+
+def rebuild_overall_leaderboard(db: Session) -> int:
+    """根据 leaderboard_entries 重建跨竞赛排行榜（不提交事务），返回写入的记录数"""
+    db.query(OverallLeaderboardRecord).delete(synchronize_session=False)
+
+    records = {}
+    # 按排名顺序遍历，每个用户遇到的第一行就是其最佳成绩
+    for entry in db.query(LeaderboardRecord).order_by(*RANK_ORDER).yield_per(1000):
+        record = records.get(entry.user_id)
+        if record is None:
+            records[entry.user_id] = OverallLeaderboardRecord(
+                user_id=entry.user_id,
+                best_submission_id=entry.best_submission_id,
+                best_score=entry.best_score,
+                best_accuracy=entry.best_accuracy,
+                best_precision=entry.best_precision,
+                best_recall=entry.best_recall,
+                best_f1_score=entry.best_f1_score,
+                best_submitted_at=entry.best_submitted_at,
+                submission_count=entry.submission_count,
+                last_submission=entry.last_submission,
+            )
+        else:
+            record.submission_count += entry.submission_count
+            if entry.last_submission > record.last_submission:
+                record.last_submission = entry.last_submission
+
+    db.add_all(records.values())
+    return len(records)
+
+
+def _to_entry(rank: int, record, username: str) -> LeaderboardEntry:
+    return LeaderboardEntry(
+        rank=rank,
+        user_id=record.user_id,
+        username=username,
+        best_score=record.best_score,
+        best_accuracy=record.best_accuracy,
+        best_precision=record.best_precision,
+        best_recall=record.best_recall,
+        best_f1_score=record.best_f1_score,
+        submission_count=record.submission_count,
+        last_submission=record.last_submission,
+    )
+
+
+def _after_cursor(model, score: float, submitted_at, user_id: int):
+    """排名顺序中严格排在 (score, submitted_at, user_id) 之后的行"""
+    return or_(
+        model.best_score < score,
+        and_(
+            model.best_score == score,
+            or_(
+                model.best_submitted_at > submitted_at,
+                and_(
+                    model.best_submitted_at == submitted_at,
+                    model.user_id > user_id,
+                ),
+            ),
+        ),
+    )
+
+
+def _ranked_before(record: LeaderboardRecord):
+    """排名顺序中排在 record 之前的行"""
+    return or_(
+        LeaderboardRecord.best_score > record.best_score,
+        and_(
+            LeaderboardRecord.best_score == record.best_score,
+            or_(
+                LeaderboardRecord.best_submitted_at < record.best_submitted_at,
+                and_(
+                    LeaderboardRecord.best_submitted_at == record.best_submitted_at,
+                    LeaderboardRecord.user_id < record.user_id,
+                ),
+            ),
+        ),
+    )
+
+
+def get_leaderboard_entry(db: Session, competition_id: int, user_id: int) -> Optional[LeaderboardEntry]:
+    """某个用户在竞赛排行榜上的条目，名次为排在其前面的人数 + 1"""
+    row = db.query(LeaderboardRecord, User.username)\
+        .join(User, User.id == LeaderboardRecord.user_id)\
+        .filter(LeaderboardRecord.competition_id == competition_id, LeaderboardRecord.user_id == user_id)\
+        .first()
+    if row is None:
+        return None
+    record, username = row
+    ahead = db.query(func.count(LeaderboardRecord.user_id)).filter(
+        LeaderboardRecord.competition_id == competition_id,
+        _ranked_before(record),
+    ).scalar()
+    return _to_entry(ahead + 1, record, username)
+
+
+def _cursor_kind(competition_id: Optional[int]) -> str:
+    return f"leaderboard:{competition_id or 'all'}"
+
+
+async def get_leaderboard_page(
+    db: AsyncSession,
+    competition_id: Optional[int],
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[LeaderboardEntry], int, Optional[str]]:
+    """
+    查询排行榜的一页，返回 (条目, 总人数, 下一页游标)
+
+    指定竞赛时查 leaderboard_entries，总人数取自 competition_stats；
+    不指定竞赛时查 overall_leaderboard_entries（每个用户在所有竞赛中的最佳成绩）。
+    两种情况都从游标位置开始按排名索引取 limit 行。
+    游标中带有上一页最后一名的名次，后续页的名次从这里接着编号。
+    """
+    kind = _cursor_kind(competition_id)
+    model = LeaderboardRecord if competition_id else OverallLeaderboardRecord
+    rank_offset = 0
+
+    stmt = select(model, User.username)\
+        .join(User, User.id == model.user_id)\
+        .order_by(*rank_order(model))\
+        .limit(limit + 1)
+    if cursor:
+        score, submitted_at, user_id, rank_offset = decode_cursor(cursor, kind, float, datetime, int, int)
+        stmt = stmt.where(_after_cursor(model, score, submitted_at, user_id))
+
+    if competition_id:
+        stmt = stmt.where(LeaderboardRecord.competition_id == competition_id)
+        stats = await db.get(CompetitionStats, competition_id)
+        total = stats.total_users if stats is not None else 0
+    else:
+        total = await db.scalar(select(func.count()).select_from(OverallLeaderboardRecord))
+
+    rows = (await db.execute(stmt)).all()
+    page = [
+        (_to_entry(rank, record, username), record)
+        for rank, (record, username) in enumerate(rows[:limit], start=rank_offset + 1)
+    ]
+    return _page_result(page, total, has_more=len(rows) > limit, kind=kind)
+
+
+def _page_result(page, total: int, has_more: bool, kind: str) -> Tuple[List[LeaderboardEntry], int, Optional[str]]:
+    next_cursor = None
+    if has_more and page:
+        entry, record = page[-1]
+        next_cursor = encode_cursor(kind, record.best_score, record.best_submitted_at, record.user_id, entry.rank)
+    return [entry for entry, _ in page], total, next_cursor
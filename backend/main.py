@@ -1,30 +1,46 @@
 """
 FastAPI主应用
 """
+import asyncio
 import os
-import shutil
 from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+from urllib.parse import quote
 
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy import desc, func
+from sqlalchemy import and_, desc, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import get_db, init_db, User, Submission, Competition
+from database import get_db, get_async_db, init_db, async_engine, SessionLocal, User, Submission, Competition
 from schemas import (
     UserCreate, UserLogin, UserResponse, Token,
     SubmissionResponse, SubmissionDetail, LeaderboardEntry, Statistics,
-    CompetitionResponse
+    CompetitionResponse, DatasetManifest, EventTicket
 )
 from auth import (
-    get_password_hash, authenticate_user, create_access_token, get_current_user
+    EVENT_TICKET_TTL_SECONDS, Principal, authenticate_user, create_user_token, get_current_user,
+    issue_event_ticket, principal_cache, redeem_event_ticket, require_metrics_token
 )
-from scoring import evaluate_submission
-from scoring_cci import evaluate_cci_submission
+from answer_cache import preload_answer_keys
+from password_hashing import PasswordHashingBusy, password_hasher
+from competition_stats import get_statistics as get_statistics_summary
+from leaderboard import get_leaderboard_page
+from events import event_broker, publish_leaderboard, publish_submission
+from response_cache import ALL_COMPETITIONS, COMPETITIONS, invalidate_competition, response_cache
+from pagination import PAGINATION_HEADERS, decode_cursor, encode_cursor, page_size, set_page_headers
+from scoring_core import SubmissionFormatError
+from blob_store import blob_store, compaction_loop, submission_file_path
+from dataset_artifacts import artifact_registry
+from file_serving import download_limiter, serve_file
+from rate_limit import scoring_admission, submission_limiter
+from scoring_jobs import apply_result, claim_lease, claim_pending_jobs, find_cached_result, recovery_loop, scoring_queue
+from streaming_scorer import CHUNK_SIZE as UPLOAD_CHUNK_SIZE, create_validator
+from worker_sync import STARTUP_LOCK, WORKERS, file_lock, worker_sync
 
 # 统一的路径设置
 BASE_DIR = Path(__file__).resolve().parent
@@ -49,14 +65,83 @@ def resolve_resource_path(relative_path: str) -> Path:
         raise ValueError(f"非法资源路径: {relative_path}")
     return resolved
 
+def preload_competition_answers():
+    """启动时把各竞赛的答案文件加载到内存，避免每次提交重复解析"""
+    db = SessionLocal()
+    try:
+        answer_files = []
+        for competition in db.query(Competition).all():
+            try:
+                answer_path = resolve_resource_path(competition.answer_path)
+            except ValueError as e:
+                print(f"⚠️  {e}")
+                continue
+            answer_files.append((competition.name, str(answer_path)))
+    finally:
+        db.close()
+
+    loaded = preload_answer_keys(answer_files)
+    for name, answer_key in loaded.items():
+        if answer_key is not None:
+            print(f"✅ 答案已预加载 [{name}]: {len(answer_key)} 个样本")
+    return answer_files
+
+
+def build_dataset_artifacts():
+    """启动时为各竞赛的数据集文件生成独立的压缩包和清单"""
+    db = SessionLocal()
+    try:
+        competitions = []
+        for competition in db.query(Competition).all():
+            try:
+                competitions.append((competition.name, resolve_resource_path(competition.dataset_path)))
+            except ValueError as e:
+                print(f"⚠️  {e}")
+    finally:
+        db.close()
+    artifact_registry.build(competitions)
+
+
 # 初始化数据库 - 使用lifespan事件
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 启动时执行
-    init_db()
-    print("✅ 数据库初始化完成")
+    # 启动时执行（多进程部署时各工作进程依次进行）
+    with file_lock(STARTUP_LOCK):
+        init_db()
+        print("✅ 数据库初始化完成")
+        answer_files = preload_competition_answers()
+        build_dataset_artifacts()
+    event_broker.start()
+    scoring_queue.start(answer_files)
+    password_hasher.start()
+
+    background_tasks = []
+
+    def start_background_tasks():
+        # 只在持有主进程锁的进程中运行：按保留策略整理提交文件，重新排队租约过期的提交
+        background_tasks.append(asyncio.create_task(compaction_loop()))
+        background_tasks.append(asyncio.create_task(recovery_loop(resolve_resource_path)))
+
+    if worker_sync.leader.try_acquire():
+        if not worker_sync.enabled:
+            # 单进程：上次关闭时未完成的提交没有其他进程在评分，立即重新评分
+            for job in claim_pending_jobs(resolve_resource_path):
+                scoring_queue.submit(*job)
+        start_background_tasks()
+    if worker_sync.enabled:
+        background_tasks.append(asyncio.create_task(worker_sync.run(on_leader=start_background_tasks)))
+        print(f"✅ 多进程模式: WORKERS={WORKERS}, 进程 {worker_sync.pid}, 主进程={worker_sync.leader.held}")
+
     yield
-    # 关闭时执行（可选）
+    # 关闭时执行：停止后台任务，等待进行中的评分任务，结束实时连接，释放异步连接池
+    for task in background_tasks:
+        task.cancel()
+    await scoring_queue.shutdown()
+    await worker_sync.flush()
+    worker_sync.leader.release()
+    event_broker.close()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -75,6 +160,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=PAGINATION_HEADERS,
 )
 
 
@@ -93,42 +179,79 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/metrics", dependencies=[Depends(require_metrics_token)])
+def metrics():
+    """后台执行器的排队情况（需要 METRICS_TOKEN）"""
+    return {
+        "password_hashing": password_hasher.metrics(),
+        "auth_cache": principal_cache.metrics(),
+        "downloads": download_limiter.metrics(),
+        "response_cache": response_cache.metrics(),
+        "events": event_broker.metrics(),
+        "scoring": {"pending_jobs": scoring_queue.pending_count, "admission": scoring_admission.metrics()},
+        "submission_rate_limit": submission_limiter.metrics(),
+        "workers": worker_sync.metrics(),
+    }
+
+
+def hashing_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="服务器繁忙，请稍后重试",
+        headers={"Retry-After": "1"},
+    )
+
+
 # ==================== 用户认证 ====================
-@app.post("/api/auth/register", response_model=Token)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    """用户注册"""
+async def check_registration_conflicts(db: AsyncSession, user_data: UserCreate) -> None:
+    """用户名或邮箱已被使用时抛出 400"""
     # 检查用户名是否已存在
-    if db.query(User).filter(User.username == user_data.username).first():
+    result = await db.execute(select(User.id).where(User.username == user_data.username))
+    if result.first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="用户名已存在"
         )
     
     # 检查邮箱是否已存在
-    if db.query(User).filter(User.email == user_data.email).first():
+    result = await db.execute(select(User.id).where(User.email == user_data.email))
+    if result.first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="邮箱已被注册"
         )
-    
-    # 处理密码长度（bcrypt限制72字节）
-    password = user_data.password
-    if len(password.encode('utf-8')) > 72:
-        password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
+
+
+@app.post("/api/auth/register", response_model=Token)
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """用户注册"""
+    # 先检查用户名和邮箱，重复的注册请求不占用哈希进程池
+    await check_registration_conflicts(db, user_data)
+    # 结束事务、把连接还给连接池，再等待密码哈希（bcrypt在哈希进程池中计算，超过72字节的部分截断）
+    await db.commit()
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHashingBusy:
+        raise hashing_busy_exception()
     
     # 创建新用户
-    hashed_password = get_password_hash(password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
         hashed_password=hashed_password
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 等待哈希期间其他请求注册了相同的用户名或邮箱
+        await db.rollback()
+        await check_registration_conflicts(db, user_data)
+        raise
+    await db.refresh(new_user)
     
     # 生成访问令牌
-    access_token = create_access_token(data={"sub": new_user.username})
+    access_token = create_user_token(new_user)
     
     return {
         "access_token": access_token,
@@ -138,9 +261,12 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @app.post("/api/auth/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """用户登录"""
-    user = authenticate_user(db, user_data.username, user_data.password)
+    try:
+        user = await authenticate_user(db, user_data.username, user_data.password)
+    except PasswordHashingBusy:
+        raise hashing_busy_exception()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -148,7 +274,7 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_user_token(user)
     
     return {
         "access_token": access_token,
@@ -158,43 +284,50 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
 
 
 @app.get("/api/auth/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: Principal = Depends(get_current_user)):
     """获取当前用户信息"""
     return current_user
 
 
 # ==================== 竞赛管理 ====================
 @app.get("/api/competitions", response_model=List[CompetitionResponse])
-def get_competitions(db: Session = Depends(get_db)):
+async def get_competitions(request: Request, db: AsyncSession = Depends(get_async_db)):
     """获取所有竞赛列表"""
-    competitions = db.query(Competition).filter(Competition.is_active == 1).all()
-    return competitions
+    async def build(response: Response):
+        result = await db.execute(select(Competition).where(Competition.is_active == 1))
+        return [CompetitionResponse.model_validate(c) for c in result.scalars().all()]
+
+    return await response_cache.respond(request, COMPETITIONS, build)
 
 
 @app.get("/api/competitions/{competition_id}", response_model=CompetitionResponse)
-def get_competition(competition_id: int, db: Session = Depends(get_db)):
+async def get_competition(competition_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """获取单个竞赛详情"""
-    competition = db.query(Competition).filter(Competition.id == competition_id).first()
-    if not competition:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="竞赛不存在"
-        )
-    return competition
+    async def build(response: Response):
+        competition = await db.get(Competition, competition_id)
+        if not competition:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="竞赛不存在"
+            )
+        return CompetitionResponse.model_validate(competition)
+
+    return await response_cache.respond(request, COMPETITIONS, build)
 
 
 # ==================== 提交管理 ====================
-@app.post("/api/submissions", response_model=SubmissionDetail)
+@app.post("/api/submissions", response_model=SubmissionDetail, status_code=status.HTTP_202_ACCEPTED)
 async def submit_prediction(
     competition_id: int,
+    response: Response,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """提交预测结果CSV文件"""
+    """提交预测结果CSV文件，评分在后台异步完成；相同文件已评分过时直接返回结果"""
     
     # 验证竞赛是否存在
-    competition = db.query(Competition).filter(Competition.id == competition_id).first()
+    competition = await db.get(Competition, competition_id)
     if not competition:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -208,102 +341,141 @@ async def submit_prediction(
             detail="只能上传CSV文件"
         )
     
-    # 生成唯一的文件名
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{current_user.username}_{timestamp}_{file.filename}"
-    file_path = SUBMISSIONS_DIR / filename
-    
-    # 保存文件
+    # 按竞赛类型创建上传校验器
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        answer_path = resolve_resource_path(competition.answer_path)
+        validator = create_validator(competition.name, str(answer_path))
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"未知的竞赛类型: {competition.name}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"文件保存失败: {str(e)}"
+            detail=f"评分失败: {str(e)}"
         )
     
-    # 先评分，只有成功才保存提交记录
+    # 显示给用户的文件名
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{current_user.username}_{timestamp}_{file.filename}"
+    
+    # 读取上传内容之前检查评分队列和提交频率，被拒绝的请求不写磁盘
+    await scoring_admission.check(db)
+    await submission_limiter.check(current_user.id, competition_id)
+    
+    # 读取上传内容期间不占用数据库连接：结束事务把连接还给连接池，查询复用结果和写入
+    # 提交记录时再重新获取，几个慢速上传不会占满异步连接池
+    await db.commit()
+    
+    # 单次遍历上传内容：边压缩写入存储边检查表头和行数、计算内容哈希，格式错误时立即停止
+    writer = blob_store.writer()
     try:
-        answer_path = resolve_resource_path(competition.answer_path)
-        if competition.name == "ppi":
-            result = evaluate_submission(str(file_path), str(answer_path))
-        elif competition.name == "cci":
-            result = evaluate_cci_submission(str(file_path), str(answer_path))
-        else:
-            # 删除临时文件
-            if file_path.exists():
-                file_path.unlink()
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"未知的竞赛类型: {competition.name}"
-            )
-        
-        # 检查评分结果
-        if result['status'] != 'success':
-            # 删除临时文件
-            if file_path.exists():
-                file_path.unlink()
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=result.get('error_message', '评分失败')
-            )
-        
-        # 评分成功，创建提交记录
-        submission = Submission(
-            user_id=current_user.id,
-            competition_id=competition_id,
-            filename=filename,
-            status='success',
-            accuracy=result['accuracy'],
-            precision=result['precision'],
-            recall=result['recall'],
-            f1_score=result['f1'],
-            final_score=result['final_score'],
-            tp=result['tp'],
-            tn=result['tn'],
-            fp=result['fp'],
-            fn=result['fn']
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+            validator.feed(chunk)
+        validator.finish()
+        # 按内容哈希保存，相同内容只保留一份
+        content_hash = writer.commit()
+    except SubmissionFormatError as e:
+        # 删除临时文件，格式错误的提交不计入提交次数
+        writer.discard()
+        await submission_limiter.refund(current_user.id, competition_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        db.add(submission)
-        db.commit()
-        db.refresh(submission)
-        
-        return submission
-        
-    except HTTPException:
-        # 重新抛出 HTTP 异常
-        raise
     except Exception as e:
         # 删除临时文件
-        if file_path.exists():
-            file_path.unlink()
+        writer.discard()
+        await submission_limiter.refund(current_user.id, competition_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"评分失败: {str(e)}"
+            detail=f"文件保存失败: {str(e)}"
         )
+    
+    submission = Submission(
+        user_id=current_user.id,
+        competition_id=competition_id,
+        filename=filename,
+        status='pending',
+        content_hash=content_hash,
+        answer_version=validator.answer_version
+    )
+    file_path = submission_file_path(submission)
+    
+    # 本人的同一文件已在当前答案版本下评分过：直接复用结果
+    cached_result = await find_cached_result(
+        db, current_user.id, competition_id, content_hash, validator.answer_version
+    )
+    if cached_result is not None:
+        db.add(submission)
+        await db.flush()
+        await db.run_sync(lambda session: apply_result(session, submission, cached_result))
+        await db.commit()
+        invalidate_competition(competition_id)
+        await db.refresh(submission)
+        publish_submission(submission)
+        await db.run_sync(lambda session: publish_leaderboard(session, submission))
+        response.status_code = status.HTTP_200_OK
+        return submission
+    
+    # 创建待评分的提交记录，评分交给本进程的后台工作进程
+    claim_lease(submission)
+    db.add(submission)
+    await db.commit()
+    await db.refresh(submission)
+    publish_submission(submission)
+    scoring_queue.submit(submission.id, competition.name, str(answer_path), str(file_path))
+    
+    return submission
 
 
 @app.get("/api/submissions/me", response_model=List[SubmissionDetail])
-def get_my_submissions(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    limit: int = 50
+async def get_my_submissions(
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = 50,
+    cursor: Optional[str] = None
 ):
-    """获取当前用户的所有提交记录"""
-    submissions = db.query(Submission)\
-        .filter(Submission.user_id == current_user.id)\
-        .order_by(desc(Submission.submitted_at))\
-        .limit(limit)\
-        .all()
-    
+    """获取当前用户的提交记录（按提交时间倒序，通过 cursor 翻页）"""
+    limit = page_size(limit)
+    kind = f"submissions:{current_user.id}"
+    stmt = (
+        select(Submission)
+        .where(Submission.user_id == current_user.id)
+        .order_by(desc(Submission.submitted_at), desc(Submission.id))
+        .limit(limit + 1)
+    )
+    if cursor:
+        submitted_at, submission_id = decode_cursor(cursor, kind, datetime, int)
+        stmt = stmt.where(or_(
+            Submission.submitted_at < submitted_at,
+            and_(Submission.submitted_at == submitted_at, Submission.id < submission_id),
+        ))
+    submissions = (await db.execute(stmt)).scalars().all()
+
+    # 只扫描索引 (user_id, submitted_at) 中该用户的部分
+    total = await db.scalar(
+        select(func.count()).select_from(Submission).where(Submission.user_id == current_user.id)
+    )
+    next_cursor = None
+    if len(submissions) > limit:
+        submissions = submissions[:limit]
+        last = submissions[-1]
+        next_cursor = encode_cursor(kind, last.submitted_at, last.id)
+    set_page_headers(response, total, next_cursor)
     return submissions
 
 
 @app.get("/api/submissions/{submission_id}", response_model=SubmissionDetail)
 def get_submission(
     submission_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """获取单个提交的详细信息"""
@@ -327,153 +499,80 @@ def get_submission(
 
 # ==================== 排行榜 ====================
 @app.get("/api/leaderboard", response_model=List[LeaderboardEntry])
-def get_leaderboard(
+async def get_leaderboard(
+    request: Request,
     competition_id: int = None,
-    db: Session = Depends(get_db),
-    limit: int = 100
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = 100,
+    cursor: Optional[str] = None
 ):
-    """获取排行榜（可按竞赛筛选）"""
-    
-    # 使用子查询找出每个用户的最佳提交
-    # 先找出每个用户的最高分
-    best_scores_subquery = db.query(
-        Submission.user_id,
-        func.max(Submission.final_score).label('best_score')
-    ).filter(
-        Submission.status == 'success'
-    )
-    
-    # 如果指定了竞赛ID，则筛选
-    if competition_id:
-        best_scores_subquery = best_scores_subquery.filter(Submission.competition_id == competition_id)
-    
-    best_scores_subquery = best_scores_subquery.group_by(Submission.user_id).subquery()
-    
-    # 找出最佳提交的完整信息（包括 accuracy, precision, recall, f1）
-    best_submissions_query = db.query(
-        Submission.user_id,
-        Submission.final_score,
-        Submission.accuracy,
-        Submission.precision,
-        Submission.recall,
-        Submission.f1_score,
-        Submission.submitted_at
-    ).join(
-        best_scores_subquery,
-        (Submission.user_id == best_scores_subquery.c.user_id) &
-        (Submission.final_score == best_scores_subquery.c.best_score)
-    ).filter(
-        Submission.status == 'success'
-    )
-    
-    if competition_id:
-        best_submissions_query = best_submissions_query.filter(Submission.competition_id == competition_id)
-    
-    # 对于有多个相同最高分的情况，取最新的一个
-    best_submissions_subquery = best_submissions_query.distinct(Submission.user_id).subquery()
-    
-    # 统计每个用户的提交次数（只统计当前竞赛）
-    submission_counts_query = db.query(
-        Submission.user_id,
-        func.count(Submission.id).label('submission_count'),
-        func.max(Submission.submitted_at).label('last_submission')
-    ).filter(
-        Submission.status == 'success'
-    )
-    
-    if competition_id:
-        submission_counts_query = submission_counts_query.filter(Submission.competition_id == competition_id)
-    
-    submission_counts_subquery = submission_counts_query.group_by(Submission.user_id).subquery()
-    
-    # 组合所有信息
-    results = db.query(
-        User.id,
-        User.username,
-        best_submissions_subquery.c.final_score,
-        best_submissions_subquery.c.accuracy,
-        best_submissions_subquery.c.precision,
-        best_submissions_subquery.c.recall,
-        best_submissions_subquery.c.f1_score,
-        submission_counts_subquery.c.submission_count,
-        submission_counts_subquery.c.last_submission
-    ).join(
-        best_submissions_subquery, User.id == best_submissions_subquery.c.user_id
-    ).join(
-        submission_counts_subquery, User.id == submission_counts_subquery.c.user_id
-    ).order_by(
-        desc(best_submissions_subquery.c.final_score)
-    ).limit(limit).all()
-    
-    # 构建排行榜
-    leaderboard = []
-    for rank, row in enumerate(results, start=1):
-        leaderboard.append(LeaderboardEntry(
-            rank=rank,
-            user_id=row[0],
-            username=row[1],
-            best_score=row[2],
-            best_accuracy=row[3],
-            best_precision=row[4],
-            best_recall=row[5],
-            best_f1_score=row[6],
-            submission_count=row[7],
-            last_submission=row[8]
-        ))
-    
-    return leaderboard
+    """获取排行榜（可按竞赛筛选，通过 cursor 翻页）"""
+    async def build(response: Response):
+        entries, total, next_cursor = await get_leaderboard_page(db, competition_id, page_size(limit), cursor)
+        set_page_headers(response, total, next_cursor)
+        return entries
+
+    return await response_cache.respond(request, competition_id or ALL_COMPETITIONS, build)
+
+
+# ==================== 实时事件 ====================
+@app.post("/api/competitions/{competition_id}/events/ticket", response_model=EventTicket)
+async def create_events_ticket(
+    competition_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """换取实时事件流的一次性票据（EventSource 不能设置请求头，票据代替 JWT 放在 URL 中）"""
+    competition = await db.get(Competition, competition_id)
+    if not competition:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="竞赛不存在"
+        )
+    ticket = await issue_event_ticket(db, current_user.id, competition_id)
+    return EventTicket(ticket=ticket, expires_in=EVENT_TICKET_TTL_SECONDS)
+
+
+@app.get("/api/competitions/{competition_id}/events")
+async def competition_events(
+    competition_id: int,
+    ticket: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    竞赛的实时事件流（SSE）：排行榜变化，以及登录用户自己的评分状态
+
+    登录用户先通过 POST .../events/ticket 换取票据，再以 ticket 参数建立连接；
+    票据只能使用一次，重连时需要换取新票据。不带票据时只接收排行榜事件。
+    """
+    competition = await db.get(Competition, competition_id)
+    if not competition:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="竞赛不存在"
+        )
+    user_id = await redeem_event_ticket(db, ticket, competition_id) if ticket else None
+    # 长连接期间不占用数据库连接
+    await db.close()
+    return event_broker.stream(competition_id, user_id)
 
 
 # ==================== 统计信息 ====================
 @app.get("/api/statistics", response_model=Statistics)
-def get_statistics(competition_id: int = None, db: Session = Depends(get_db)):
+async def get_statistics(request: Request, competition_id: int = None, db: AsyncSession = Depends(get_async_db)):
     """获取平台统计信息（可按竞赛筛选）"""
-    
-    # 统计参与用户数（有成功提交的用户）
-    user_query = db.query(func.count(func.distinct(Submission.user_id))).filter(
-        Submission.status == 'success'
-    )
-    if competition_id:
-        user_query = user_query.filter(Submission.competition_id == competition_id)
-    total_users = user_query.scalar()
-    
-    # 统计提交次数（只统计成功的）
-    submission_query = db.query(func.count(Submission.id)).filter(
-        Submission.status == 'success'
-    )
-    if competition_id:
-        submission_query = submission_query.filter(Submission.competition_id == competition_id)
-    total_submissions = submission_query.scalar()
-    
-    # 统计最佳分数和平均分数
-    score_query = db.query(Submission).filter(Submission.status == 'success')
-    if competition_id:
-        score_query = score_query.filter(Submission.competition_id == competition_id)
-    
-    successful_submissions = score_query.all()
-    
-    if successful_submissions:
-        scores = [s.final_score for s in successful_submissions if s.final_score is not None]
-        avg_score = sum(scores) / len(scores) if scores else 0
-        best_score = max(scores) if scores else 0
-    else:
-        avg_score = 0
-        best_score = 0
-    
-    return Statistics(
-        total_users=total_users,
-        total_submissions=total_submissions,
-        avg_score=avg_score,
-        best_score=best_score
-    )
+    async def build(response: Response):
+        return await get_statistics_summary(db, competition_id)
+
+    return await response_cache.respond(request, competition_id or ALL_COMPETITIONS, build)
 
 
 # ==================== 数据下载 ====================
 @app.get("/api/download/dataset/{competition_id}")
-def download_dataset(competition_id: int, db: Session = Depends(get_db)):
-    """下载竞赛数据集"""
+async def download_dataset(competition_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """下载竞赛数据集（支持 ETag/304 和断点续传）"""
     # 获取竞赛信息
-    competition = db.query(Competition).filter(Competition.id == competition_id).first()
+    competition = await db.get(Competition, competition_id)
     if not competition:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -481,19 +580,78 @@ def download_dataset(competition_id: int, db: Session = Depends(get_db)):
         )
     
     file_path = resolve_resource_path(competition.dataset_path)
-    if not file_path.exists():
+    if not file_path.is_file():
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="数据集文件不存在"
         )
     
-    return FileResponse(
-        path=str(file_path),
+    return await serve_file(
+        request,
+        file_path,
         filename=os.path.basename(competition.dataset_path),
         media_type="application/gzip"
     )
 
 
+@app.get("/api/datasets/{competition_id}/manifest", response_model=DatasetManifest)
+async def get_dataset_manifest(competition_id: int, db: AsyncSession = Depends(get_async_db)):
+    """获取竞赛数据集的文件清单（每个文件可单独下载）"""
+    competition = await db.get(Competition, competition_id)
+    if not competition:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="竞赛不存在"
+        )
+    
+    manifest = artifact_registry.manifest(competition.name)
+    if manifest is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="数据集文件不存在"
+        )
+    
+    return {
+        "competition_id": competition.id,
+        "competition": competition.name,
+        "generated_at": manifest["generated_at"],
+        "files": [
+            {**entry, "url": f"/api/datasets/{competition.id}/files/{quote(entry['name'])}"}
+            for entry in manifest["files"]
+        ],
+    }
+
+
+@app.get("/api/datasets/{competition_id}/files/{filename}")
+async def download_dataset_file(
+    competition_id: int,
+    filename: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """下载数据集中的单个文件（单独压缩，支持 ETag/304 和断点续传）"""
+    competition = await db.get(Competition, competition_id)
+    if not competition:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="竞赛不存在"
+        )
+    
+    artifact_path = artifact_registry.artifact_path(competition.name, filename)
+    if artifact_path is None or not artifact_path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="数据集文件不存在"
+        )
+    
+    return await serve_file(
+        request,
+        artifact_path,
+        filename=artifact_path.name,
+        media_type="application/gzip" if artifact_path.suffix == ".gz" else "application/octet-stream"
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     from dotenv import load_dotenv
@@ -506,6 +664,10 @@ if __name__ == "__main__":
     host = os.getenv("SERVER_HOST", "0.0.0.0")
     port = int(os.getenv("SERVER_PORT", "8000"))
     reload = os.getenv("RELOAD", "true").lower() == "true"
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1:
+        # uvicorn 不支持同时使用 reload 和多个工作进程
+        reload = False
     
-    print(f"🚀 启动配置: SERVER_HOST={host}, SERVER_PORT={port}, RELOAD={reload}")
-    uvicorn.run("main:app", host=host, port=port, reload=reload)
+    print(f"🚀 启动配置: SERVER_HOST={host}, SERVER_PORT={port}, RELOAD={reload}, WORKERS={workers}")
+    uvicorn.run("main:app", host=host, port=port, reload=reload, workers=workers)
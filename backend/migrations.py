@@ -0,0 +1,110 @@
+"""
+数据库迁移 - 轻量的版本化迁移执行器
+
+Base.metadata.create_all() 只会创建缺失的表，不会修改已有的表（新增索引、列等），
+已部署的数据库通过这里按版本号顺序执行迁移。每个迁移与其版本记录在同一事务中提交，
+已应用的版本记录在 schema_migrations 表中。
+
+新增迁移：编写 migrate_xxx(db) 函数，并追加到 MIGRATIONS 末尾（版本号递增，不要修改已有条目）。
+"""
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Column, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from blob_store import import_legacy_files
+from competition_stats import rebuild_statistics
+from database import SchemaMigration, Submission
+from leaderboard import rebuild_leaderboard, rebuild_overall_leaderboard
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Session], None]
+
+
+def create_indexes(db: Session, table, names: Optional[Iterable[str]] = None) -> None:
+    """创建表上声明但数据库中还不存在的索引（可只创建指定名称的索引）"""
+    connection = db.connection()
+    names = set(names) if names is not None else None
+    for index in table.indexes:
+        if names is None or index.name in names:
+            index.create(bind=connection, checkfirst=True)
+
+
+def add_column(db: Session, table, column: Column) -> None:
+    """给已有的表添加模型中声明的列（已存在时跳过）"""
+    connection = db.connection()
+    existing = {c["name"] for c in inspect(connection).get_columns(table.name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+
+
+def migrate_submission_indexes(db: Session) -> None:
+    create_indexes(db, Submission.__table__, [
+        "ix_submissions_competition_status_user_score",
+        "ix_submissions_user_submitted_at",
+        "ix_submissions_status",
+    ])
+
+
+def migrate_rebuild_aggregates(db: Session) -> None:
+    rebuild_leaderboard(db)
+    rebuild_statistics(db)
+
+
+def migrate_submission_content_hash(db: Session) -> None:
+    table = Submission.__table__
+    add_column(db, table, table.c.content_hash)
+    add_column(db, table, table.c.answer_version)
+    create_indexes(db, table, ["ix_submissions_competition_content_hash"])
+
+
+def migrate_overall_leaderboard(db: Session) -> None:
+    # 表本身由 create_all 创建，这里根据已有的各竞赛排行榜填充
+    rebuild_overall_leaderboard(db)
+
+
+def migrate_submission_scoring_lease(db: Session) -> None:
+    table = Submission.__table__
+    add_column(db, table, table.c.scoring_owner)
+    add_column(db, table, table.c.scoring_heartbeat)
+
+
+def migrate_legacy_submission_files(db: Session) -> None:
+    imported = import_legacy_files(db)
+    if imported:
+        print(f"✅ 已迁入 {imported} 个早期提交文件")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "submissions 表复合索引", migrate_submission_indexes),
+    Migration(2, "根据已有提交重建排行榜和竞赛统计", migrate_rebuild_aggregates),
+    Migration(3, "submissions 表增加内容哈希和答案版本", migrate_submission_content_hash),
+    Migration(4, "根据各竞赛排行榜生成跨竞赛排行榜", migrate_overall_leaderboard),
+    Migration(5, "submissions 表增加评分租约", migrate_submission_scoring_lease),
+    Migration(6, "早期提交文件迁入 blob 存储", migrate_legacy_submission_files),
+]
+
+
+def run_migrations(engine: Engine) -> List[Tuple[int, str]]:
+    """执行尚未应用的迁移，返回本次应用的 (版本号, 描述) 列表"""
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+
+    with Session(engine) as db:
+        applied = {version for (version,) in db.query(SchemaMigration.version).all()}
+
+    newly_applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        with Session(engine) as db:
+            migration.apply(db)
+            db.add(SchemaMigration(version=migration.version, description=migration.description))
+            db.commit()
+        newly_applied.append((migration.version, migration.description))
+    return newly_applied
@@ -0,0 +1,81 @@
+"""
+游标分页 - 排行榜与提交记录的 keyset 分页
+
+游标是上一页最后一行的排序键（base64url 编码的 JSON），下一页查询为
+"排序键严格排在游标之后" 的范围扫描加 LIMIT，直接从索引上的对应位置开始读取，
+深页与第一页的代价相同（OFFSET 需要先扫过前面所有行）。
+
+列表接口的响应体仍是数组，分页信息放在响应头中：
+    X-Next-Cursor   下一页的游标，没有更多数据时不返回
+    X-Total-Count   总行数
+"""
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Response, status
+
+# 每页行数上限
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+PAGINATION_HEADERS = [NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER]
+
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any, expected: type) -> Any:
+    """按排序键的类型还原游标中的值，类型不符时抛出 ValueError"""
+    if expected is datetime:
+        if isinstance(value, dict) and isinstance(value.get("dt"), str):
+            return datetime.fromisoformat(value["dt"])
+    # bool 是 int 的子类，不能作为数值
+    elif isinstance(value, bool):
+        pass
+    elif expected is float and isinstance(value, (int, float)):
+        return float(value)
+    elif isinstance(value, expected):
+        return value
+    raise ValueError(value)
+
+
+def encode_cursor(kind: str, *values: Any) -> str:
+    """把排序键编码为不透明的游标；kind 区分不同列表，游标不能混用"""
+    payload = json.dumps([kind, [_encode_value(v) for v in values]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str, *types: type) -> List[Any]:
+    """
+    解码游标，types 为各排序键的类型（datetime / float / int）
+
+    游标来自客户端，格式、个数或类型不正确时抛出 400，不会带着错误类型的值进入查询。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_kind, values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if cursor_kind != kind or not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [_decode_value(v, expected) for v, expected in zip(values, types)]
+    except (ValueError, TypeError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+
+def set_page_headers(response: Response, total: int, next_cursor: Optional[str]) -> None:
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
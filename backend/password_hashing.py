@@ -0,0 +1,138 @@
+"""
+密码哈希 - 在独立的进程池中执行 bcrypt，避免阻塞事件循环和共享线程池
+
+bcrypt 每次计算约耗时数百毫秒 CPU，集中登录时会拖慢所有请求。
+登录/注册接口通过 password_hasher.hash()/verify() 把计算交给进程池，
+同时执行的任务数不超过工作进程数，排队任务数超过上限时直接拒绝。
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from passlib.context import CryptContext
+
+from worker_sync import WORKERS
+
+# bcrypt 计算轮数（cost），每加1计算时间翻倍
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# 每个服务进程的哈希工作进程数（默认由 WORKERS 个服务进程平分CPU核数）与最大排队数
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // WORKERS))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", str(PASSWORD_HASH_WORKERS * 32)))
+
+# 密码加密上下文
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt 只使用密码的前72字节
+BCRYPT_MAX_BYTES = 72
+
+
+def truncate_password(password: str) -> str:
+    """bcrypt限制密码最多72字节，超过的部分截断"""
+    if len(password.encode('utf-8')) > BCRYPT_MAX_BYTES:
+        password = password.encode('utf-8')[:BCRYPT_MAX_BYTES].decode('utf-8', errors='ignore')
+    return password
+
+
+def hash_password(password: str) -> str:
+    """获取密码哈希（同步执行）"""
+    return pwd_context.hash(truncate_password(password))
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（同步执行）"""
+    return pwd_context.verify(truncate_password(plain_password), hashed_password)
+
+
+class PasswordHashingBusy(Exception):
+    """排队的哈希任务过多"""
+
+
+class PasswordHasher:
+    """有界并发的 bcrypt 进程池"""
+
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # 指标
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._total_wait = 0.0
+        self._total_compute = 0.0
+
+    def start(self) -> None:
+        if self._pool is not None:
+            return
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._slots = asyncio.Semaphore(self.max_workers)
+        print(f"✅ 密码哈希进程池已启动: {self.max_workers} 个工作进程, bcrypt rounds={BCRYPT_ROUNDS}")
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._slots = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(check_password, plain_password, hashed_password)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        if self._pool is None:
+            # 进程池未启动（如脚本中调用）时退回默认线程池
+            return await loop.run_in_executor(None, func, *args)
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHashingBusy()
+
+        enqueued_at = time.perf_counter()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self._pool, func, *args)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            self.completed += 1
+            self._total_wait += started_at - enqueued_at
+            self._total_compute += time.perf_counter() - started_at
+
+    def metrics(self) -> Dict:
+        """排队和耗时指标"""
+        completed = self.completed or 1
+        return {
+            "workers": self.max_workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "queue_depth": self.queued,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self._total_wait / completed * 1000, 2),
+            "avg_compute_ms": round(self._total_compute / completed * 1000, 2),
+        }
+
+
+# 全局哈希进程池，在应用 lifespan 中启动和关闭
+password_hasher = PasswordHasher()
@@ -0,0 +1,246 @@
+"""
+PPI 数据集的列式二进制格式
+
+train/valid/test.csv 的每一行都重复保存两条完整的氨基酸序列，而同一个蛋白质会出现在
+很多行中。列式格式把每个蛋白质的序列只保存一次，样本只保存蛋白质编号：
+
+    protein_ids.npy        (P,)    定长字节串，蛋白质ID
+    sequences.npy          (L,)    uint8，所有序列按编号顺序拼接（ASCII）
+    sequence_offsets.npy   (P+1,)  int64，第 i 个序列为 sequences[offsets[i]:offsets[i+1]]
+    {split}_pairs.npy      (N, 2)  int32，protein_A / protein_B 的编号
+    {split}_labels.npy     (N,)    int8，仅 train/valid 有
+    meta.json                      格式版本、包含的数据划分和样本数
+
+目录形式可以用 mmap 直接映射（np.load(mmap_mode="r")），加载时不需要解析 CSV；
+同样的数组也可以打包成单个 .npz 供下载。
+
+用法：
+    python ppi_columnar.py ../kaggle_dataset ../kaggle_dataset_columnar [--npz ppi_columnar.npz]
+"""
+import argparse
+import csv
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+FORMAT_VERSION = 1
+SPLITS = ("train", "valid", "test")
+META_NAME = "meta.json"
+REQUIRED_COLUMNS = ("protein_A", "protein_B", "sequence_A", "sequence_B")
+
+
+def _read_split(path: Path, proteins: Dict[str, int], sequences: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """读取一个数据划分，新出现的蛋白质追加到蛋白质表中；格式错误时抛出 ValueError"""
+    pairs: List[Tuple[int, int]] = []
+    labels: List[int] = []
+    with open(path, "r", newline="") as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing:
+            raise ValueError(f"{path.name} 缺少列: {', '.join(missing)}")
+        has_label = "label" in columns
+        for line, row in enumerate(reader, start=2):
+            if None in row or None in row.values():
+                raise ValueError(f"{path.name} 第 {line} 行的列数与表头不一致")
+            pair = []
+            for id_col, seq_col in (("protein_A", "sequence_A"), ("protein_B", "sequence_B")):
+                protein_id = row[id_col]
+                sequence = row[seq_col]
+                if not protein_id or not sequence.isascii():
+                    raise ValueError(f"{path.name} 第 {line} 行的蛋白质ID为空或序列不是 ASCII")
+                idx = proteins.get(protein_id)
+                if idx is None:
+                    idx = proteins[protein_id] = len(sequences)
+                    sequences.append(sequence)
+                elif sequences[idx] != sequence:
+                    raise ValueError(f"蛋白质 {protein_id} 在 {path.name} 中的序列与之前不一致")
+                pair.append(idx)
+            pairs.append((pair[0], pair[1]))
+            if has_label:
+                if row["label"] not in ("0", "1"):
+                    raise ValueError(f"{path.name} 第 {line} 行的标签不是 0/1: {row['label']!r}")
+                labels.append(int(row["label"]))
+
+    pair_array = np.asarray(pairs, dtype=np.int32).reshape(-1, 2)
+    label_array = np.asarray(labels, dtype=np.int8) if has_label else None
+    return pair_array, label_array
+
+
+def build_arrays(source_dir: Path) -> Dict[str, np.ndarray]:
+    """把源目录中存在的 train/valid/test.csv 转成列式数组"""
+    proteins: Dict[str, int] = {}
+    sequences: List[str] = []
+    arrays: Dict[str, np.ndarray] = {}
+    splits = []
+
+    for split in SPLITS:
+        path = Path(source_dir) / f"{split}.csv"
+        if not path.exists():
+            continue
+        pairs, labels = _read_split(path, proteins, sequences)
+        arrays[f"{split}_pairs"] = pairs
+        if labels is not None:
+            arrays[f"{split}_labels"] = labels
+        splits.append(split)
+
+    if not splits:
+        raise FileNotFoundError(f"{source_dir} 中没有 train/valid/test.csv")
+
+    encoded = [seq.encode("ascii") for seq in sequences]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(seq) for seq in encoded], out=offsets[1:])
+
+    arrays["protein_ids"] = np.asarray(list(proteins), dtype=np.bytes_)
+    arrays["sequences"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    arrays["sequence_offsets"] = offsets
+    arrays["meta"] = np.frombuffer(json.dumps({
+        "format_version": FORMAT_VERSION,
+        "splits": splits,
+        "num_proteins": len(encoded),
+        "num_samples": {split: int(len(arrays[f"{split}_pairs"])) for split in splits},
+    }).encode("utf-8"), dtype=np.uint8)
+    return arrays
+
+
+def write_columnar(arrays: Dict[str, np.ndarray], output_dir: Path) -> None:
+    """写出可 mmap 的目录形式"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        if name == "meta":
+            (output_dir / META_NAME).write_bytes(array.tobytes())
+        else:
+            np.save(output_dir / f"{name}.npy", array)
+
+
+def write_npz(arrays: Dict[str, np.ndarray], path: Path) -> None:
+    """写出单个压缩 .npz（供下载）；内容相同时文件也相同"""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    # np.savez_compressed 会写入当前时间，这里固定 zip 条目时间，保证输出可复现
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name in sorted(arrays):
+            info = zipfile.ZipInfo(f"{name}.npy", date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zf.open(info, "w") as f:
+                np.lib.format.write_array(f, np.asanyarray(arrays[name]), allow_pickle=False)
+    os.replace(tmp, path)
+
+
+def convert(source_dir: Path, output_dir: Optional[Path] = None, npz_path: Optional[Path] = None) -> Dict:
+    """转换数据集，返回 meta 信息"""
+    arrays = build_arrays(source_dir)
+    if output_dir is not None:
+        write_columnar(arrays, output_dir)
+    if npz_path is not None:
+        write_npz(arrays, npz_path)
+    return json.loads(arrays["meta"].tobytes())
+
+
+class PPIColumnar:
+    """列式 PPI 数据集"""
+
+    def __init__(self, arrays, meta: Dict):
+        self.meta = meta
+        self.protein_ids = arrays["protein_ids"]
+        self.sequences = arrays["sequences"]
+        self.sequence_offsets = arrays["sequence_offsets"]
+        self.splits = {
+            split: (arrays[f"{split}_pairs"], arrays.get(f"{split}_labels"))
+            for split in meta["splits"]
+        }
+
+    def __len__(self) -> int:
+        return len(self.protein_ids)
+
+    def protein_id(self, idx: int) -> str:
+        return self.protein_ids[idx].decode("ascii")
+
+    def sequence(self, idx: int) -> str:
+        start, end = self.sequence_offsets[idx], self.sequence_offsets[idx + 1]
+        return self.sequences[start:end].tobytes().decode("ascii")
+
+    def sequence_lengths(self) -> np.ndarray:
+        return np.diff(self.sequence_offsets)
+
+    def pairs(self, split: str) -> np.ndarray:
+        """(N, 2) 的蛋白质编号"""
+        return self.splits[split][0]
+
+    def labels(self, split: str) -> Optional[np.ndarray]:
+        """标签；test 划分没有标签时返回 None"""
+        return self.splits[split][1]
+
+    def iter_rows(self, split: str) -> Iterator[Tuple[str, str, str, str, Optional[int]]]:
+        """按 CSV 的列顺序返回 (protein_A, protein_B, sequence_A, sequence_B, label)"""
+        pairs, labels = self.splits[split]
+        for i, (a, b) in enumerate(pairs):
+            label = int(labels[i]) if labels is not None else None
+            yield self.protein_id(a), self.protein_id(b), self.sequence(a), self.sequence(b), label
+
+
+class _DirectoryArrays:
+    """按需加载目录中的 .npy 文件"""
+
+    def __init__(self, directory: Path, mmap: bool):
+        self.directory = directory
+        self.mmap_mode = "r" if mmap else None
+
+    def path(self, name: str) -> Path:
+        return self.directory / f"{name}.npy"
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return np.load(self.path(name), mmap_mode=self.mmap_mode, allow_pickle=False)
+
+    def get(self, name: str):
+        return self[name] if self.path(name).exists() else None
+
+
+class _NpzArrays:
+    def __init__(self, npz):
+        self.npz = npz
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.npz[name]
+
+    def get(self, name: str):
+        return self.npz[name] if name in self.npz.files else None
+
+
+def load_columnar(path: Union[str, Path], mmap: bool = True) -> PPIColumnar:
+    """加载目录形式（默认 mmap）或 .npz 形式的列式数据集"""
+    path = Path(path)
+    if path.is_dir():
+        meta = json.loads((path / META_NAME).read_text(encoding="utf-8"))
+        arrays = _DirectoryArrays(path, mmap)
+    else:
+        npz = np.load(path, allow_pickle=False)
+        meta = json.loads(npz["meta"].tobytes())
+        arrays = _NpzArrays(npz)
+
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"不支持的列式格式版本: {meta.get('format_version')}")
+    return PPIColumnar(arrays, meta)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="把 PPI 数据集 CSV 转换为列式格式")
+    parser.add_argument("source_dir", type=Path, help="包含 train/valid/test.csv 的目录")
+    parser.add_argument("output_dir", type=Path, nargs="?", help="输出目录（.npy 文件，可 mmap）")
+    parser.add_argument("--npz", type=Path, help="同时输出单个压缩 .npz 文件")
+    args = parser.parse_args()
+
+    if args.output_dir is None and args.npz is None:
+        parser.error("至少需要指定 output_dir 或 --npz")
+
+    meta = convert(args.source_dir, args.output_dir, args.npz)
+    print(f"✅ 转换完成: {meta['num_proteins']} 个蛋白质, 样本数 {meta['num_samples']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+提交限流 - 每个用户的提交频率限制和评分任务的准入控制
+
+两道检查都在读取上传内容之前进行，被拒绝的请求不会写磁盘、不会占用评分进程：
+
+- 频率限制：每个 (用户, 竞赛) 一个令牌桶，容量 SUBMISSION_BURST，每小时补充
+  SUBMISSIONS_PER_HOUR 个令牌，每次提交消耗一个；令牌用完时返回 429 和
+  Retry-After（下一个令牌补充到的时间）。上传内容格式错误（400）的提交退回令牌，
+  不计入次数。
+  单进程时令牌桶保存在内存中；多进程部署（WORKERS > 1）时保存在数据库的
+  rate_limit_buckets 表中，各进程共用，取令牌是一条带条件的 UPDATE，不会超发
+  （只用标准 SQL，SQLite 和 DATABASE_URL 指定的其他数据库都可以使用）。
+- 准入控制：数据库中待评分（status='pending'）的提交达到 MAX_PENDING_SCORING 时
+  拒绝新的提交（429），排队任务的等待时间因此有上限，个别用户大量提交时其他人的
+  评分不会被无限推迟。按数据库计数，多进程部署时也是全局上限。
+"""
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from database import RateLimitBucket, SessionLocal, Submission
+from worker_sync import WORKERS
+
+# 每个用户在每个竞赛中每小时可提交的次数（<= 0 时不限制）
+SUBMISSIONS_PER_HOUR = float(os.getenv("SUBMISSIONS_PER_HOUR", "30"))
+# 允许连续提交的次数（令牌桶容量）
+SUBMISSION_BURST = int(os.getenv("SUBMISSION_BURST", "5"))
+# 令牌桶保存位置：memory 或 database，默认多进程部署时使用 database
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE") or ("database" if WORKERS > 1 else "memory")
+# 内存中最多保存的令牌桶数，超过时清理已补满的桶
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+# 待评分提交数上限（所有工作进程合计）
+MAX_PENDING_SCORING = int(os.getenv("MAX_PENDING_SCORING", "32"))
+# 评分队列已满时建议客户端等待的秒数
+SCORING_RETRY_AFTER = int(os.getenv("SCORING_RETRY_AFTER", "10"))
+
+
+class MemoryBucketStore:
+    """进程内的令牌桶（只在事件循环中调用）"""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max(1, max_keys)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        """取一个令牌：成功返回 0，否则返回还需等待的秒数"""
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self.max_keys:
+            self._prune(capacity, rate, now)
+        return 0.0
+
+    def give_back(self, key: str, capacity: float) -> None:
+        """退回一个令牌"""
+        if key in self._buckets:
+            tokens, updated = self._buckets[key]
+            self._buckets[key] = (min(capacity, tokens + 1), updated)
+
+    def _prune(self, capacity: float, rate: float, now: float) -> None:
+        # 已补满的桶与不存在的桶等价
+        self._buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * rate < capacity
+        }
+
+    def size(self) -> int:
+        return len(self._buckets)
+
+
+class DatabaseBucketStore:
+    """保存在数据库中的令牌桶，多个工作进程共用（在线程池中调用）"""
+
+    name = "database"
+    blocking = True
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        elapsed = RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * rate
+        refilled = case((elapsed > capacity, capacity), else_=elapsed)
+        db = SessionLocal()
+        try:
+            while True:
+                # 补充令牌并取走一个，令牌不足时不修改
+                taken = db.execute(
+                    update(RateLimitBucket)
+                    .where(RateLimitBucket.key == key, refilled >= 1)
+                    .values(tokens=refilled - 1, updated_at=now)
+                ).rowcount
+                if taken:
+                    db.commit()
+                    return 0.0
+                tokens = db.scalar(select(refilled).where(RateLimitBucket.key == key))
+                if tokens is not None:
+                    db.commit()
+                    return (1 - tokens) / rate
+                # 第一次提交：创建桶并取走一个令牌
+                db.add(RateLimitBucket(key=key, tokens=capacity - 1, updated_at=now))
+                try:
+                    db.commit()
+                    return 0.0
+                except IntegrityError:
+                    # 其他进程同时创建了同一个桶，重新取令牌
+                    db.rollback()
+        finally:
+            db.close()
+
+    def give_back(self, key: str, capacity: float) -> None:
+        returned = RateLimitBucket.tokens + 1
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.key == key)
+                .values(tokens=case((returned > capacity, capacity), else_=returned))
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+def create_bucket_store(name: str = RATE_LIMIT_STORE):
+    if name == "database":
+        return DatabaseBucketStore()
+    return MemoryBucketStore()
+
+
+class SubmissionRateLimiter:
+    """每个 (用户, 竞赛) 的提交频率限制"""
+
+    def __init__(
+        self,
+        per_hour: float = SUBMISSIONS_PER_HOUR,
+        burst: int = SUBMISSION_BURST,
+        store=None,
+    ):
+        self.enabled = per_hour > 0
+        self.capacity = float(max(1, burst))
+        self.rate = max(per_hour, 0.0) / 3600
+        self.store = store or create_bucket_store()
+        self.allowed = 0
+        self.rejected = 0
+        self.refunded = 0
+
+    async def check(self, user_id: int, competition_id: int) -> None:
+        """消耗一次提交机会，超过频率限制时抛出 429"""
+        if not self.enabled:
+            return
+        key = self._key(user_id, competition_id)
+        now = time.time()
+        try:
+            if self.store.blocking:
+                wait = await run_in_threadpool(self.store.take, key, self.capacity, self.rate, now)
+            else:
+                wait = self.store.take(key, self.capacity, self.rate, now)
+        except Exception as e:
+            # 限流存储出错时放行，不影响正常提交
+            print(f"⚠️  提交频率检查失败: {e}")
+            return
+        if wait <= 0:
+            self.allowed += 1
+            return
+        self.rejected += 1
+        retry_after = max(1, math.ceil(wait))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"提交过于频繁，请 {retry_after} 秒后再试",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    async def refund(self, user_id: int, competition_id: int) -> None:
+        """退回 check 消耗的提交机会（上传内容格式错误、保存失败时调用）"""
+        if not self.enabled:
+            return
+        key = self._key(user_id, competition_id)
+        try:
+            if self.store.blocking:
+                await run_in_threadpool(self.store.give_back, key, self.capacity)
+            else:
+                self.store.give_back(key, self.capacity)
+        except Exception as e:
+            print(f"⚠️  提交频率退回失败: {e}")
+            return
+        self.allowed -= 1
+        self.refunded += 1
+
+    @staticmethod
+    def _key(user_id: int, competition_id: int) -> str:
+        return f"submit:{user_id}:{competition_id}"
+
+    def metrics(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "store": self.store.name,
+            "per_hour": self.rate * 3600,
+            "burst": int(self.capacity),
+            "buckets": self.store.size(),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "refunded": self.refunded,
+        }
+
+
+class ScoringAdmission:
+    """评分任务过多时立即拒绝新的提交，而不是继续排队"""
+
+    def __init__(self, limit: int = MAX_PENDING_SCORING):
+        self.limit = max(1, limit)
+        self.rejected = 0
+
+    async def check(self, db: AsyncSession) -> None:
+        """待评分的提交已达上限时抛出 429（按 ix_submissions_status 索引计数）"""
+        pending = await db.scalar(
+            select(func.count()).select_from(Submission).where(Submission.status == 'pending')
+        )
+        if pending < self.limit:
+            return
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="评分队列已满，请稍后重试",
+            headers={"Retry-After": str(SCORING_RETRY_AFTER)},
+        )
+
+    def metrics(self) -> Dict:
+        return {"limit": self.limit, "rejected": self.rejected}
+
+
+submission_limiter = SubmissionRateLimiter()
+scoring_admission = ScoringAdmission()
@@ -0,0 +1,186 @@
+"""
+响应缓存 - 竞赛列表、排行榜、统计等只读接口的进程内缓存与条件请求
+
+这些接口在每次打开页面时都会被请求，而数据只在提交评分成功时才变化。
+缓存以 (路径, 查询参数) 为键保存序列化后的 JSON 响应体，每个条目记录生成时
+所属范围（某个竞赛或全部竞赛）的版本号：
+
+- 评分成功并提交事务后调用 invalidate_competition(competition_id)，该竞赛和 "全部竞赛" 的
+  版本号加一，旧条目在下次访问时重新生成；多进程部署时同时通知其他工作进程（见 worker_sync.py）
+- 命中时直接返回缓存的响应体，不访问数据库、不序列化 Pydantic 模型
+- 响应带 ETag（响应体的 SHA-256）和 Last-Modified（该范围最后一次变化的时间），
+  If-None-Match / If-Modified-Since 匹配时返回 304
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+
+from file_serving import etag_matches
+from worker_sync import worker_sync
+
+# 最多缓存的响应数
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+# 跨竞赛数据（不指定竞赛的排行榜、统计）所属的范围
+ALL_COMPETITIONS = "all"
+
+# 不随提交变化的数据（竞赛列表、竞赛详情）所属的范围
+COMPETITIONS = "competitions"
+
+# 不参与缓存键的响应头
+_SKIPPED_HEADERS = {"content-length", "content-type"}
+
+
+class CachedResponse(NamedTuple):
+    version: int
+    body: bytes
+    etag: str
+    last_modified: float
+    headers: Tuple[Tuple[str, str], ...]
+
+
+class ResponseCache:
+    """按范围版本号失效的响应缓存"""
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self._versions: Dict[Hashable, int] = {}
+        self._modified: Dict[Hashable, float] = {}
+        self._started = time.time()
+        # invalidate 在评分结果写回的线程中调用
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def version(self, scope: Hashable) -> int:
+        return self._versions.get(scope, 0)
+
+    def last_modified(self, scope: Hashable) -> float:
+        return self._modified.get(scope, self._started)
+
+    def invalidate(self, competition_id: Optional[int]) -> None:
+        """竞赛数据已变化（在事务提交之后调用）"""
+        now = time.time()
+        with self._lock:
+            for scope in (competition_id, ALL_COMPETITIONS):
+                if scope is None:
+                    continue
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+                self._modified[scope] = now
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key: Tuple, version: int) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: Tuple, entry: CachedResponse) -> None:
+        with self._lock:
+            current = self._entries.get(key)
+            # 并发生成时保留版本号较新的条目
+            if current is not None and current.version > entry.version:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _not_modified(request: Request, entry: CachedResponse) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, entry.etag)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(entry.last_modified) <= since
+        return False
+
+    async def respond(
+        self,
+        request: Request,
+        scope: Hashable,
+        build: Callable[[Response], Awaitable[Any]],
+    ) -> Response:
+        """
+        返回缓存的响应，或调用 build 生成后缓存
+
+        build 接收一个 Response 用于设置额外的响应头（如分页信息），返回响应数据；
+        build 抛出的异常（如 404）不会被缓存。
+        """
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+        version = self.version(scope)
+
+        entry = self._get(key, version)
+        if entry is None:
+            self.misses += 1
+            extra = Response()
+            content = await build(extra)
+            body = json.dumps(
+                jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+            entry = CachedResponse(
+                version=version,
+                body=body,
+                etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+                last_modified=self.last_modified(scope),
+                headers=tuple(
+                    (name, value) for name, value in extra.headers.items()
+                    if name not in _SKIPPED_HEADERS
+                ),
+            )
+            self._put(key, entry)
+        else:
+            self.hits += 1
+
+        headers = {
+            **dict(entry.headers),
+            "etag": entry.etag,
+            "last-modified": formatdate(entry.last_modified, usegmt=True),
+            # 允许浏览器缓存，但每次使用前都要用 ETag 重新验证
+            "cache-control": "no-cache",
+        }
+        if self._not_modified(request, entry):
+            self.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def metrics(self) -> Dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def invalidate_competition(competition_id: int) -> None:
+    """竞赛数据已变化：使本进程的缓存失效，并通知其他工作进程"""
+    response_cache.invalidate(competition_id)
+    worker_sync.send("invalidate", competition_id)
+
+
+worker_sync.on("invalidate", lambda row: response_cache.invalidate(row.competition_id))
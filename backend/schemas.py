@@ -34,6 +34,11 @@ class Token(BaseModel):
     user: UserResponse
 
 
+class EventTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
+
 # 提交相关模型
 class SubmissionResponse(BaseModel):
     id: int
@@ -110,3 +115,19 @@ class Statistics(BaseModel):
     avg_score: float
     best_score: float
 
+
+# 数据集分文件下载模型
+class DatasetFile(BaseModel):
+    name: str
+    media_type: str
+    size: int
+    sha256: str
+    compressed_size: int
+    url: str
+
+
+class DatasetManifest(BaseModel):
+    competition_id: int
+    competition: str
+    generated_at: datetime
+    files: List[DatasetFile]
@@ -0,0 +1,243 @@
+"""
+评分核心 - PPI 与 CCI 竞赛共用的向量化评分逻辑
+
+提交文件先按样本键对齐到答案缓存（answer_cache.AnswerKey.index），
+之后的预测值校验、混淆矩阵和各项指标全部用 NumPy 数组运算完成。
+"""
+import csv
+import itertools
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from answer_cache import AnswerKey, get_answer_key
+
+# 加权得分
+SCORE_WEIGHTS = {
+    'accuracy': 0.3,
+    'precision': 0.2,
+    'recall': 0.2,
+    'f1': 0.3
+}
+
+# 各竞赛提交文件中的预测列（样本键列见 answer_cache.COMPETITION_KEY_COLUMNS）
+COMPETITION_PREDICTION_COLUMNS = {
+    "ppi": "prediction",
+    "cci": "label",
+}
+
+# 无效预测值在数组中的标记
+INVALID_PREDICTION = -1
+
+
+def error_result(message: str) -> Dict:
+    """构造评分失败的结果"""
+    return {
+        'status': 'error',
+        'error_message': message
+    }
+
+
+def parse_predictions(values: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    将预测值字符串解析为 int8 数组，无效值记为 INVALID_PREDICTION
+
+    常见的 "0"/"1" 走向量化比较，其余值按 int() 的规则逐个解析（如 " 1"、"01"）。
+    """
+    n = len(values)
+    preds = np.full(n, INVALID_PREDICTION, dtype=np.int8)
+    if n == 0:
+        return preds
+
+    raw = np.array([v if v is not None else '' for v in values], dtype=str)
+    preds[raw == '0'] = 0
+    preds[raw == '1'] = 1
+
+    for i in np.flatnonzero(preds == INVALID_PREDICTION):
+        value = values[i]
+        if value is None:
+            continue
+        try:
+            pred = int(value.strip())
+        except ValueError:
+            continue
+        if pred in (0, 1):
+            preds[i] = pred
+    return preds
+
+
+def align_to_answer_key(answer_key: AnswerKey, keys: Sequence) -> np.ndarray:
+    """返回每个提交样本在答案中的行号，不在答案中的记为 -1"""
+    index = answer_key.index
+    return np.fromiter((index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+
+
+def confusion_matrix(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, int]:
+    """一次 bincount 统计 TP/TN/FP/FN"""
+    counts = np.bincount(y_true.astype(np.int64) * 2 + y_pred.astype(np.int64), minlength=4)
+    return {
+        'tn': int(counts[0]),
+        'fp': int(counts[1]),
+        'fn': int(counts[2]),
+        'tp': int(counts[3]),
+    }
+
+
+def compute_metrics(tp: int, tn: int, fp: int, fn: int) -> Dict:
+    """根据混淆矩阵计算各项指标和加权得分"""
+    total = tp + tn + fp + fn
+
+    if total == 0:
+        return error_result('没有有效的预测样本')
+
+    accuracy = (tp + tn) / total if total > 0 else 0
+    precision = tp / (tp + fp) if (tp + fp) > 0 else 0
+    recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
+
+    final_score = (
+        accuracy * SCORE_WEIGHTS['accuracy'] +
+        precision * SCORE_WEIGHTS['precision'] +
+        recall * SCORE_WEIGHTS['recall'] +
+        f1 * SCORE_WEIGHTS['f1']
+    )
+
+    return {
+        'status': 'success',
+        'accuracy': accuracy,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'final_score': final_score,
+        'tp': tp,
+        'tn': tn,
+        'fp': fp,
+        'fn': fn,
+        'total': total
+    }
+
+
+def score_predictions(answer_key: AnswerKey, keys: Sequence, predictions: Sequence[Optional[str]]) -> Dict:
+    """
+    对已去重的提交样本评分
+
+    keys / predictions 一一对应；错误提示与原先逐行评分的实现保持一致。
+    """
+    if len(keys) != len(answer_key):
+        return error_result(f'提交样本数({len(keys)}) 不等于 测试集样本数({len(answer_key)})')
+
+    positions = align_to_answer_key(answer_key, keys)
+    found = positions >= 0
+
+    missing = len(answer_key) - int(np.count_nonzero(found))
+    if missing:
+        return error_result(f'{missing} 个样本缺失')
+
+    preds = parse_predictions(predictions)
+    invalid = preds == INVALID_PREDICTION
+    if invalid.any():
+        # 按答案文件顺序报告第一个无效值
+        invalid_rows = np.flatnonzero(invalid)
+        first = invalid_rows[np.argmin(positions[invalid_rows])]
+        return error_result(
+            f'{len(invalid_rows)} 个无效预测值（应为0或1）。例如: {keys[first]} -> "{predictions[first]}"'
+        )
+
+    labels = np.frombuffer(answer_key.labels, dtype=np.uint8)
+    counts = confusion_matrix(labels[positions], preds)
+    return compute_metrics(counts['tp'], counts['tn'], counts['fp'], counts['fn'])
+
+
+class SubmissionFormatError(ValueError):
+    """提交文件格式错误，消息可直接返回给用户"""
+
+
+def check_header(header: Optional[List[str]], required_cols: List[str], has_rows: bool) -> None:
+    """校验表头，失败时抛出 SubmissionFormatError"""
+    if header is None or not has_rows:
+        raise SubmissionFormatError('提交文件为空')
+
+    for col in required_cols:
+        if col not in header:
+            raise SubmissionFormatError(f'缺少必需列 "{col}"。要求的列: {required_cols}')
+
+
+def read_submission(submission_file: str, key_cols: List[str], prediction_col: str):
+    """
+    读取提交文件，返回 (样本键列表, 预测值列表)
+
+    样本键重复时抛出 SubmissionFormatError（与上传校验、流式评分的规则相同）。
+    """
+    required_cols = key_cols + [prediction_col]
+
+    with open(submission_file, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        first_row = next((row for row in reader if row), None)
+        check_header(header, required_cols, first_row is not None)
+
+        key_pos = [header.index(col) for col in key_cols]
+        pred_pos = header.index(prediction_col)
+        width = max(key_pos + [pred_pos]) + 1
+        single_key = len(key_pos) == 1
+
+        rows: Dict = {}
+        for row in itertools.chain([first_row], reader):
+            if not row:
+                continue
+            if len(row) < width:
+                row = row + [None] * (width - len(row))
+            key = row[key_pos[0]] if single_key else tuple(row[i] for i in key_pos)
+            if key in rows:
+                raise SubmissionFormatError(f'提交文件包含重复样本: {key}')
+            rows[key] = row[pred_pos]
+
+    return list(rows.keys()), list(rows.values())
+
+
+def evaluate_file(
+    submission_file: str,
+    labels_file: str,
+    key_cols: List[str],
+    prediction_col: str,
+) -> Dict:
+    """
+    评估提交文件
+
+    返回格式:
+    {
+        'accuracy': float,
+        'precision': float,
+        'recall': float,
+        'f1': float,
+        'final_score': float,
+        'tp': int,
+        'tn': int,
+        'fp': int,
+        'fn': int,
+        'total': int,
+        'status': 'success' or 'error',
+        'error_message': str (if error)
+    }
+    """
+    # 检查文件是否存在
+    if not os.path.exists(submission_file):
+        return error_result(f'找不到提交文件: {submission_file}')
+
+    if not os.path.exists(labels_file):
+        return error_result(f'找不到标签文件: {labels_file}')
+
+    try:
+        # 加载真实标签（使用预加载的答案缓存）
+        answer_key = get_answer_key(labels_file, key_cols)
+
+        # 加载学生提交（同时验证格式）
+        keys, predictions = read_submission(submission_file, key_cols, prediction_col)
+
+        return score_predictions(answer_key, keys, predictions)
+
+    except SubmissionFormatError as e:
+        return error_result(str(e))
+    except Exception as e:
+        return error_result(f'评分过程出错: {str(e)}')
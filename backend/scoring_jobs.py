@@ -0,0 +1,320 @@
+"""
+评分任务队列 - 把评分从请求处理中移到独立的工作进程
+
+提交接口只负责保存文件并创建 status='pending' 的提交记录，随后把任务交给
+ProcessPoolExecutor 中的工作进程评分；评分完成后在线程池中把结果写回数据库，
+状态变为 success 或 error。前端通过 GET /api/submissions/{id} 查询进度。
+
+提交文件按内容的 SHA-256 保存在 blob_store 中，同一文件只存一份；
+同一用户的相同文件在同一竞赛、同一答案版本下已有成功的评分时直接复用结果（见 find_cached_result）。
+
+每个待评分的提交带有评分租约（负责的进程 PID 和心跳时间）：排队中的任务每隔
+SCORING_LEASE_SECONDS / 4 秒续约一次，持有主进程锁的进程定期把心跳超过
+SCORING_LEASE_SECONDS 的提交重新排队（见 recovery_loop）。多进程部署时其他进程
+正在评分的提交不会被重复评分，中途退出的进程留下的提交也能被接管。
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from answer_cache import preload_answer_keys
+from blob_store import open_blob, submission_file_path
+from database import SessionLocal, Submission
+from competition_stats import update_statistics
+from events import publish_leaderboard, publish_submission
+from leaderboard import update_leaderboard
+from response_cache import invalidate_competition
+from scoring_core import error_result
+from streaming_scorer import create_scorer, score_stream
+from worker_sync import WORKERS
+
+# 每个服务进程的评分工作进程数，默认由 WORKERS 个服务进程平分CPU核数
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(max(1, (os.cpu_count() or 1) // WORKERS))))
+
+# 评分租约有效期（秒），超过这个时间没有心跳的待评分提交会被重新排队
+SCORING_LEASE_SECONDS = float(os.getenv("SCORING_LEASE_SECONDS", "60"))
+
+
+def run_scoring_job(competition_name: str, answer_path: str, file_path: str) -> Dict:
+    """在工作进程中执行：流式读取（并解压）已保存的提交文件并评分"""
+    try:
+        scorer = create_scorer(competition_name, answer_path)
+    except KeyError:
+        return error_result(f'未知的竞赛类型: {competition_name}')
+
+    try:
+        with open_blob(file_path) as f:
+            result = score_stream(scorer, f)
+    except Exception as e:
+        return error_result(f'评分过程出错: {str(e)}')
+    result['answer_version'] = scorer.answer_key.version
+    return result
+
+
+def apply_result(db: Session, submission: Submission, result: Dict) -> None:
+    """把评分结果写入提交记录（不提交事务），成功时同时更新排行榜和竞赛统计"""
+    if result.get('answer_version'):
+        submission.answer_version = result['answer_version']
+
+    if result['status'] == 'success':
+        submission.status = 'success'
+        submission.accuracy = result['accuracy']
+        submission.precision = result['precision']
+        submission.recall = result['recall']
+        submission.f1_score = result['f1']
+        submission.final_score = result['final_score']
+        submission.tp = result['tp']
+        submission.tn = result['tn']
+        submission.fp = result['fp']
+        submission.fn = result['fn']
+        submission.error_message = None
+        # 与提交状态在同一事务中更新排行榜和竞赛统计
+        is_new_user = update_leaderboard(db, submission)
+        update_statistics(db, submission, is_new_user)
+    else:
+        submission.status = 'error'
+        submission.error_message = result.get('error_message', '评分失败')
+
+
+def result_from_submission(submission: Submission) -> Dict:
+    """把已评分提交的指标还原成评分结果"""
+    return {
+        'status': 'success',
+        'accuracy': submission.accuracy,
+        'precision': submission.precision,
+        'recall': submission.recall,
+        'f1': submission.f1_score,
+        'final_score': submission.final_score,
+        'tp': submission.tp,
+        'tn': submission.tn,
+        'fp': submission.fp,
+        'fn': submission.fn,
+        'answer_version': submission.answer_version,
+    }
+
+
+async def find_cached_result(
+    db: AsyncSession,
+    user_id: int,
+    competition_id: int,
+    content_hash: str,
+    answer_version: Optional[str],
+) -> Optional[Dict]:
+    """
+    同一用户的相同文件在同一竞赛、同一答案版本下已成功评分时，返回可复用的评分结果
+
+    只复用本人的结果：否则上传相同内容就能得知他人是否提交过该文件及其得分。
+    （文件本身在 blob 存储中仍按内容只存一份，这对用户不可见。）
+    """
+    if not answer_version:
+        return None
+    result = await db.execute(
+        select(Submission).where(
+            Submission.user_id == user_id,
+            Submission.competition_id == competition_id,
+            Submission.content_hash == content_hash,
+            Submission.answer_version == answer_version,
+            Submission.status == 'success',
+        ).limit(1)
+    )
+    scored = result.scalars().first()
+    return result_from_submission(scored) if scored is not None else None
+
+
+def release_submission_file(db: Session, submission: Submission, file_path: Optional[str]) -> None:
+    """评分失败后删除提交文件；其他未失败的提交仍引用同一内容时保留"""
+    if not file_path or not os.path.exists(file_path):
+        return
+    if submission is not None and submission.content_hash:
+        shared = db.query(Submission.id).filter(
+            Submission.content_hash == submission.content_hash,
+            Submission.id != submission.id,
+            Submission.status != 'error',
+        ).first()
+        if shared:
+            return
+    os.unlink(file_path)
+
+
+def save_result(submission_id: int, result: Dict, file_path: Optional[str] = None) -> None:
+    """把评分结果写回提交记录；评分失败时删除提交文件"""
+    db = SessionLocal()
+    try:
+        submission = db.query(Submission).filter(Submission.id == submission_id).first()
+        # 已有结果时忽略（多进程部署中同一提交可能被重新排队评分）
+        if submission is None or submission.status != 'pending':
+            return
+
+        apply_result(db, submission, result)
+        db.commit()
+
+        publish_submission(submission)
+        if result['status'] == 'success':
+            invalidate_competition(submission.competition_id)
+            publish_leaderboard(db, submission)
+        else:
+            release_submission_file(db, submission, file_path)
+    except Exception as e:
+        print(f"⚠️  评分结果保存失败 [submission={submission_id}]: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def claim_lease(submission: Submission) -> None:
+    """由本进程负责评分该提交（在提交事务之前调用）"""
+    submission.scoring_owner = os.getpid()
+    submission.scoring_heartbeat = datetime.utcnow()
+
+
+def renew_leases(submission_ids: Iterable[int]) -> None:
+    """为本进程排队中的提交续约"""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Submission)
+            .where(Submission.id.in_(list(submission_ids)), Submission.status == 'pending')
+            .values(scoring_owner=os.getpid(), scoring_heartbeat=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class ScoringJobQueue:
+    """基于进程池的评分任务队列"""
+
+    def __init__(self, max_workers: int = SCORING_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Dict[asyncio.Task, int] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    @property
+    def pending_count(self) -> int:
+        """尚未完成的评分任务数"""
+        return len(self._tasks)
+
+    def start(self, answer_files: Iterable[Tuple[str, str]] = ()) -> None:
+        """启动工作进程，每个进程启动时预加载答案文件"""
+        if self._pool is not None:
+            return
+        # spawn 启动的子进程不会继承事件循环线程的锁状态
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=preload_answer_keys,
+            initargs=(list(answer_files),),
+        )
+        self._heartbeat = asyncio.create_task(self._renew_loop())
+        print(f"✅ 评分进程池已启动: {self.max_workers} 个工作进程")
+
+    async def shutdown(self) -> None:
+        """等待进行中的任务完成后关闭进程池"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def submit(self, submission_id: int, competition_name: str, answer_path: str, file_path: str) -> asyncio.Task:
+        """提交一个评分任务，立即返回"""
+        if self._pool is None:
+            raise RuntimeError("评分进程池尚未启动")
+        task = asyncio.create_task(self._run(submission_id, competition_name, answer_path, file_path))
+        self._tasks[task] = submission_id
+        task.add_done_callback(self._discard)
+        return task
+
+    def _discard(self, task: asyncio.Task) -> None:
+        self._tasks.pop(task, None)
+
+    async def _renew_loop(self) -> None:
+        """定期为排队中和评分中的提交续约"""
+        while True:
+            await asyncio.sleep(SCORING_LEASE_SECONDS / 4)
+            if not self._tasks:
+                continue
+            try:
+                await run_in_threadpool(renew_leases, set(self._tasks.values()))
+            except Exception as e:
+                print(f"⚠️  评分租约续约失败: {e}")
+
+    async def _run(self, submission_id: int, competition_name: str, answer_path: str, file_path: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._pool, run_scoring_job, competition_name, answer_path, file_path
+            )
+        except Exception as e:
+            result = error_result(f'评分过程出错: {str(e)}')
+        await run_in_threadpool(save_result, submission_id, result, file_path)
+
+
+def claim_pending_jobs(resolve_answer_path, lease_seconds: Optional[float] = None) -> List[Tuple[int, str, str, str]]:
+    """
+    认领待评分的提交，返回可重新评分的任务列表
+
+    lease_seconds 为 None 时认领所有待评分的提交（单进程启动时，没有其他进程在评分）；
+    否则只认领心跳超过 lease_seconds 秒的提交。认领是带条件的 UPDATE，
+    多个进程同时认领同一提交时只有一个成功。提交文件已丢失的记录直接标记为 error。
+    """
+    now = datetime.utcnow()
+    expired = true()
+    if lease_seconds is not None:
+        cutoff = now - timedelta(seconds=lease_seconds)
+        expired = or_(Submission.scoring_heartbeat.is_(None), Submission.scoring_heartbeat < cutoff)
+
+    jobs = []
+    db = SessionLocal()
+    try:
+        pending = db.query(Submission).filter(Submission.status == 'pending', expired).all()
+        for submission in pending:
+            claimed = db.execute(
+                update(Submission)
+                .where(Submission.id == submission.id, Submission.status == 'pending', expired)
+                .values(scoring_owner=os.getpid(), scoring_heartbeat=now)
+            ).rowcount
+            if not claimed:
+                continue
+            file_path = submission_file_path(submission)
+            if not file_path.exists():
+                submission.status = 'error'
+                submission.error_message = '提交文件丢失，请重新提交'
+                continue
+            answer_path = resolve_answer_path(submission.competition.answer_path)
+            jobs.append((submission.id, submission.competition.name, str(answer_path), str(file_path)))
+        db.commit()
+    finally:
+        db.close()
+    return jobs
+
+
+async def recovery_loop(resolve_answer_path, queue: Optional["ScoringJobQueue"] = None) -> None:
+    """定期重新排队租约过期的提交（只在持有主进程锁的进程中运行，关闭时取消）"""
+    queue = queue or scoring_queue
+    while True:
+        try:
+            jobs = await run_in_threadpool(claim_pending_jobs, resolve_answer_path, SCORING_LEASE_SECONDS)
+            for job in jobs:
+                queue.submit(*job)
+            if jobs:
+                print(f"✅ 重新排队 {len(jobs)} 个租约过期的提交")
+        except Exception as e:
+            print(f"⚠️  重新排队失败: {e}")
+        await asyncio.sleep(SCORING_LEASE_SECONDS / 2)
+
+
+# 全局任务队列，在应用 lifespan 中启动和关闭
+scoring_queue = ScoringJobQueue()
@@ -0,0 +1,281 @@
+"""
+流式评分 - 边读取上传内容边校验和评分
+
+上传文件按块送入 StreamingScorer.feed()，每块只解析其中完整的行（CSV 记录，引号内的换行属于字段）：
+- 第一行即校验表头，缺少必需列时立即拒绝
+- 逐行统计样本数，超过测试集样本数时立即拒绝
+- 用按答案行号索引的 bytearray 检测重复样本，重复时拒绝（与 scoring_core.read_submission 相同）
+- 每块的混淆矩阵用 scoring_core 的向量化逻辑累加
+
+整个过程只保留当前块和少量计数，不会把上传内容完整地读进内存。
+
+UploadValidator 只做表头和行数检查，用于上传阶段快速拒绝明显错误的文件。
+"""
+import codecs
+import csv
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Dict, List, Optional
+
+import numpy as np
+
+from answer_cache import COMPETITION_KEY_COLUMNS, AnswerKey, get_answer_key
+from scoring_core import (
+    COMPETITION_PREDICTION_COLUMNS, INVALID_PREDICTION, SubmissionFormatError,
+    compute_metrics, error_result, parse_predictions
+)
+
+# 每次从上传流读取的字节数
+CHUNK_SIZE = 256 * 1024
+
+# 单行允许的最大长度（字符），防止没有换行的超大文件占满内存
+MAX_LINE_LENGTH = 64 * 1024
+
+
+class CsvLineStream(ABC):
+    """
+    按块解码上传内容并切分为完整的行
+
+    子类实现 _handle_rows()；表头在第一行到达时即被校验。
+    """
+
+    def __init__(self, key_cols: List[str], prediction_col: str, max_rows: int):
+        self.key_cols = list(key_cols)
+        self.prediction_col = prediction_col
+        self.required_cols = self.key_cols + [prediction_col]
+        self.max_rows = max_rows
+
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._pending = ''
+        self._header: Optional[List[str]] = None
+        self._key_pos: List[int] = []
+        self._pred_pos = 0
+        self._width = 0
+
+        self.rows = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """送入一块上传内容，格式错误时抛出 SubmissionFormatError"""
+        lines = self._split_records(self._pending + self._decode(chunk))
+        self._pending = lines.pop()
+        # 未结束的行和本块中的完整行都要检查
+        self._check_line_length([self._pending])
+        self._process_lines(lines)
+
+    def close(self) -> None:
+        """处理最后一行（可能没有换行符）"""
+        text = self._pending + self._decode(b'', final=True)
+        self._pending = ''
+        self._process_lines(self._split_records(text))
+
+    @staticmethod
+    def _split_records(text: str) -> List[str]:
+        """
+        按换行切分为 CSV 记录，最后一项是尚未结束的部分
+
+        与 csv 模块一致，引号内的换行属于字段内容：引号个数为奇数的片段与下一片段合并
+        （转义的 "" 不改变奇偶）。
+        """
+        pieces = text.split('\n')
+        if '"' not in text:
+            return pieces
+        records: List[str] = []
+        open_parts: List[str] = []
+        in_quotes = False
+        for piece in pieces:
+            if piece.count('"') % 2:
+                in_quotes = not in_quotes
+            open_parts.append(piece)
+            if not in_quotes:
+                records.append('\n'.join(open_parts))
+                open_parts = []
+        if open_parts:
+            records.append('\n'.join(open_parts))
+        return records
+
+    def _decode(self, chunk: bytes, final: bool = False) -> str:
+        try:
+            return self._decoder.decode(chunk, final)
+        except UnicodeDecodeError:
+            raise SubmissionFormatError('提交文件必须是UTF-8编码的CSV文件')
+
+    @staticmethod
+    def _check_line_length(lines: List[str]) -> None:
+        if max(map(len, lines), default=0) > MAX_LINE_LENGTH:
+            raise SubmissionFormatError(f'提交文件格式错误：单行超过 {MAX_LINE_LENGTH} 个字符')
+
+    def _process_lines(self, lines: List[str]) -> None:
+        self._check_line_length(lines)
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return
+
+        if self._header is None:
+            self._set_header(next(csv.reader(lines[:1])))
+            lines = lines[1:]
+
+        if lines:
+            self._handle_rows(lines)
+
+    def _count_rows(self, n: int) -> None:
+        self.rows += n
+        if self.rows > self.max_rows:
+            raise SubmissionFormatError(f'提交样本数超过测试集样本数({self.max_rows})')
+
+    @abstractmethod
+    def _handle_rows(self, lines: List[str]) -> None:
+        """处理表头之后的一批完整数据行"""
+
+    def _set_header(self, header: List[str]) -> None:
+        for col in self.required_cols:
+            if col not in header:
+                raise SubmissionFormatError(f'缺少必需列 "{col}"。要求的列: {self.required_cols}')
+        self._header = header
+        self._key_pos = [header.index(col) for col in self.key_cols]
+        self._pred_pos = header.index(self.prediction_col)
+        self._width = max(self._key_pos + [self._pred_pos]) + 1
+
+
+class UploadValidator(CsvLineStream):
+    """
+    上传阶段的快速校验：只检查表头和样本行数，不做逐行评分
+
+    完整评分交给 scoring_jobs 的工作进程完成。
+    answer_version 是校验时所用答案文件的版本。
+    """
+
+    def __init__(self, key_cols: List[str], prediction_col: str, max_rows: int, answer_version: Optional[str] = None):
+        super().__init__(key_cols, prediction_col, max_rows)
+        self.answer_version = answer_version
+
+    def _handle_rows(self, lines: List[str]) -> None:
+        self._count_rows(len(lines))
+
+    def finish(self) -> None:
+        """上传结束，文件为空时抛出 SubmissionFormatError"""
+        self.close()
+        if self._header is None or self.rows == 0:
+            raise SubmissionFormatError('提交文件为空')
+
+
+class StreamingScorer(CsvLineStream):
+    """单次遍历的提交文件校验与评分"""
+
+    def __init__(self, answer_key: AnswerKey, key_cols: List[str], prediction_col: str):
+        super().__init__(key_cols, prediction_col, max_rows=len(answer_key))
+        self.answer_key = answer_key
+
+        self._labels = np.frombuffer(answer_key.labels, dtype=np.uint8)
+        self._seen = bytearray(len(answer_key))
+        self._counts = np.zeros(4, dtype=np.int64)
+
+        self.unknown = 0
+        self.invalid = 0
+        self._first_invalid = None  # (答案行号, 样本键, 原始预测值)
+
+    def finish(self) -> Dict:
+        """处理剩余内容并返回评分结果（格式与 scoring_core.compute_metrics 相同）"""
+        try:
+            self.close()
+        except SubmissionFormatError as e:
+            return error_result(str(e))
+
+        n_labels = len(self.answer_key)
+        if self._header is None or self.rows == 0:
+            return error_result('提交文件为空')
+
+        if self.rows != n_labels:
+            return error_result(f'提交样本数({self.rows}) 不等于 测试集样本数({n_labels})')
+
+        if self.unknown:
+            return error_result(f'{self.unknown} 个样本缺失')
+
+        if self.invalid:
+            _, key, value = self._first_invalid
+            return error_result(f'{self.invalid} 个无效预测值（应为0或1）。例如: {key} -> "{value}"')
+
+        tn, fp, fn, tp = (int(c) for c in self._counts)
+        return compute_metrics(tp, tn, fp, fn)
+
+    def _handle_rows(self, lines: List[str]) -> None:
+        index = self.answer_key.index
+        seen = self._seen
+        key_pos = self._key_pos
+        pred_pos = self._pred_pos
+        width = self._width
+        single_key = len(key_pos) == 1
+
+        positions: List[int] = []
+        keys: List = []
+        values: List[Optional[str]] = []
+
+        for row in csv.reader(lines):
+            if not row:
+                continue
+            self._count_rows(1)
+
+            if len(row) < width:
+                row = row + [None] * (width - len(row))
+            key = row[key_pos[0]] if single_key else tuple(row[i] for i in key_pos)
+
+            pos = index.get(key)
+            if pos is None:
+                self.unknown += 1
+                continue
+            if seen[pos]:
+                raise SubmissionFormatError(f'提交文件包含重复样本: {key}')
+            seen[pos] = 1
+
+            positions.append(pos)
+            keys.append(key)
+            values.append(row[pred_pos])
+
+        if positions:
+            self._accumulate(np.asarray(positions, dtype=np.int64), keys, values)
+
+    def _accumulate(self, positions: np.ndarray, keys: List, values: List[Optional[str]]) -> None:
+        preds = parse_predictions(values)
+        invalid = preds == INVALID_PREDICTION
+
+        if invalid.any():
+            invalid_rows = np.flatnonzero(invalid)
+            self.invalid += len(invalid_rows)
+            # 与整体评分一致，按答案文件顺序报告第一个无效值
+            first = invalid_rows[np.argmin(positions[invalid_rows])]
+            if self._first_invalid is None or positions[first] < self._first_invalid[0]:
+                self._first_invalid = (int(positions[first]), keys[first], values[first])
+
+            valid = ~invalid
+            positions = positions[valid]
+            preds = preds[valid]
+
+        codes = self._labels[positions].astype(np.int64) * 2 + preds.astype(np.int64)
+        self._counts += np.bincount(codes, minlength=4)
+
+
+def create_scorer(competition_name: str, answer_path: str) -> StreamingScorer:
+    """按竞赛类型创建流式评分器，未知竞赛抛出 KeyError"""
+    key_cols = COMPETITION_KEY_COLUMNS[competition_name]
+    prediction_col = COMPETITION_PREDICTION_COLUMNS[competition_name]
+    answer_key = get_answer_key(answer_path, key_cols)
+    return StreamingScorer(answer_key, key_cols, prediction_col)
+
+
+def create_validator(competition_name: str, answer_path: str) -> UploadValidator:
+    """按竞赛类型创建上传校验器，未知竞赛抛出 KeyError"""
+    key_cols = COMPETITION_KEY_COLUMNS[competition_name]
+    prediction_col = COMPETITION_PREDICTION_COLUMNS[competition_name]
+    answer_key = get_answer_key(answer_path, key_cols)
+    return UploadValidator(key_cols, prediction_col, max_rows=len(answer_key), answer_version=answer_key.version)
+
+
+def score_stream(scorer: StreamingScorer, stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Dict:
+    """从二进制文件对象中按块读取并评分"""
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            scorer.feed(chunk)
+    except SubmissionFormatError as e:
+        return error_result(str(e))
+    return scorer.finish()
@@ -0,0 +1,135 @@
+"""
+测试配置：数据库、提交文件和数据集打包目录都放在临时目录中，不影响开发环境的数据
+
+各模块在导入时读取环境变量，所以要在导入任何后端模块之前设置。
+在 backend 目录下运行：python -m pytest -q
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+TEST_DATA_DIR = Path(tempfile.mkdtemp(prefix="quiz-platform-tests-"))
+
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DATA_DIR / 'test.db'}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["BLOB_STORE_DIR"] = str(TEST_DATA_DIR / "blobs")
+os.environ["DATASET_ARTIFACTS_DIR"] = str(TEST_DATA_DIR / "dataset_artifacts")
+os.environ["WORKERS"] = "1"
+os.environ["RATE_LIMIT_STORE"] = "memory"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+sys.path.insert(0, str(BACKEND_DIR))
+# baselines/ 下的脚本在自己的目录中运行，互相直接导入
+sys.path.insert(1, str(BACKEND_DIR / "baselines"))
+
+import blob_store  # noqa: E402
+import database  # noqa: E402
+
+# 早期提交文件的迁入只扫描测试目录，不会移动项目 submissions/ 下的文件
+blob_store.SUBMISSIONS_DIR = TEST_DATA_DIR / "submissions"
+blob_store.SUBMISSIONS_DIR.mkdir()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    database.engine.dispose()
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
+
+
+def reset_database() -> None:
+    """删除所有表后重新初始化（建表、迁移、竞赛数据）"""
+    database.Base.metadata.drop_all(bind=database.engine)
+    database.init_db()
+
+
+@pytest.fixture
+def db():
+    """空数据库（只有初始化的竞赛）上的同步会话"""
+    reset_database()
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def run():
+    """在新的事件循环中执行协程；结束前释放异步连接池，连接不会跨事件循环复用"""
+    def run_coroutine(coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await database.async_engine.dispose()
+        return asyncio.run(main())
+    return run_coroutine
+
+
+@pytest.fixture
+def competition_ids(db):
+    """竞赛名称 -> ID"""
+    return {c.name: c.id for c in db.query(database.Competition).all()}
+
+
+@pytest.fixture
+def make_user(db):
+    def create(username: str) -> database.User:
+        user = database.User(username=username, email=f"{username}@example.com", hashed_password="-")
+        db.add(user)
+        db.commit()
+        return user
+    return create
+
+
+@pytest.fixture
+def make_submission(db):
+    """创建提交记录；status 为 success 时各项指标都取 score"""
+    def create(user, competition_id, score=None, status="success", submitted_at=None, **fields):
+        submission = database.Submission(
+            user_id=user.id,
+            competition_id=competition_id,
+            filename=fields.pop("filename", "submission.csv"),
+            status=status,
+            submitted_at=submitted_at or datetime.utcnow(),
+            **fields,
+        )
+        if status == "success":
+            submission.final_score = submission.accuracy = submission.precision = score
+            submission.recall = submission.f1_score = score
+        db.add(submission)
+        db.commit()
+        return submission
+    return create
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """启动完整应用（评分进程池、密码哈希进程池）的测试客户端，进程内的缓存和限流状态都是新的"""
+    from fastapi.testclient import TestClient
+
+    import main
+    from auth import principal_cache
+    from rate_limit import MemoryBucketStore, submission_limiter
+    from response_cache import response_cache
+
+    principal_cache.clear()
+    response_cache.clear()
+    monkeypatch.setattr(submission_limiter, "store", MemoryBucketStore())
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers():
+    from auth import create_user_token
+
+    def headers(user) -> dict:
+        return {"Authorization": f"Bearer {create_user_token(user)}"}
+    return headers
@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import pytest
+
+import answer_cache
+from answer_cache import MTIME_GRANULARITY_NS, get_answer_key, load_answer_key
+
+KEY_COLS = ["source", "target"]
+
+
+def write_answers(path, rows):
+    path.write_text("source,target,label\n" + "".join(f"{s},{t},{label}\n" for s, t, label in rows))
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    answer_cache.clear_answer_cache()
+    yield
+    answer_cache.clear_answer_cache()
+
+
+def test_load_answer_key_keeps_last_duplicate_and_hashes_content(tmp_path):
+    path = tmp_path / "answers.csv"
+    write_answers(path, [(1, 2, 1), (3, 4, 0), (1, 2, 0)])
+
+    answer_key = load_answer_key(str(path), KEY_COLS)
+
+    assert len(answer_key) == 2
+    assert dict(answer_key.items()) == {("1", "2"): 0, ("3", "4"): 0}
+    assert answer_key.version == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_load_answer_key_rejects_invalid_labels(tmp_path):
+    path = tmp_path / "answers.csv"
+    write_answers(path, [(1, 2, 2)])
+
+    with pytest.raises(ValueError):
+        load_answer_key(str(path), KEY_COLS)
+
+
+def test_same_size_rewrite_within_mtime_granularity_is_reloaded(tmp_path):
+    path = tmp_path / "answers.csv"
+    write_answers(path, [(1, 2, 1), (3, 4, 0)])
+    first = get_answer_key(str(path), KEY_COLS)
+    stat = os.stat(path)
+
+    # 同样大小的内容，并恢复原来的 mtime：只看 mtime/size 无法发现变化
+    write_answers(path, [(1, 2, 0), (3, 4, 1)])
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    second = get_answer_key(str(path), KEY_COLS)
+    assert second is not first
+    assert dict(second.items()) == {("1", "2"): 0, ("3", "4"): 1}
+    assert second.version == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_settled_file_is_not_rehashed(tmp_path, monkeypatch):
+    path = tmp_path / "answers.csv"
+    write_answers(path, [(1, 2, 1)])
+    old = os.stat(path).st_mtime_ns - 10 * MTIME_GRANULARITY_NS
+    os.utime(path, ns=(old, old))
+    first = get_answer_key(str(path), KEY_COLS)
+
+    def fail(path):
+        raise AssertionError("mtime 足够早时不应重新计算哈希")
+
+    monkeypatch.setattr(answer_cache, "file_sha256", fail)
+    assert get_answer_key(str(path), KEY_COLS) is first
+
+
+def test_recent_file_is_verified_by_hash(tmp_path, monkeypatch):
+    path = tmp_path / "answers.csv"
+    write_answers(path, [(1, 2, 1)])
+    first = get_answer_key(str(path), KEY_COLS)
+
+    calls = []
+    real_sha256 = answer_cache.file_sha256
+    monkeypatch.setattr(answer_cache, "file_sha256", lambda p: calls.append(p) or real_sha256(p))
+
+    assert get_answer_key(str(path), KEY_COLS) is first
+    assert calls
@@ -0,0 +1,136 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+from auth import PrincipalCache, authenticate_user, create_access_token, principal_cache, principal_from_token
+from database import AsyncSessionLocal, async_engine
+
+
+def test_register_and_login(client):
+    registered = client.post("/api/auth/register", json={
+        "username": "alice", "email": "alice@example.com", "password": "correct horse",
+    })
+    assert registered.status_code == 200
+
+    login = client.post("/api/auth/login", json={"username": "alice", "password": "correct horse"})
+    assert login.status_code == 200
+    me = client.get("/api/auth/me", headers={"Authorization": f"Bearer {login.json()['access_token']}"})
+    assert me.json()["username"] == "alice"
+
+    assert client.post("/api/auth/login", json={"username": "alice", "password": "wrong"}).status_code == 401
+    assert client.post("/api/auth/login", json={"username": "bob", "password": "wrong"}).status_code == 401
+
+
+
+@pytest.fixture
+def hash_calls(monkeypatch):
+    """替换密码哈希：记录每次调用时异步连接池中被借出的连接数，并执行 during_hash 中的操作"""
+    calls = {"checked_out": [], "during_hash": []}
+
+    async def fake_hash(password):
+        calls["checked_out"].append(async_engine.pool.checkedout())
+        for action in calls["during_hash"]:
+            action()
+        return "-"
+
+    monkeypatch.setattr(auth.password_hasher, "hash", fake_hash)
+    return calls
+
+
+def test_taken_names_are_rejected_before_hashing(client, make_user, hash_calls):
+    make_user("alice")
+
+    taken_name = client.post("/api/auth/register", json={
+        "username": "alice", "email": "other@example.com", "password": "secret",
+    })
+    taken_email = client.post("/api/auth/register", json={
+        "username": "other", "email": "alice@example.com", "password": "secret",
+    })
+
+    assert (taken_name.status_code, taken_name.json()["detail"]) == (400, "用户名已存在")
+    assert (taken_email.status_code, taken_email.json()["detail"]) == (400, "邮箱已被注册")
+    assert hash_calls["checked_out"] == []
+
+
+def test_registration_hashes_without_holding_a_connection(client, make_user, hash_calls):
+    # 等待哈希期间另一个请求注册了同一用户名
+    hash_calls["during_hash"].append(lambda: make_user("bob"))
+
+    response = client.post("/api/auth/register", json={
+        "username": "bob", "email": "bob@example.com", "password": "secret",
+    })
+
+    assert hash_calls["checked_out"] == [0]
+    assert (response.status_code, response.json()["detail"]) == (400, "用户名已存在")
+
+
+def test_password_is_checked_after_the_transaction_ends(run, make_user, monkeypatch):
+    make_user("alice")
+    checked = []
+
+    async def login():
+        async with AsyncSessionLocal() as session:
+            async def verify(password, hashed_password):
+                # 等待密码校验时不占用数据库连接
+                checked.append(session.in_transaction())
+                return password == "secret"
+
+            monkeypatch.setattr(auth.password_hasher, "verify", verify)
+            return (
+                await authenticate_user(session, "alice", "secret"),
+                await authenticate_user(session, "alice", "wrong"),
+            )
+
+    user, rejected = run(login())
+    assert user.username == "alice"
+    assert rejected is None
+    assert checked == [False, False]
+
+
+def test_principal_cache_hits_and_invalidation(run, db, make_user):
+    principal_cache.clear()
+    user = make_user("alice")
+    token = auth.create_user_token(user)
+
+    assert run(principal_from_token(token)).username == "alice"
+    hits = principal_cache.hits
+    assert run(principal_from_token(token)).username == "alice"
+    assert principal_cache.hits == hits + 1
+
+    # 用户信息变更后重新查库
+    user.email = "new@example.com"
+    db.commit()
+    assert run(principal_from_token(token)).email == "new@example.com"
+
+    # 用户被删除后令牌失效
+    db.delete(user)
+    db.commit()
+    with pytest.raises(HTTPException) as excinfo:
+        run(principal_from_token(token))
+    assert excinfo.value.status_code == 401
+
+
+def test_token_with_mismatched_username_is_rejected(run, make_user):
+    user = make_user("alice")
+    token = create_access_token({"sub": "mallory", "uid": user.id})
+
+    with pytest.raises(HTTPException):
+        run(principal_from_token(token))
+
+
+def test_principal_cache_respects_token_expiry_and_size():
+    cache = PrincipalCache(ttl=60, max_size=2)
+    principal = auth.Principal(id=1, username="alice", email="a@example.com", created_at=None)
+
+    cache.put("expired", principal, token_expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+
+    for token in ("a", "b", "c"):
+        cache.put(token, principal)
+    assert cache.get("a") is None
+    assert cache.get("c") == principal
+
+    cache.invalidate_user(1)
+    assert cache.metrics()["size"] == 0
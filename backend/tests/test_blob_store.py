@@ -0,0 +1,70 @@
+import hashlib
+from datetime import datetime
+
+import pytest
+
+from blob_store import BlobStore, compact, open_blob
+from leaderboard import update_leaderboard
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(tmp_path / "blobs", compression="gzip")
+
+
+def put(store, data: bytes) -> str:
+    with store.writer() as writer:
+        writer.write(data)
+        return writer.commit()
+
+
+def test_blob_round_trip_and_content_addressing(store):
+    data = b"source,target,label\n1,2,1\n" * 100
+    content_hash = put(store, data)
+
+    assert content_hash == hashlib.sha256(data).hexdigest()
+    path = store.locate(content_hash)
+    assert path.name == f"{content_hash}.csv.gz"
+    assert path.stat().st_size < len(data)
+    with open_blob(path) as f:
+        assert f.read() == data
+
+    # 相同内容只保存一份
+    assert put(store, data) == content_hash
+    assert len(list(store.iter_blobs())) == 1
+
+
+def test_failed_write_leaves_nothing_behind(store):
+    with pytest.raises(RuntimeError):
+        with store.writer() as writer:
+            writer.write(b"partial")
+            raise RuntimeError("上传中断")
+
+    assert list(store.iter_blobs()) == []
+    assert list((store.root / "tmp").iterdir()) == []
+
+
+def test_compact_keeps_best_recent_and_pending_files(store, db, competition_ids, make_user, make_submission):
+    user = make_user("alice")
+    cci = competition_ids["cci"]
+    hashes = [put(store, f"file {i}\n".encode()) for i in range(5)]
+    scores = [0.9, 0.1, 0.2, 0.3]
+    for i, score in enumerate(scores):
+        submission = make_submission(user, cci, score, submitted_at=datetime(2024, 1, i + 1), content_hash=hashes[i])
+        update_leaderboard(db, submission)
+    db.commit()
+    make_submission(user, cci, status="pending", submitted_at=datetime(2023, 1, 1), content_hash=hashes[4])
+
+    result = compact(store, last_n=1, grace_seconds=0)
+
+    # 保留：最佳（0）、最近一次（3）、待评分（4）
+    kept = {h for h in hashes if store.locate(h) is not None}
+    assert kept == {hashes[0], hashes[3], hashes[4]}
+    assert result["removed"] == 2
+
+
+def test_compact_respects_the_grace_period(store, db):
+    content_hash = put(store, b"not referenced yet\n")
+
+    assert compact(store, last_n=1, grace_seconds=3600)["removed"] == 0
+    assert store.locate(content_hash) is not None
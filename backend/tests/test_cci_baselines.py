@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import cci_search
+import scoring_core
+
+
+def test_search_uses_the_platform_scoring_formula():
+    assert cci_search.SCORE_WEIGHTS == scoring_core.SCORE_WEIGHTS
+    for counts in [(5, 3, 2, 1), (0, 4, 0, 6), (7, 0, 3, 0), (0, 0, 0, 1)]:
+        expected = scoring_core.compute_metrics(*counts)
+        actual = cci_search.compute_metrics(*counts)
+        for name in ("accuracy", "precision", "recall", "f1", "final_score"):
+            assert actual[name] == pytest.approx(expected[name])
+
+
+def confusion(y_true, preds):
+    """(tp, tn, fp, fn)"""
+    return (
+        int(np.sum(preds & (y_true == 1))),
+        int(np.sum(~preds & (y_true == 0))),
+        int(np.sum(preds & (y_true == 0))),
+        int(np.sum(~preds & (y_true == 1))),
+    )
+
+
+def brute_force_best(y_true, probs):
+    """逐个尝试每个不同的概率值作为阈值"""
+    best = None
+    for threshold in np.unique(probs):
+        score = scoring_core.compute_metrics(*confusion(y_true, probs >= threshold))["final_score"]
+        if best is None or score > best[1]:
+            best = (threshold, score)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_best_threshold_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, 2, size=200)
+    # 概率取有限个值，包含大量相同概率
+    probs = np.round(np.clip(y_true * 0.3 + rng.random(200) * 0.7, 0, 1), 2)
+
+    threshold, metrics = cci_search.best_threshold(y_true, probs)
+    _, expected_score = brute_force_best(y_true, probs)
+
+    assert metrics["final_score"] == pytest.approx(expected_score)
+    # 返回的指标就是该阈值下的指标
+    assert metrics == pytest.approx(cci_search.compute_metrics(*confusion(y_true, probs >= threshold)))
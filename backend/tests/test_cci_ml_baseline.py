@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+import pytest
+
+from cci_ml_baseline import (
+    N_EDGE_FEATURES, build_features, compute_node_stats, get_node_info, predict_labels,
+    predict_probabilities, sigmoid, standardize, train_logistic_regression,
+)
+
+
+def reference_training(features, labels, learning_rate, epochs, l2):
+    """向量化之前的逐样本全量梯度下降"""
+    n_samples, n_features = len(features), len(features[0])
+    weights = [0.0] * n_features
+    bias = 0.0
+    for _ in range(epochs):
+        grad_w = [0.0] * n_features
+        grad_b = 0.0
+        for x, y in zip(features, labels):
+            z = sum(w * v for w, v in zip(weights, x)) + bias
+            error = 1.0 / (1.0 + math.exp(-z)) - y
+            for j in range(n_features):
+                grad_w[j] += error * x[j]
+            grad_b += error
+        for j in range(n_features):
+            weights[j] -= learning_rate * (grad_w[j] / n_samples + l2 * weights[j])
+        bias -= learning_rate * grad_b / n_samples
+    return weights, bias
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(60, 4))
+    labels = (features @ [1.5, -2.0, 0.5, 0.0] + rng.normal(scale=0.5, size=60) > 0).astype(int)
+    return features, labels
+
+
+def test_full_batch_training_matches_the_per_sample_loop(dataset):
+    features, labels = dataset
+
+    weights, bias = train_logistic_regression(features, labels, learning_rate=0.1, epochs=40, l2=1e-3, verbose=False)
+    expected_weights, expected_bias = reference_training(features.tolist(), labels.tolist(), 0.1, 40, 1e-3)
+
+    assert weights == pytest.approx(expected_weights, abs=1e-12)
+    assert bias == pytest.approx(expected_bias, abs=1e-12)
+
+
+def test_mini_batch_training_is_seeded_and_fits_the_data(dataset):
+    features, labels = dataset
+
+    first = train_logistic_regression(features, labels, epochs=50, batch_size=16, seed=3, verbose=False)
+    second = train_logistic_regression(features, labels, epochs=50, batch_size=16, seed=3, verbose=False)
+
+    assert np.array_equal(first[0], second[0]) and first[1] == second[1]
+    preds = predict_labels(predict_probabilities(features, *first))
+    assert np.mean(preds == labels) > 0.85
+
+
+def test_sigmoid_is_stable_for_large_inputs():
+    with np.errstate(over="raise"):
+        values = sigmoid(np.array([-1000.0, -1.0, 0.0, 1.0, 1000.0]))
+    assert values == pytest.approx([0.0, 1 / (1 + math.e), 0.5, 1 / (1 + math.exp(-1)), 1.0])
+    assert sigmoid(0.0) == 0.5
+
+
+def test_standardize_reuses_training_statistics():
+    train = np.array([[1.0, 5.0], [3.0, 5.0]])
+
+    normalized, mean, std = standardize(train)
+
+    assert normalized.tolist() == [[-1.0, 0.0], [1.0, 0.0]]
+    # 常数列的标准差取 1
+    assert std.tolist() == [1.0, 1.0]
+    assert standardize([[5.0, 7.0]], mean=mean, std=std)[0].tolist() == [[3.0, 2.0]]
+    with pytest.raises(ValueError):
+        standardize([])
+
+
+# 节点 0: 2 正 1 负；节点 1: 1 正 1 负；节点 2: 1 正 2 负（自环计两次）；节点 3 未出现
+TRAIN_EDGES = [(0, 1, 1), (0, 2, 1), (0, 1, 0), (2, 2, 0)]
+
+
+def test_node_stats_count_both_endpoints():
+    stats = compute_node_stats(TRAIN_EDGES)
+
+    assert stats.pos.tolist() == [2, 1, 1]
+    assert stats.neg.tolist() == [1, 1, 2]
+    assert stats.pos_ratio.tolist() == pytest.approx([2 / 3, 1 / 2, 1 / 3])
+    assert 0 in stats and 3 not in stats and -1 not in stats
+    assert get_node_info(stats, 7) == {"pos": 0.0, "neg": 0.0, "total": 0.0, "pos_ratio": 0.0, "neg_ratio": 0.0}
+    assert get_node_info(stats, 1)["neg_ratio"] == 0.5
+
+
+def test_build_features_matches_the_expected_matrix():
+    stats = compute_node_stats(TRAIN_EDGES)
+
+    features = build_features([(0, 1), (2, 2), (1, 5)], stats)
+
+    a, b, c = 2 / 3, 1 / 2, 1 / 3
+    expected = [
+        # total     pos     neg     pos_ratio  mean       diff   product  sum  diff  product  min  max  self
+        [3, 2,      2, 1,   1, 1,   a, b,      (a + b) / 2, a - b, a * b,   5,   1,    6,       2,   3,   0],
+        [3, 3,      1, 1,   2, 2,   c, c,      c,           0,     c * c,   6,   0,    9,       3,   3,   1],
+        # 节点 5 不在训练集中，各项统计为 0
+        [2, 0,      1, 0,   1, 0,   b, 0,      b / 2,       b,     0,       2,   2,    0,       0,   2,   0],
+    ]
+    assert features.shape == (3, N_EDGE_FEATURES)
+    assert features.dtype == np.float32
+    assert features == pytest.approx(np.array(expected, dtype=np.float32))
+
+
+def test_build_features_appends_spatial_columns():
+    stats = compute_node_stats(TRAIN_EDGES)
+    edges = [(0, 1), (1, 2)]
+
+    features = build_features(edges, stats, spatial=lambda e: np.full((len(e), 2), 9.0, dtype=np.float32))
+
+    assert features.shape == (2, N_EDGE_FEATURES + 2)
+    assert features[:, :N_EDGE_FEATURES].tolist() == build_features(edges, stats).tolist()
+    assert features[:, N_EDGE_FEATURES:].tolist() == [[9.0, 9.0], [9.0, 9.0]]
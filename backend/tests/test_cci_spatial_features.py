@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+sparse = pytest.importorskip("scipy.sparse")
+
+import cci_spatial_features  # noqa: E402
+from cci_spatial_features import (  # noqa: E402
+    FEATURE_NAMES, SpatialData, SpatialFeaturizer, coexpression_features, featurize, load_lr_pairs,
+    spatial_features, spatial_featurizer,
+)
+
+# 3 个细胞 × 2 个 L-R 对
+LIGAND = [[1, 0], [0, 2], [3, 4]]
+RECEPTOR = [[0, 1], [5, 0], [1, 1]]
+
+# 8 个间距为 1 的细胞排成一行，另有 1 个远离的细胞
+COORDS = np.array([[x, 0.0] for x in range(8)] + [[100.0, 0.0]])
+
+
+def make_data(ligand=LIGAND, receptor=RECEPTOR, coords=None) -> SpatialData:
+    return SpatialData(
+        ligand=sparse.csr_matrix(np.array(ligand, dtype=np.float32)),
+        receptor=sparse.csr_matrix(np.array(receptor, dtype=np.float32)),
+        coords=coords if coords is not None else np.arange(len(ligand) * 2, dtype=np.float64).reshape(-1, 2),
+        pairs=[("L1", "R1"), ("L2", "R2")],
+    )
+
+
+def test_coexpression_features_on_a_sparse_matrix():
+    sources, targets = np.array([0, 2, 1]), np.array([1, 2, 0])
+
+    # batch_size=2 时最后一批只有一条边
+    features = coexpression_features(make_data(), sources, targets, batch_size=2)
+
+    assert features.tolist() == [
+        # L[s]*R[t]: 总分, 激活的对数, 最大值；L[t]*R[s] 同上
+        [5, 1, 5, 2, 1, 2],
+        [7, 2, 4, 7, 2, 4],
+        [2, 1, 2, 5, 1, 5],
+    ]
+
+
+def test_spatial_features_on_a_line_of_cells():
+    features = spatial_features(COORDS, np.array([0, 0, 3]), np.array([1, 7, 8]))
+
+    # 相邻间距为 1；密度为 3 倍间距内的其他细胞数
+    assert features == pytest.approx(np.array([
+        [1, math.log(2), 1, 3, 4],
+        [7, math.log(8), 0, 3, 3],
+        [97, math.log(98), 0, 6, 0],
+    ], dtype=np.float32))
+
+
+def test_featurize_checks_cell_ids():
+    data = make_data()
+
+    features = featurize(data, [(0, 1), (2, 0)])
+
+    assert features.shape == (2, len(FEATURE_NAMES))
+    with pytest.raises(ValueError):
+        featurize(data, [(0, 3)])
+
+
+def test_featurizer_caches_edge_features(tmp_path, monkeypatch):
+    h5ad_path, lr_path = tmp_path / "expression.h5ad", tmp_path / "lr.txt"
+    h5ad_path.write_bytes(b"")
+    lr_path.write_text("ligand_gene_symbol\treceptor_gene_symbol\nL1\tR1\nL2\tR2\nL1\tR1\n")
+    monkeypatch.setattr(cci_spatial_features, "load_spatial_data", lambda *args: make_data())
+    featurizer = SpatialFeaturizer(h5ad_path, lr_path, tmp_path / "cache")
+
+    first = featurizer([(0, 1), (2, 2)])
+
+    def fail(*args):
+        raise AssertionError("缓存命中时不应再读取表达矩阵")
+    monkeypatch.setattr(cci_spatial_features, "load_spatial_data", fail)
+    featurizer._data = None
+    assert np.array_equal(featurizer([(0, 1), (2, 2)]), first)
+    assert load_lr_pairs(lr_path) == [("L1", "R1"), ("L2", "R2")]
+
+
+def test_missing_expression_matrix_falls_back_to_graph_features(tmp_path):
+    assert spatial_featurizer(tmp_path) is None
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+
+import database
+from database import SQLITE_PRAGMAS, Competition, async_engine, create_db_engine, get_async_db, to_async_url
+
+
+def read_pragmas(connection) -> dict:
+    return {
+        name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        for name in ("journal_mode", "synchronous", "busy_timeout")
+    }
+
+
+def test_new_sqlite_connections_get_the_pragma_profile(tmp_path):
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    try:
+        assert isinstance(db_engine.pool, QueuePool)
+        with db_engine.connect() as first, db_engine.connect() as second:
+            # 池中的每个新连接都单独设置，而不只是第一个
+            for connection in (first, second):
+                assert read_pragmas(connection) == {
+                    "journal_mode": "wal",
+                    "synchronous": 1,  # NORMAL
+                    "busy_timeout": SQLITE_PRAGMAS["busy_timeout"],
+                }
+    finally:
+        db_engine.dispose()
+
+
+def test_memory_database_shares_one_connection():
+    db_engine = create_db_engine("sqlite://")
+    try:
+        assert isinstance(db_engine.pool, StaticPool)
+        with db_engine.connect() as connection:
+            connection.execute(text("CREATE TABLE t (x INTEGER)"))
+            connection.commit()
+        with db_engine.connect() as connection:
+            assert connection.execute(text("SELECT count(*) FROM t")).scalar() == 0
+            assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == SQLITE_PRAGMAS["busy_timeout"]
+    finally:
+        db_engine.dispose()
+
+
+def test_application_engine_uses_the_profile(db):
+    with database.engine.connect() as connection:
+        assert read_pragmas(connection)["journal_mode"] == "wal"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///./quiz.db", "sqlite+aiosqlite:///./quiz.db"),
+    ("postgresql://user:p%40ss@db:5432/quiz", "postgresql+asyncpg://user:p%40ss@db:5432/quiz"),
+    ("postgresql+psycopg2://user@db/quiz", "postgresql+asyncpg://user@db/quiz"),
+    ("mysql+pymysql://user@db/quiz", "mysql+aiomysql://user@db/quiz"),
+])
+def test_async_url_uses_the_matching_driver(url, expected):
+    assert to_async_url(url) == expected
+
+
+def test_async_url_rejects_unknown_databases():
+    with pytest.raises(ValueError):
+        to_async_url("oracle://user@db/quiz")
+
+
+def test_async_session_dependency(run, db):
+    assert isinstance(async_engine.pool, AsyncAdaptedQueuePool)
+
+    async def use_dependency():
+        dependency = get_async_db()
+        session = await anext(dependency)
+        names = (await session.scalars(select(Competition.name).order_by(Competition.id))).all()
+        connection = await session.connection()
+        journal_mode = (await connection.exec_driver_sql("PRAGMA journal_mode")).scalar()
+        checked_out = async_engine.pool.checkedout()
+        await dependency.aclose()
+        return session, names, journal_mode, checked_out, async_engine.pool.checkedout()
+
+    session, names, journal_mode, during, after = run(use_dependency())
+
+    assert isinstance(session, AsyncSession)
+    assert names == [c.name for c in db.query(Competition).order_by(Competition.id)]
+    assert journal_mode == "wal"
+    # 请求结束后连接归还连接池
+    assert (during, after) == (1, 0)
+
+
+def test_async_endpoints_read_the_same_rows(client, db):
+    competitions = client.get("/api/competitions").json()
+
+    assert [c["name"] for c in competitions] == [c.name for c in db.query(Competition).order_by(Competition.id)]
+    first = client.get(f"/api/competitions/{competitions[0]['id']}")
+    assert first.json()["name"] == competitions[0]["name"]
+    assert client.get("/api/competitions/9999").status_code == 404
@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import os
+
+import pytest
+
+import dataset_artifacts
+from dataset_artifacts import ArtifactRegistry, build_artifacts
+from main import ROOT_DIR
+
+FILES = {"train.csv": b"a,b,label\n1,2,1\n" * 50, "README.md": "说明\n".encode()}
+
+
+@pytest.fixture
+def artifacts_dir(tmp_path, monkeypatch):
+    path = tmp_path / "artifacts"
+    monkeypatch.setattr(dataset_artifacts, "DATASET_ARTIFACTS_DIR", path)
+    return path
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    path = tmp_path / "dataset"
+    path.mkdir()
+    for name, data in FILES.items():
+        (path / name).write_bytes(data)
+    (path / ".hidden").write_bytes(b"x")
+    return path
+
+
+def test_manifest_lists_every_file(artifacts_dir, source_dir):
+    manifest = build_artifacts("demo", source_dir)
+
+    assert manifest["competition"] == "demo"
+    entries = {entry["name"]: entry for entry in manifest["files"]}
+    assert set(entries) == set(FILES)
+    for name, data in FILES.items():
+        entry = entries[name]
+        assert entry["size"] == len(data)
+        assert entry["sha256"] == hashlib.sha256(data).hexdigest()
+        artifact = artifacts_dir / "demo" / entry["artifact"]
+        assert entry["compressed_size"] == artifact.stat().st_size
+        assert gzip.decompress(artifact.read_bytes()) == data
+    assert entries["train.csv"]["media_type"] == "text/csv"
+
+    # 源文件未变化：复用上次的结果
+    assert build_artifacts("demo", source_dir) == manifest
+
+
+def test_changed_and_removed_files_are_rebuilt(artifacts_dir, source_dir):
+    build_artifacts("demo", source_dir)
+    stat = os.stat(source_dir / "train.csv")
+    (source_dir / "train.csv").write_bytes(b"a,b,label\n3,4,0\n")
+    os.utime(source_dir / "train.csv", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (source_dir / "README.md").unlink()
+
+    second = build_artifacts("demo", source_dir)
+
+    assert [entry["name"] for entry in second["files"]] == ["train.csv"]
+    assert second["files"][0]["sha256"] == hashlib.sha256(b"a,b,label\n3,4,0\n").hexdigest()
+    artifact = artifacts_dir / "demo" / "train.csv.gz"
+    assert gzip.decompress(artifact.read_bytes()) == b"a,b,label\n3,4,0\n"
+    assert not (artifacts_dir / "demo" / "README.md.gz").exists()
+
+
+def test_registry_only_serves_files_in_the_manifest(artifacts_dir, source_dir, tmp_path):
+    registry = ArtifactRegistry()
+    registry.build([("demo", tmp_path / "dataset.tar.gz"), ("missing", tmp_path / "missing.tar.gz")])
+
+    assert registry.artifact_path("demo", "train.csv") == artifacts_dir / "demo" / "train.csv.gz"
+    assert registry.artifact_path("demo", "train.csv.gz") is None
+    assert registry.artifact_path("demo", "../demo/manifest.json") is None
+    assert registry.manifest("missing") is None
+
+
+def test_registry_skips_competitions_that_fail_to_build(source_dir, tmp_path, monkeypatch):
+    # 输出目录不可写（路径被普通文件占用）时跳过，不影响启动
+    blocked = tmp_path / "blocked"
+    blocked.write_bytes(b"")
+    monkeypatch.setattr(dataset_artifacts, "DATASET_ARTIFACTS_DIR", blocked)
+    registry = ArtifactRegistry()
+
+    registry.build([("demo", tmp_path / "dataset.tar.gz")])
+
+    assert registry.manifest("demo") is None
+    assert registry.artifact_path("demo", "train.csv") is None
+
+
+def test_manifest_and_file_endpoints(client, competition_ids):
+    ppi = competition_ids["ppi"]
+
+    manifest = client.get(f"/api/datasets/{ppi}/manifest").json()
+    entries = {entry["name"]: entry for entry in manifest["files"]}
+    assert "test.csv" in entries
+    assert entries["test.csv"]["url"] == f"/api/datasets/{ppi}/files/test.csv"
+
+    response = client.get(entries["test.csv"]["url"])
+    assert response.status_code == 200
+    assert gzip.decompress(response.content) == (ROOT_DIR / "kaggle_dataset" / "test.csv").read_bytes()
+
+    assert client.get(f"/api/datasets/{ppi}/files/answers.csv").status_code == 404
+    assert client.get("/api/datasets/9999/manifest").status_code == 404
+    assert client.get("/api/datasets/9999/files/test.csv").status_code == 404
@@ -0,0 +1,62 @@
+import pytest
+from fastapi import HTTPException
+
+import auth
+from auth import issue_event_ticket, redeem_event_ticket
+from database import AsyncSessionLocal
+
+
+def redeem(run, ticket, competition_id):
+    async def use():
+        async with AsyncSessionLocal() as session:
+            return await redeem_event_ticket(session, ticket, competition_id)
+    return run(use())
+
+
+def issue(run, user_id, competition_id):
+    async def create():
+        async with AsyncSessionLocal() as session:
+            return await issue_event_ticket(session, user_id, competition_id)
+    return run(create())
+
+
+def test_ticket_endpoint(client, competition_ids, make_user, auth_headers):
+    headers = auth_headers(make_user("alice"))
+    url = f"/api/competitions/{competition_ids['cci']}/events/ticket"
+
+    assert client.post(url).status_code == 403
+    assert client.post("/api/competitions/9999/events/ticket", headers=headers).status_code == 404
+
+    response = client.post(url, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["expires_in"] == auth.EVENT_TICKET_TTL_SECONDS
+    # 票据不能用于其他竞赛，无效票据被拒绝
+    events = client.get(f"/api/competitions/{competition_ids['ppi']}/events", params={"ticket": response.json()["ticket"]})
+    assert events.status_code == 401
+    assert client.get(f"/api/competitions/{competition_ids['cci']}/events", params={"ticket": "x"}).status_code == 401
+
+
+def test_ticket_is_single_use(run, competition_ids, make_user):
+    user = make_user("alice")
+    ticket = issue(run, user.id, competition_ids["cci"])
+
+    assert redeem(run, ticket, competition_ids["cci"]) == user.id
+    with pytest.raises(HTTPException) as excinfo:
+        redeem(run, ticket, competition_ids["cci"])
+    assert excinfo.value.status_code == 401
+
+
+def test_ticket_for_another_competition_is_rejected(run, competition_ids, make_user):
+    ticket = issue(run, make_user("alice").id, competition_ids["cci"])
+
+    with pytest.raises(HTTPException):
+        redeem(run, ticket, competition_ids["ppi"])
+
+
+def test_expired_ticket_is_rejected(run, competition_ids, make_user, monkeypatch):
+    monkeypatch.setattr(auth, "EVENT_TICKET_TTL_SECONDS", -1)
+    ticket = issue(run, make_user("alice").id, competition_ids["cci"])
+
+    with pytest.raises(HTTPException) as excinfo:
+        redeem(run, ticket, competition_ids["cci"])
+    assert excinfo.value.status_code == 401
@@ -0,0 +1,106 @@
+import os
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from file_serving import DownloadLimiter, download_limiter, parse_range, serve_file
+
+DATA = bytes(range(256)) * 4000  # 大于一次发送的块
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "dataset.tar.gz"
+    path.write_bytes(DATA)
+    return path
+
+
+@pytest.fixture
+def client(dataset):
+    app = FastAPI()
+
+    @app.get("/download")
+    async def download(request: Request):
+        return await serve_file(request, dataset, "数据集.tar.gz", "application/gzip")
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-10", (990, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-4", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_full_download_and_conditional_request(client):
+    response = client.get("/download")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-disposition"].startswith("attachment; filename*=utf-8''")
+    etag = response.headers["etag"]
+
+    cached = client.get("/download", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert client.get("/download", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    # 发送完成后释放下载名额
+    assert download_limiter.active == 0
+
+
+def test_range_requests(client):
+    etag = client.get("/download").headers["etag"]
+
+    partial = client.get("/download", headers={"Range": "bytes=300000-300099"})
+    assert partial.status_code == 206
+    assert partial.content == DATA[300000:300100]
+    assert partial.headers["content-range"] == f"bytes 300000-300099/{len(DATA)}"
+
+    resumed = client.get("/download", headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert resumed.status_code == 206
+    assert resumed.content == DATA[1000:]
+
+    # If-Range 与当前版本不一致：返回完整文件
+    stale = client.get("/download", headers={"Range": "bytes=1000-", "If-Range": '"old"'})
+    assert stale.status_code == 200
+    assert stale.content == DATA
+
+    rejected = client.get("/download", headers={"Range": f"bytes={len(DATA)}-"})
+    assert rejected.status_code == 416
+    assert rejected.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+def test_etag_changes_with_the_file(client, dataset):
+    etag = client.get("/download").headers["etag"]
+    stat = os.stat(dataset)
+    dataset.write_bytes(DATA[::-1])
+    os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    response = client.get("/download", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_download_limiter_rejects_when_full():
+    limiter = DownloadLimiter(limit=1)
+    limiter.acquire()
+    with pytest.raises(HTTPException) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.status_code == 503
+    limiter.release()
+    limiter.acquire()
+    assert limiter.metrics() == {"active": 1, "limit": 1, "rejected": 1}
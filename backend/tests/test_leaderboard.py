@@ -0,0 +1,109 @@
+import random
+import threading
+from datetime import datetime, timedelta
+
+from database import LeaderboardRecord, OverallLeaderboardRecord, SessionLocal, Submission
+from leaderboard import get_leaderboard_entry, rebuild_leaderboard, update_leaderboard
+
+BEST_FIELDS = (
+    "best_submission_id", "best_score", "best_accuracy", "best_precision", "best_recall",
+    "best_f1_score", "best_submitted_at", "submission_count", "last_submission",
+)
+
+
+def snapshot(db, model, key_columns):
+    return {
+        tuple(getattr(record, column) for column in key_columns): tuple(getattr(record, f) for f in BEST_FIELDS)
+        for record in db.query(model).all()
+    }
+
+
+def leaderboard_snapshot(db):
+    return (
+        snapshot(db, LeaderboardRecord, ("competition_id", "user_id")),
+        snapshot(db, OverallLeaderboardRecord, ("user_id",)),
+    )
+
+
+def score_in_session(submission_id, score):
+    """与 save_result 相同：在独立的会话中写入成绩并更新排行榜"""
+    db = SessionLocal()
+    try:
+        submission = db.get(Submission, submission_id)
+        submission.status = "success"
+        submission.final_score = submission.accuracy = submission.precision = score
+        submission.recall = submission.f1_score = score
+        update_leaderboard(db, submission)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_concurrent_updates_match_a_full_rebuild(db, competition_ids, make_user, make_submission):
+    rng = random.Random(5)
+    users = [make_user(f"user{i}") for i in range(3)]
+    start = datetime(2024, 1, 1)
+    jobs = []
+    for i in range(48):
+        submission = make_submission(
+            rng.choice(users),
+            rng.choice(list(competition_ids.values())),
+            status="pending",
+            submitted_at=start + timedelta(seconds=i),
+        )
+        # 分数只有几档，覆盖同分时按提交时间排序的情况
+        jobs.append((submission.id, rng.choice([0.25, 0.5, 0.75])))
+
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def worker(batch):
+        barrier.wait()
+        try:
+            for submission_id, score in batch:
+                score_in_session(submission_id, score)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(jobs[i::8],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    db.expire_all()
+    incremental = leaderboard_snapshot(db)
+    assert sum(count for *_, count, _ in incremental[0].values()) == len(jobs)
+
+    rebuild_leaderboard(db)
+    db.commit()
+    assert leaderboard_snapshot(db) == incremental
+
+
+def test_best_score_keeps_the_earliest_of_equal_scores(db, competition_ids, make_user, make_submission):
+    user = make_user("alice")
+    cci = competition_ids["cci"]
+    first = make_submission(user, cci, 0.5, submitted_at=datetime(2024, 1, 1))
+    later_equal = make_submission(user, cci, 0.5, submitted_at=datetime(2024, 1, 2))
+    # 评分完成的顺序与提交顺序相反
+    for submission in (later_equal, first):
+        update_leaderboard(db, submission)
+    db.commit()
+
+    record = db.query(LeaderboardRecord).filter_by(user_id=user.id).one()
+    assert record.best_submission_id == first.id
+    assert record.submission_count == 2
+    assert record.last_submission == datetime(2024, 1, 2)
+
+
+def test_entry_rank_counts_users_ahead(db, competition_ids, make_user, make_submission):
+    cci = competition_ids["cci"]
+    alice, bob, carol = make_user("alice"), make_user("bob"), make_user("carol")
+    for user, score, day in ((alice, 0.9, 2), (bob, 0.9, 1), (carol, 0.4, 1)):
+        update_leaderboard(db, make_submission(user, cci, score, submitted_at=datetime(2024, 1, day)))
+    db.commit()
+
+    ranks = {user.username: get_leaderboard_entry(db, cci, user.id).rank for user in (alice, bob, carol)}
+    assert ranks == {"bob": 1, "alice": 2, "carol": 3}
+    assert get_leaderboard_entry(db, competition_ids["ppi"], alice.id) is None
@@ -0,0 +1,161 @@
+import hashlib
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+import blob_store
+from database import Base, CompetitionStats, LeaderboardRecord, OverallLeaderboardRecord, Submission
+from migrations import MIGRATIONS, run_migrations
+
+# 引入迁移之前的数据库结构
+BASELINE_SCHEMA = """
+CREATE TABLE competitions (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    title VARCHAR(200) NOT NULL,
+    description TEXT,
+    dataset_path VARCHAR(255) NOT NULL,
+    answer_path VARCHAR(255) NOT NULL,
+    is_active INTEGER,
+    created_at DATETIME
+);
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY,
+    username VARCHAR(50) NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    hashed_password VARCHAR(255) NOT NULL,
+    created_at DATETIME
+);
+CREATE UNIQUE INDEX ix_users_username ON users (username);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE submissions (
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    competition_id INTEGER NOT NULL REFERENCES competitions (id),
+    filename VARCHAR(255) NOT NULL,
+    submitted_at DATETIME,
+    accuracy FLOAT,
+    precision FLOAT,
+    recall FLOAT,
+    f1_score FLOAT,
+    final_score FLOAT,
+    tp INTEGER,
+    tn INTEGER,
+    fp INTEGER,
+    fn INTEGER,
+    status VARCHAR(20),
+    error_message TEXT
+);
+CREATE INDEX ix_submissions_id ON submissions (id);
+"""
+
+# (id, user_id, competition_id, filename, submitted_at, status, final_score)
+BASELINE_SUBMISSIONS = [
+    (1, 1, 1, "1_ppi_a.csv", "2024-01-01 00:00:00.000000", "success", 0.6),
+    (2, 1, 1, "1_ppi_b.csv", "2024-01-02 00:00:00.000000", "success", 0.8),
+    (3, 2, 1, "2_ppi_a.csv", "2024-01-03 00:00:00.000000", "success", 0.8),
+    (4, 2, 2, "2_cci_a.csv", "2024-01-04 00:00:00.000000", "success", 0.7),
+    (5, 2, 2, "2_cci_b.csv", "2024-01-05 00:00:00.000000", "error", None),
+    (6, 1, 2, "1_cci_a.csv", "2024-01-06 00:00:00.000000", "pending", None),
+]
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA.split(";"):
+            if statement.strip():
+                connection.exec_driver_sql(statement)
+        connection.execute(text(
+            "INSERT INTO competitions (id, name, title, dataset_path, answer_path, is_active) VALUES "
+            "(1, 'ppi', 'PPI', 'ppi.tar.gz', 'ppi.csv', 1), (2, 'cci', 'CCI', 'cci.tar.gz', 'cci.csv', 1)"
+        ))
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password) VALUES "
+            "(1, 'alice', 'alice@example.com', '-'), (2, 'bob', 'bob@example.com', '-')"
+        ))
+        for row in BASELINE_SUBMISSIONS:
+            connection.execute(text(
+                "INSERT INTO submissions (id, user_id, competition_id, filename, submitted_at, status, "
+                "final_score, accuracy, precision, recall, f1_score) "
+                "VALUES (:id, :user_id, :competition_id, :filename, :submitted_at, :status, "
+                ":score, :score, :score, :score, :score)"
+            ), dict(zip(("id", "user_id", "competition_id", "filename", "submitted_at", "status", "score"), row)))
+    yield engine
+    engine.dispose()
+
+
+def upgrade(engine):
+    """与 init_db 相同：先创建缺失的表，再执行迁移"""
+    Base.metadata.create_all(bind=engine)
+    return run_migrations(engine)
+
+
+def test_all_migrations_apply_to_a_baseline_database(baseline_engine):
+    applied = upgrade(baseline_engine)
+
+    assert [version for version, _ in applied] == sorted(m.version for m in MIGRATIONS)
+    inspector = inspect(baseline_engine)
+    columns = {c["name"] for c in inspector.get_columns("submissions")}
+    assert {"content_hash", "answer_version", "scoring_owner", "scoring_heartbeat"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("submissions")}
+    assert {index.name for index in Submission.__table__.indexes} <= indexes
+
+
+def test_migrations_rebuild_aggregates_from_existing_submissions(baseline_engine):
+    upgrade(baseline_engine)
+
+    with Session(baseline_engine) as db:
+        entries = {
+            (r.competition_id, r.user_id): (r.best_submission_id, r.best_score, r.submission_count)
+            for r in db.query(LeaderboardRecord).all()
+        }
+        assert entries == {(1, 1): (2, 0.8, 2), (1, 2): (3, 0.8, 1), (2, 2): (4, 0.7, 1)}
+
+        overall = {r.user_id: (r.best_submission_id, r.submission_count) for r in db.query(OverallLeaderboardRecord).all()}
+        assert overall == {1: (2, 2), 2: (3, 2)}
+
+        stats = {s.competition_id: (s.total_users, s.total_submissions, s.best_score) for s in db.query(CompetitionStats).all()}
+        assert stats == {1: (2, 3, 0.8), 2: (1, 1, 0.7)}
+
+        pending = db.get(Submission, 6)
+        assert pending.status == "pending"
+        assert pending.scoring_owner is None and pending.scoring_heartbeat is None
+
+
+def test_legacy_submission_files_are_imported(baseline_engine):
+    legacy = blob_store.SUBMISSIONS_DIR / "1_ppi_b.csv"
+    legacy.write_bytes(b"protein_A,protein_B,prediction\nA,B,1\n")
+    # 有内容哈希的早期提交按 {content_hash}.csv 保存
+    orphan_content = b"protein_A,protein_B,prediction\nC,D,0\n"
+    orphan_hash = hashlib.sha256(orphan_content).hexdigest()
+    orphan = blob_store.SUBMISSIONS_DIR / f"{orphan_hash}.csv"
+    orphan.write_bytes(orphan_content)
+
+    upgrade(baseline_engine)
+
+    assert not legacy.exists() and not orphan.exists()
+    with Session(baseline_engine) as db:
+        submission = db.get(Submission, 2)
+        assert submission.content_hash is not None
+        with blob_store.open_blob(blob_store.submission_file_path(submission)) as f:
+            assert f.read() == b"protein_A,protein_B,prediction\nA,B,1\n"
+        # 文件不存在的早期提交保持原样
+        assert db.get(Submission, 1).content_hash is None
+    assert blob_store.blob_store.locate(orphan_hash) is not None
+
+
+def test_migrations_run_only_once(baseline_engine):
+    upgrade(baseline_engine)
+    with Session(baseline_engine) as db:
+        db.add(Submission(user_id=1, competition_id=2, filename="new.csv", status="success", final_score=0.9,
+                          submitted_at=datetime(2024, 2, 1)))
+        db.commit()
+
+    assert upgrade(baseline_engine) == []
+    with Session(baseline_engine) as db:
+        # 已应用的迁移不会再次重建排行榜
+        assert db.query(LeaderboardRecord).filter_by(competition_id=2, user_id=1).first() is None
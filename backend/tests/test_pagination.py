@@ -0,0 +1,157 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from competition_stats import update_statistics
+from database import AsyncSessionLocal
+from leaderboard import get_leaderboard_page, update_leaderboard
+from pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    values = [0.123456789, datetime(2024, 5, 6, 7, 8, 9, 123456), 42, 7]
+    cursor = encode_cursor("leaderboard:1", *values)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "leaderboard:1", float, datetime, int, int) == values
+    # 整数分数按 float 还原
+    assert decode_cursor(encode_cursor("k", 1, 2), "k", float, int) == [1.0, 2]
+
+
+def raw_cursor(kind, values) -> str:
+    """不经过 encode_cursor 构造的游标，模拟被篡改的客户端输入"""
+    payload = json.dumps([kind, values]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor, kind, types", [
+    (encode_cursor("leaderboard:1", 0.5, 1), "leaderboard:2", (float, int)),
+    (encode_cursor("leaderboard:1", 0.5, 1), "leaderboard:1", (float, int, int)),
+    ("not-a-cursor", "leaderboard:1", (float, int)),
+    ("e30", "leaderboard:1", (float, int)),  # base64("{}")
+    ("", "leaderboard:1", (float, int)),
+    (raw_cursor("k", [[1], "x"]), "k", (float, datetime)),
+    (raw_cursor("k", [0.5, "2024-01-01"]), "k", (float, datetime)),
+    (raw_cursor("k", [0.5, {"dt": 5}]), "k", (float, datetime)),
+    (raw_cursor("k", [0.5, {"dt": "yesterday"}]), "k", (float, datetime)),
+    (raw_cursor("k", [True, 1]), "k", (float, int)),
+    (raw_cursor("k", [0.5, 1.5]), "k", (float, int)),
+    (raw_cursor("k", {"a": 1}), "k", (float,)),
+])
+def test_invalid_cursor_is_rejected(cursor, kind, types):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor, kind, *types)
+    assert excinfo.value.status_code == 400
+
+
+def record_score(db, submission):
+    update_statistics(db, submission, update_leaderboard(db, submission))
+
+
+@pytest.fixture
+def ranked_users(db, competition_ids, make_user, make_submission):
+    """11 个用户的成绩，包含同分、同分同时间的情况；返回按排名排列的用户名"""
+    start = datetime(2024, 1, 1)
+    scores = [0.5, 0.9, 0.5, 0.7, 0.9, 0.5, 0.1, 0.5, 0.3, 0.9, 0.7]
+    expected = []
+    for i, score in enumerate(scores):
+        user = make_user(f"user{i:02d}")
+        # 每三个用户的提交时间相同，最后按用户ID排序
+        submitted_at = start + timedelta(hours=i // 3)
+        record_score(db, make_submission(user, competition_ids["cci"], score, submitted_at=submitted_at))
+        # 其他竞赛中的较低成绩不影响跨竞赛排名
+        record_score(db, make_submission(user, competition_ids["ppi"], score / 2, submitted_at=submitted_at))
+        expected.append((-score, submitted_at, user.id, user.username))
+    db.commit()
+    return [username for *_, username in sorted(expected)]
+
+
+def collect_pages(run, competition_id, limit):
+    async def pages():
+        entries, cursor, totals = [], None, set()
+        while True:
+            async with AsyncSessionLocal() as session:
+                page, total, cursor = await get_leaderboard_page(session, competition_id, limit, cursor)
+            entries.extend(page)
+            totals.add(total)
+            if cursor is None:
+                return entries, totals
+    return run(pages())
+
+
+@pytest.mark.parametrize("limit", [1, 4, 11, 50])
+@pytest.mark.parametrize("scope", ["cci", None])
+def test_leaderboard_pages_chain_without_gaps(run, competition_ids, ranked_users, scope, limit):
+    competition_id = competition_ids[scope] if scope else None
+
+    entries, totals = collect_pages(run, competition_id, limit)
+
+    assert [entry.username for entry in entries] == ranked_users
+    assert [entry.rank for entry in entries] == list(range(1, len(ranked_users) + 1))
+    assert totals == {len(ranked_users)}
+
+
+def test_submission_history_pages(client, competition_ids, make_user, make_submission, auth_headers):
+    user = make_user("alice")
+    other = make_user("bob")
+    same_time = datetime(2024, 3, 1)
+    ids = [make_submission(user, competition_ids["cci"], 0.5, submitted_at=same_time).id for _ in range(4)]
+    ids += [make_submission(user, competition_ids["ppi"], 0.5, submitted_at=same_time + timedelta(days=1)).id]
+    make_submission(other, competition_ids["cci"], 0.5)
+    headers = auth_headers(user)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/submissions/me", params=params, headers=headers)
+        assert response.status_code == 200
+        assert response.headers[TOTAL_COUNT_HEADER] == "5"
+        seen.extend(submission["id"] for submission in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    # 按提交时间倒序，同一时间按ID倒序
+    assert seen == [ids[4], ids[3], ids[2], ids[1], ids[0]]
+
+    # 其他用户或其他列表的游标不能使用
+    other_cursor = encode_cursor(f"submissions:{other.id}", same_time, ids[0])
+    response = client.get("/api/submissions/me", params={"cursor": other_cursor}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_leaderboard_api_pagination_headers(client, competition_ids, ranked_users):
+    response = client.get("/api/leaderboard", params={"competition_id": competition_ids["cci"], "limit": 5})
+
+    assert [entry["username"] for entry in response.json()] == ranked_users[:5]
+    assert response.headers[TOTAL_COUNT_HEADER] == str(len(ranked_users))
+    cursor = response.headers[NEXT_CURSOR_HEADER]
+
+    response = client.get("/api/leaderboard", params={"competition_id": competition_ids["cci"], "limit": 5, "cursor": cursor})
+    assert [entry["username"] for entry in response.json()] == ranked_users[5:10]
+    assert response.json()[0]["rank"] == 6
+
+    # 单个竞赛的游标不能用于跨竞赛排行榜
+    assert client.get("/api/leaderboard", params={"cursor": cursor}).status_code == 400
+
+
+def test_tampered_cursors_are_rejected(client, competition_ids, make_user, auth_headers):
+    cci = competition_ids["cci"]
+    headers = auth_headers(make_user("alice"))
+    tampered = [
+        raw_cursor(f"leaderboard:{cci}", [[1], "x", 1, 0]),
+        raw_cursor(f"leaderboard:{cci}", [0.5, "not a date", 1, 0]),
+    ]
+    for cursor in tampered:
+        response = client.get("/api/leaderboard", params={"competition_id": cci, "cursor": cursor})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "无效的分页游标"
+
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    for values in ([[1], "x"], ["not a date", 1], [{"dt": "2024-01-01T00:00:00"}, "1"]):
+        cursor = raw_cursor(f"submissions:{user_id}", values)
+        response = client.get("/api/submissions/me", params={"cursor": cursor}, headers=headers)
+        assert response.status_code == 400
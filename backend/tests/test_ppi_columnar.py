@@ -0,0 +1,88 @@
+import csv
+
+import numpy as np
+import pytest
+
+import dataset_artifacts
+from dataset_artifacts import build_artifacts
+from ppi_columnar import convert, load_columnar
+
+HEADER = "protein_A,protein_B,sequence_A,sequence_B"
+SPLITS = {
+    "train": [HEADER + ",label", "P1,P2,MKV,AAG,1", "P1,P3,MKV,WYC,0", "P2,P3,AAG,WYC,1"],
+    "valid": [HEADER + ",label", "P3,P4,WYC,LLLL,0"],
+    "test": [HEADER, "P4,P1,LLLL,MKV", "P5,P2,G,AAG"],
+}
+
+
+def write_dataset(directory, splits):
+    directory.mkdir(exist_ok=True)
+    for split, lines in splits.items():
+        (directory / f"{split}.csv").write_text("\n".join(lines) + "\n")
+    return directory
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return [
+            (row["protein_A"], row["protein_B"], row["sequence_A"], row["sequence_B"],
+             int(row["label"]) if "label" in row else None)
+            for row in csv.DictReader(f)
+        ]
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    return write_dataset(tmp_path / "ppi", SPLITS)
+
+
+def test_round_trip_matches_the_csv(source_dir, tmp_path):
+    meta = convert(source_dir, tmp_path / "columnar", tmp_path / "ppi.npz")
+
+    assert meta["num_proteins"] == 5
+    assert meta["num_samples"] == {"train": 3, "valid": 1, "test": 2}
+
+    mapped = load_columnar(tmp_path / "columnar")
+    assert isinstance(mapped.sequences, np.memmap)
+    # 每个蛋白质的序列只保存一次
+    assert len(mapped) == 5
+    assert mapped.sequences.nbytes == len("MKV" + "AAG" + "WYC" + "LLLL" + "G")
+    assert mapped.labels("test") is None
+
+    packed = load_columnar(tmp_path / "ppi.npz")
+    for split in SPLITS:
+        expected = read_rows(source_dir / f"{split}.csv")
+        assert list(mapped.iter_rows(split)) == expected
+        assert list(packed.iter_rows(split)) == expected
+
+
+def test_inconsistent_sequences_are_rejected(source_dir, tmp_path):
+    write_dataset(source_dir, {"valid": [HEADER + ",label", "P1,P4,MKVX,LLLL,0"]})
+
+    with pytest.raises(ValueError, match="P1"):
+        convert(source_dir, npz_path=tmp_path / "ppi.npz")
+
+
+@pytest.mark.parametrize("lines", [
+    ["protein_A,protein_B,sequence_A", "P1,P2,MKV"],
+    [HEADER + ",label", "P1,P2,MKV"],
+    [HEADER + ",label", "P1,P2,MKV,AAG,yes"],
+    [HEADER, ",P2,MKV,AAG"],
+])
+def test_malformed_rows_are_rejected(tmp_path, lines):
+    source_dir = write_dataset(tmp_path / "ppi", {"train": lines})
+
+    with pytest.raises(ValueError):
+        convert(source_dir, npz_path=tmp_path / "ppi.npz")
+
+
+def test_failed_conversion_keeps_the_other_downloads(source_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_artifacts, "DATASET_ARTIFACTS_DIR", tmp_path / "artifacts")
+    names = [entry["name"] for entry in build_artifacts("ppi", source_dir)["files"]]
+    assert "ppi_columnar.npz" in names
+
+    write_dataset(source_dir, {"valid": [HEADER + ",label", "P1,P4,MKVX,LLLL,0"]})
+    manifest = build_artifacts("ppi", source_dir)
+
+    assert [entry["name"] for entry in manifest["files"]] == ["test.csv", "train.csv", "valid.csv"]
+    assert not (tmp_path / "artifacts" / "ppi" / "ppi_columnar.npz").exists()
@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from database import AsyncSessionLocal
+from rate_limit import (
+    DatabaseBucketStore, MemoryBucketStore, ScoringAdmission, SubmissionRateLimiter, submission_limiter,
+)
+from test_submissions import cci_submission, submit
+
+CAPACITY = 3.0
+RATE = 1 / 60  # 每分钟补充一个令牌
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request, db):
+    return MemoryBucketStore() if request.param == "memory" else DatabaseBucketStore()
+
+
+def test_bucket_refills_over_time(store):
+    now = 1000.0
+    assert [store.take("k", CAPACITY, RATE, now) for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    assert store.take("k", CAPACITY, RATE, now) == pytest.approx(60)
+    assert store.take("k", CAPACITY, RATE, now + 45) == pytest.approx(15)
+    assert store.take("k", CAPACITY, RATE, now + 60) == 0.0
+    assert store.take("k", CAPACITY, RATE, now + 60) == pytest.approx(60)
+
+    # 长时间不提交也只补满到容量
+    later = now + 3600
+    assert [store.take("k", CAPACITY, RATE, later) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take("k", CAPACITY, RATE, later) > 0
+
+    # 各个桶互不影响
+    assert store.take("other", CAPACITY, RATE, later) == 0.0
+
+
+def test_give_back_is_capped_at_capacity(store):
+    now = 1000.0
+    store.take("k", CAPACITY, RATE, now)
+    for _ in range(5):
+        store.give_back("k", CAPACITY)
+
+    assert [store.take("k", CAPACITY, RATE, now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take("k", CAPACITY, RATE, now) > 0
+
+
+def test_database_bucket_does_not_overissue_under_concurrency(db):
+    store = DatabaseBucketStore()
+    results, barrier = [], threading.Barrier(8)
+
+    def take():
+        barrier.wait()
+        results.append(store.take("k", CAPACITY, RATE, 1000.0))
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(0.0) == CAPACITY
+    assert len(results) == 8
+
+
+def test_memory_store_prunes_full_buckets():
+    store = MemoryBucketStore(max_keys=2)
+    store.take("a", CAPACITY, RATE, 0.0)
+    store.take("b", CAPACITY, RATE, 0.0)
+    # 一分钟后 a、b 都已补满，超过上限时被清理
+    store.take("c", CAPACITY, RATE, 60.0)
+
+    assert store.size() == 1
+
+
+def test_limiter_rejects_with_retry_after(run):
+    limiter = SubmissionRateLimiter(per_hour=60, burst=2, store=MemoryBucketStore())
+
+    async def attempts():
+        await limiter.check(1, 1)
+        await limiter.check(1, 1)
+        with pytest.raises(HTTPException) as excinfo:
+            await limiter.check(1, 1)
+        # 其他竞赛单独计数
+        await limiter.check(1, 2)
+        # 退回后可以再次提交
+        await limiter.refund(1, 1)
+        await limiter.check(1, 1)
+        return excinfo.value
+
+    error = run(attempts())
+    assert error.status_code == 429
+    assert 1 <= int(error.headers["Retry-After"]) <= 60
+    assert limiter.metrics()["rejected"] == 1
+    assert limiter.metrics()["refunded"] == 1
+
+
+def test_disabled_limiter_allows_everything(run):
+    limiter = SubmissionRateLimiter(per_hour=0, burst=1, store=MemoryBucketStore())
+
+    async def attempts():
+        for _ in range(5):
+            await limiter.check(1, 1)
+
+    run(attempts())
+    assert limiter.metrics()["buckets"] == 0
+
+
+def test_admission_counts_pending_submissions(run, competition_ids, make_user, make_submission):
+    user = make_user("alice")
+    admission = ScoringAdmission(limit=2)
+
+    async def check():
+        async with AsyncSessionLocal() as session:
+            await admission.check(session)
+
+    make_submission(user, competition_ids["cci"], status="pending")
+    make_submission(user, competition_ids["cci"], 0.5)
+    run(check())
+
+    make_submission(user, competition_ids["ppi"], status="pending")
+    with pytest.raises(HTTPException) as excinfo:
+        run(check())
+    assert excinfo.value.status_code == 429
+    assert "Retry-After" in excinfo.value.headers
+    assert admission.metrics()["rejected"] == 1
+
+
+def test_malformed_upload_is_refunded(client, competition_ids, make_user, auth_headers, monkeypatch):
+    monkeypatch.setattr(submission_limiter, "enabled", True)
+    monkeypatch.setattr(submission_limiter, "capacity", 1.0)
+    alice = auth_headers(make_user("alice"))
+    cci = competition_ids["cci"]
+
+    assert submit(client, alice, cci, b"wrong,header\n1,2\n").status_code == 400
+    assert submit(client, alice, cci, cci_submission(wrong=10)).status_code == 202
+
+    response = submit(client, alice, cci, cci_submission(wrong=20))
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
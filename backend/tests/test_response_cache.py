@@ -0,0 +1,131 @@
+from email.utils import formatdate
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.testclient import TestClient
+
+from response_cache import ALL_COMPETITIONS, ResponseCache
+from scoring_core import compute_metrics
+from scoring_jobs import save_result
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(max_size=3)
+
+
+@pytest.fixture
+def data():
+    """各竞赛的当前数据，以及 build 被调用的次数"""
+    return {"values": {1: "a", 2: "b"}, "builds": 0}
+
+
+@pytest.fixture
+def app_client(cache, data):
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items(request: Request, competition_id: int = None):
+        async def build(response: Response):
+            data["builds"] += 1
+            if competition_id == 404:
+                raise HTTPException(status_code=404, detail="竞赛不存在")
+            response.headers["X-Total-Count"] = "1"
+            return {"value": data["values"].get(competition_id, "all")}
+
+        return await cache.respond(request, competition_id or ALL_COMPETITIONS, build)
+
+    return TestClient(app)
+
+
+def test_repeated_requests_are_served_from_cache(app_client, data):
+    first = app_client.get("/items", params={"competition_id": 1})
+    second = app_client.get("/items", params={"competition_id": 1})
+
+    assert first.json() == second.json() == {"value": "a"}
+    assert first.headers["etag"] == second.headers["etag"]
+    assert second.headers["cache-control"] == "no-cache"
+    assert second.headers["x-total-count"] == "1"
+    assert data["builds"] == 1
+
+
+def test_if_none_match_returns_304(app_client):
+    etag = app_client.get("/items", params={"competition_id": 1}).headers["etag"]
+
+    response = app_client.get("/items", params={"competition_id": 1}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["x-total-count"] == "1"
+
+    weak = app_client.get("/items", params={"competition_id": 1}, headers={"If-None-Match": f'"x", W/{etag}'})
+    assert weak.status_code == 304
+    assert app_client.get("/items", params={"competition_id": 1}, headers={"If-None-Match": '"x"'}).status_code == 200
+
+
+def test_if_modified_since(app_client):
+    last_modified = app_client.get("/items", params={"competition_id": 1}).headers["last-modified"]
+
+    assert app_client.get("/items", params={"competition_id": 1}, headers={"If-Modified-Since": last_modified}).status_code == 304
+    earlier = formatdate(0, usegmt=True)
+    assert app_client.get("/items", params={"competition_id": 1}, headers={"If-Modified-Since": earlier}).status_code == 200
+    # If-None-Match 优先于 If-Modified-Since
+    response = app_client.get(
+        "/items", params={"competition_id": 1},
+        headers={"If-None-Match": '"x"', "If-Modified-Since": last_modified},
+    )
+    assert response.status_code == 200
+
+
+def test_invalidation_is_scoped_to_the_competition_and_overall(app_client, cache, data):
+    etags = {key: app_client.get("/items", params=params).headers["etag"]
+             for key, params in (("c1", {"competition_id": 1}), ("c2", {"competition_id": 2}), ("all", {}))}
+    builds = data["builds"]
+
+    data["values"][1] = "a2"
+    cache.invalidate(1)
+
+    def status(params, etag):
+        return app_client.get("/items", params=params, headers={"If-None-Match": etag}).status_code
+
+    assert status({"competition_id": 1}, etags["c1"]) == 200
+    assert status({"competition_id": 2}, etags["c2"]) == 304
+    # 跨竞赛数据随任一竞赛变化：重新生成（内容相同，ETag 仍然匹配）
+    assert status({}, etags["all"]) == 304
+    assert data["builds"] == builds + 2
+    assert app_client.get("/items", params={"competition_id": 1}).json() == {"value": "a2"}
+
+
+def test_errors_are_not_cached(app_client, data):
+    assert app_client.get("/items", params={"competition_id": 404}).status_code == 404
+    assert app_client.get("/items", params={"competition_id": 404}).status_code == 404
+    assert data["builds"] == 2
+
+
+def test_least_recently_used_entries_are_evicted(app_client, cache, data):
+    for competition_id in (1, 2, 3, 1, 4):
+        app_client.get("/items", params={"competition_id": competition_id})
+    assert data["builds"] == 4
+    assert cache.metrics()["size"] == 3
+
+    app_client.get("/items", params={"competition_id": 1})
+    assert data["builds"] == 4
+    app_client.get("/items", params={"competition_id": 2})
+    assert data["builds"] == 5
+
+
+def test_leaderboard_etag_changes_after_scoring(client, competition_ids, make_user, make_submission):
+    params = {"competition_id": competition_ids["cci"]}
+    first = client.get("/api/leaderboard", params=params)
+    assert first.json() == []
+    etag = first.headers["etag"]
+    assert client.get("/api/leaderboard", params=params, headers={"If-None-Match": etag}).status_code == 304
+
+    # 评分结果写回后排行榜缓存失效
+    submission = make_submission(make_user("alice"), competition_ids["cci"], status="pending")
+    save_result(submission.id, compute_metrics(tp=1, tn=1, fp=0, fn=0))
+
+    response = client.get("/api/leaderboard", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [entry["username"] for entry in response.json()] == ["alice"]
@@ -0,0 +1,145 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from answer_cache import load_answer_key
+from blob_store import blob_store
+from database import AsyncSessionLocal, LeaderboardRecord
+from scoring_core import compute_metrics, error_result
+from scoring_jobs import claim_pending_jobs, find_cached_result, renew_leases, run_scoring_job, save_result
+
+ANSWERS = b"source,target,label\n1,2,1\n2,3,0\n3,4,1\n"
+PREDICTIONS = b"source,target,label\n1,2,1\n2,3,1\n3,4,1\n"
+
+
+@pytest.fixture
+def answer_path(tmp_path):
+    path = tmp_path / "answers.csv"
+    path.write_bytes(ANSWERS)
+    return str(path)
+
+
+def store_blob(data: bytes) -> str:
+    with blob_store.writer() as writer:
+        writer.write(data)
+        return writer.commit()
+
+
+def success_result(answer_version="v1"):
+    return dict(compute_metrics(tp=2, tn=0, fp=1, fn=0), answer_version=answer_version)
+
+
+def test_run_scoring_job_scores_a_stored_blob(answer_path):
+    content_hash = store_blob(PREDICTIONS)
+
+    result = run_scoring_job("cci", answer_path, str(blob_store.locate(content_hash)))
+
+    assert result == success_result(load_answer_key(answer_path, ["source", "target"]).version)
+
+
+def test_run_scoring_job_reports_errors(answer_path, tmp_path):
+    assert run_scoring_job("unknown", answer_path, "x")["status"] == "error"
+    result = run_scoring_job("cci", answer_path, str(tmp_path / "missing.csv.gz"))
+    assert result["status"] == "error"
+    assert result["error_message"].startswith("评分过程出错")
+
+
+def test_save_result_scores_a_pending_submission_once(db, competition_ids, make_user, make_submission):
+    user = make_user("alice")
+    submission = make_submission(user, competition_ids["cci"], status="pending")
+
+    save_result(submission.id, success_result())
+    # 同一提交被重新排队后再次写回结果时忽略
+    save_result(submission.id, error_result("重复评分"))
+
+    db.refresh(submission)
+    assert submission.status == "success"
+    assert submission.answer_version == "v1"
+    record = db.query(LeaderboardRecord).filter_by(user_id=user.id).one()
+    assert record.submission_count == 1
+    assert record.best_submission_id == submission.id
+
+
+def test_failed_result_keeps_files_shared_with_other_submissions(db, competition_ids, make_user, make_submission):
+    user = make_user("alice")
+    content_hash = store_blob(PREDICTIONS)
+    path = blob_store.locate(content_hash)
+    scored = make_submission(user, competition_ids["cci"], 0.5, content_hash=content_hash)
+    failed = make_submission(user, competition_ids["cci"], status="pending", content_hash=content_hash)
+
+    save_result(failed.id, error_result("评分失败"), str(path))
+    assert path.exists()
+
+    db.delete(scored)
+    db.commit()
+    retried = make_submission(user, competition_ids["cci"], status="pending", content_hash=content_hash)
+    save_result(retried.id, error_result("评分失败"), str(path))
+    assert not path.exists()
+
+
+def test_cached_result_is_only_reused_for_the_same_user(run, competition_ids, make_user, make_submission):
+    alice, bob = make_user("alice"), make_user("bob")
+    make_submission(alice, competition_ids["cci"], 0.8, content_hash="h" * 64, answer_version="v1")
+
+    async def lookup(user, answer_version="v1", competition="cci"):
+        async with AsyncSessionLocal() as session:
+            return await find_cached_result(session, user.id, competition_ids[competition], "h" * 64, answer_version)
+
+    assert run(lookup(alice))["final_score"] == 0.8
+    assert run(lookup(bob)) is None
+    assert run(lookup(alice, answer_version="v2")) is None
+    assert run(lookup(alice, competition="ppi")) is None
+    assert run(lookup(alice, answer_version=None)) is None
+
+
+def test_pending_submissions_are_not_reused(run, competition_ids, make_user, make_submission):
+    alice = make_user("alice")
+    make_submission(alice, competition_ids["cci"], status="pending", content_hash="h" * 64, answer_version="v1")
+
+    async def lookup():
+        async with AsyncSessionLocal() as session:
+            return await find_cached_result(session, alice.id, competition_ids["cci"], "h" * 64, "v1")
+
+    assert run(lookup()) is None
+
+
+def test_claim_pending_jobs_skips_live_leases(db, competition_ids, make_user, make_submission):
+    user = make_user("alice")
+    content_hash = store_blob(PREDICTIONS)
+    now = datetime.utcnow()
+    live = make_submission(user, competition_ids["cci"], status="pending", content_hash=content_hash,
+                           scoring_owner=1, scoring_heartbeat=now)
+    expired = make_submission(user, competition_ids["cci"], status="pending", content_hash=content_hash,
+                              scoring_owner=1, scoring_heartbeat=now - timedelta(seconds=120))
+    unclaimed = make_submission(user, competition_ids["ppi"], status="pending", content_hash=content_hash)
+    lost = make_submission(user, competition_ids["cci"], status="pending", content_hash="0" * 64)
+
+    jobs = claim_pending_jobs(lambda path: path, lease_seconds=60)
+
+    assert sorted(job[0] for job in jobs) == sorted([expired.id, unclaimed.id])
+    assert {job[3] for job in jobs} == {str(blob_store.locate(content_hash))}
+    # 已认领的提交在租约有效期内不会被再次认领
+    assert claim_pending_jobs(lambda path: path, lease_seconds=60) == []
+
+    db.expire_all()
+    assert live.scoring_owner == 1
+    assert expired.scoring_owner == os.getpid()
+    assert lost.status == "error"
+
+    # 不指定租约时认领所有待评分的提交
+    assert {job[0] for job in claim_pending_jobs(lambda path: path)} == {live.id, expired.id, unclaimed.id}
+
+
+def test_renew_leases_only_touches_pending_submissions(db, competition_ids, make_user, make_submission):
+    user = make_user("alice")
+    stale = datetime.utcnow() - timedelta(hours=1)
+    pending = make_submission(user, competition_ids["cci"], status="pending", scoring_heartbeat=stale)
+    done = make_submission(user, competition_ids["cci"], 0.5, scoring_heartbeat=stale)
+
+    renew_leases([pending.id, done.id])
+
+    db.expire_all()
+    assert pending.scoring_heartbeat > stale
+    assert pending.scoring_owner == os.getpid()
+    assert done.scoring_heartbeat == stale
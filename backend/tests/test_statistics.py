@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from competition_stats import rebuild_statistics, update_statistics
+from database import CompetitionStats, Submission
+from leaderboard import update_leaderboard
+
+
+def row_by_row_statistics(db, competition_id=None) -> dict:
+    """改为累计值之前 /api/statistics 的计算方式：逐行读取成功的提交"""
+    query = db.query(Submission).filter(Submission.status == 'success')
+    if competition_id:
+        query = query.filter(Submission.competition_id == competition_id)
+    submissions = query.all()
+    scores = [s.final_score for s in submissions if s.final_score is not None]
+    return {
+        "total_users": len({s.user_id for s in submissions}),
+        "total_submissions": len(submissions),
+        "avg_score": sum(scores) / len(scores) if scores else 0,
+        "best_score": max(scores) if scores else 0,
+    }
+
+
+@pytest.fixture
+def seeded(db, competition_ids, make_user, make_submission):
+    """几个用户在两个竞赛中的成功、失败和待评分提交，成功的提交计入统计"""
+    start = datetime(2024, 1, 1)
+    users = [make_user(f"user{i}") for i in range(4)]
+    plan = [
+        (0, "cci", 0.5), (0, "cci", 0.75), (1, "cci", 0.25), (1, "cci", 0.25),
+        (2, "ppi", 0.875), (0, "ppi", 0.125), (3, "cci", 0.5),
+    ]
+    for i, (user, name, score) in enumerate(plan):
+        submission = make_submission(users[user], competition_ids[name], score, submitted_at=start + timedelta(minutes=i))
+        update_statistics(db, submission, update_leaderboard(db, submission))
+    make_submission(users[3], competition_ids["cci"], status="failed")
+    make_submission(users[3], competition_ids["ppi"], status="pending")
+    db.commit()
+    return users
+
+
+def test_statistics_match_the_row_by_row_numbers(client, db, competition_ids, seeded):
+    for competition_id in (None, competition_ids["cci"], competition_ids["ppi"]):
+        params = {"competition_id": competition_id} if competition_id else {}
+        stats = client.get("/api/statistics", params=params).json()
+        expected = row_by_row_statistics(db, competition_id)
+        assert stats == pytest.approx(expected), competition_id
+
+
+def test_competition_without_submissions_reports_zeros(client, db, competition_ids, seeded):
+    db.query(Submission).filter(Submission.competition_id == competition_ids["ppi"]).delete()
+    db.query(CompetitionStats).filter(CompetitionStats.competition_id == competition_ids["ppi"]).delete()
+    db.commit()
+
+    stats = client.get("/api/statistics", params={"competition_id": competition_ids["ppi"]}).json()
+
+    assert stats == row_by_row_statistics(db, competition_ids["ppi"])
+    assert stats == {"total_users": 0, "total_submissions": 0, "avg_score": 0, "best_score": 0}
+
+
+def test_rebuild_matches_the_running_totals(db, seeded):
+    def snapshot():
+        return {
+            row.competition_id: (row.total_users, row.total_submissions, round(row.score_sum, 9), row.best_score)
+            for row in db.query(CompetitionStats).all()
+        }
+
+    running = snapshot()
+    assert rebuild_statistics(db) == len(running)
+    db.commit()
+    assert snapshot() == running
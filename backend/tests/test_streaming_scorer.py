@@ -0,0 +1,196 @@
+import io
+
+import pytest
+
+from answer_cache import load_answer_key
+from scoring_core import SubmissionFormatError, compute_metrics, evaluate_file
+from streaming_scorer import MAX_LINE_LENGTH, CsvLineStream, StreamingScorer, UploadValidator, score_stream
+
+KEY_COLS = ["source", "target"]
+# (source, target, label)
+ANSWERS = [(1, 2, 1), (2, 3, 0), (3, 4, 1), (4, 5, 0), (5, 6, 1)]
+
+
+@pytest.fixture
+def answers_path(tmp_path):
+    path = tmp_path / "answers.csv"
+    path.write_text("source,target,label\n" + "".join(f"{s},{t},{label}\n" for s, t, label in ANSWERS))
+    return str(path)
+
+
+@pytest.fixture
+def answer_key(answers_path):
+    return load_answer_key(answers_path, KEY_COLS)
+
+
+def submission(predictions, header="source,target,label", newline="\n", trailing=True):
+    lines = [header] + [f"{s},{t},{p}" for (s, t, _), p in zip(ANSWERS, predictions)]
+    return (newline.join(lines) + (newline if trailing else "")).encode()
+
+
+def feed_in_chunks(stream, data, chunk_size):
+    for start in range(0, len(data), chunk_size):
+        stream.feed(data[start:start + chunk_size])
+
+
+def score(answer_key, data, chunk_size=4096):
+    scorer = StreamingScorer(answer_key, KEY_COLS, "label")
+    return score_stream(scorer, io.BytesIO(data), chunk_size=chunk_size)
+
+
+def validator(max_rows=len(ANSWERS)):
+    return UploadValidator(KEY_COLS, "label", max_rows=max_rows)
+
+
+def test_line_stream_is_abstract():
+    with pytest.raises(TypeError):
+        CsvLineStream(KEY_COLS, "label", max_rows=1)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 4096])
+def test_score_does_not_depend_on_chunk_boundaries(answer_key, chunk_size):
+    result = score(answer_key, submission([1, 1, 0, 0, 1]), chunk_size)
+    # tp: (1,2) (5,6)  fp: (2,3)  fn: (3,4)  tn: (4,5)
+    assert result == compute_metrics(tp=2, tn=1, fp=1, fn=1)
+
+
+@pytest.mark.parametrize("kwargs", [{"newline": "\r\n"}, {"trailing": False}])
+def test_crlf_and_missing_final_newline(answer_key, kwargs):
+    result = score(answer_key, submission([1, 0, 1, 0, 1], **kwargs), chunk_size=5)
+    assert result["status"] == "success"
+    assert result["final_score"] == pytest.approx(1.0)
+
+
+def test_bom_and_multibyte_characters_split_across_chunks(answer_key):
+    data = "\ufeff".encode() + submission([1, 0, 1, 0, 1], header="source,target,label,备注")
+    stream = validator()
+    feed_in_chunks(stream, data, 1)
+    stream.finish()
+    assert stream.rows == len(ANSWERS)
+
+
+def test_missing_column_is_rejected_on_first_line():
+    stream = validator()
+    with pytest.raises(SubmissionFormatError, match="label"):
+        stream.feed(b"source,target,prediction\n")
+
+
+def test_invalid_utf8_is_rejected():
+    stream = validator()
+    with pytest.raises(SubmissionFormatError, match="UTF-8"):
+        stream.feed(b"source,target,label\n1,2,\xff\n")
+
+
+def test_too_many_rows_are_rejected_while_streaming():
+    stream = validator(max_rows=2)
+    with pytest.raises(SubmissionFormatError, match="超过测试集样本数"):
+        stream.feed(b"source,target,label\n1,2,1\n2,3,0\n3,4,1\n")
+
+
+@pytest.mark.parametrize("data", [b"", b"source,target,label\n", b"\n\n"])
+def test_empty_upload_is_rejected(data):
+    stream = validator()
+    stream.feed(data)
+    with pytest.raises(SubmissionFormatError, match="为空"):
+        stream.finish()
+
+
+def test_long_line_inside_a_chunk_is_rejected():
+    long_line = b"1,2," + b"1" * MAX_LINE_LENGTH
+    stream = validator()
+    with pytest.raises(SubmissionFormatError, match="单行超过"):
+        stream.feed(b"source,target,label\n" + long_line + b"\n3,4,1\n")
+
+
+def test_long_unterminated_line_is_rejected_before_close():
+    stream = validator()
+    stream.feed(b"source,target,label\n")
+    with pytest.raises(SubmissionFormatError, match="单行超过"):
+        for _ in range(MAX_LINE_LENGTH // 1024 + 1):
+            stream.feed(b"1" * 1024)
+
+
+def test_final_line_at_the_limit_is_accepted():
+    stream = validator()
+    feed_in_chunks(stream, b"source,target,label\n1,2," + b"1" * (MAX_LINE_LENGTH - 4), 1000)
+    stream.finish()
+    assert stream.rows == 1
+
+
+def test_duplicate_sample_is_an_error(answer_key):
+    data = submission([1, 0, 1, 0]) + b"1,2,0\n"
+    result = score(answer_key, data)
+    assert result["status"] == "error"
+    assert "重复样本" in result["error_message"]
+
+
+def test_unknown_and_missing_samples(answer_key):
+    data = submission([1, 0, 1, 0]) + b"9,9,1\n"
+    result = score(answer_key, data)
+    assert result == {"status": "error", "error_message": "1 个样本缺失"}
+
+    result = score(answer_key, submission([1, 0, 1]))
+    assert result["status"] == "error"
+    assert "不等于" in result["error_message"]
+
+
+def test_first_invalid_prediction_is_reported_in_answer_order(answer_key):
+    lines = ["source,target,label", "5,6,x", "1,2,1", "3,4,y", "2,3,0", "4,5, 1"]
+    result = score(answer_key, ("\n".join(lines) + "\n").encode(), chunk_size=8)
+    assert result["status"] == "error"
+    assert result["error_message"].startswith("2 个无效预测值")
+    assert "('3', '4')" in result["error_message"]
+
+
+# 备注列中带引号的换行和转义引号
+QUOTED = (
+    'source,target,label,备注\n'
+    '1,2,1,"第一行\n第二行"\n'
+    '2,3,0,"含 ""引号"" 和\n\n空行"\n'
+    '3,4,1,\n'
+    '4,5,0,"x"\n'
+    '5,6,1,"末行\n"\n'
+).encode()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_quoted_newlines_stay_in_their_field(answer_key, chunk_size):
+    assert score(answer_key, QUOTED, chunk_size) == compute_metrics(tp=3, tn=2, fp=0, fn=0)
+
+    stream = validator()
+    feed_in_chunks(stream, QUOTED, chunk_size)
+    stream.finish()
+    assert stream.rows == len(ANSWERS)
+
+
+def test_unterminated_quote_is_rejected_at_the_line_limit():
+    stream = validator()
+    stream.feed(b'source,target,label\n1,2,"')
+    with pytest.raises(SubmissionFormatError, match="单行超过"):
+        for _ in range(MAX_LINE_LENGTH // 1024 + 1):
+            stream.feed(b"1\n" * 512)
+
+
+@pytest.mark.parametrize("data", [
+    QUOTED,
+    submission([1, 0, 1, 0]) + b"1,2,0\n",
+    submission([1, 0, 1, 0]) + b"9,9,1\n",
+    submission([1, 0, 1, 0, 1], newline="\r\n"),
+])
+def test_file_scoring_agrees_with_streaming(answer_key, answers_path, tmp_path, data):
+    path = tmp_path / "submission.csv"
+    path.write_bytes(data)
+
+    result = evaluate_file(str(path), answers_path, KEY_COLS, "label")
+
+    assert result == score(answer_key, data)
+
+
+def test_file_scoring_rejects_duplicate_samples(answers_path, tmp_path):
+    path = tmp_path / "submission.csv"
+    path.write_bytes(submission([1, 0, 1, 0, 1]) + b"1,2,0\n")
+
+    result = evaluate_file(str(path), answers_path, KEY_COLS, "label")
+
+    assert result["status"] == "error"
+    assert "重复样本" in result["error_message"]
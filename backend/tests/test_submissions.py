@@ -0,0 +1,106 @@
+import csv
+import io
+import time
+
+from blob_store import BlobWriter
+from database import LeaderboardRecord, Submission, async_engine
+from main import ROOT_DIR
+
+CCI_ANSWERS = ROOT_DIR / "cci test" / "answer" / "test_edges.csv"
+
+
+def cci_submission(wrong: int = 0) -> bytes:
+    """由 CCI 答案生成的提交文件，前 wrong 行的预测取反"""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["source", "target", "label"])
+    with open(CCI_ANSWERS, newline="") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            label = int(row["label"])
+            writer.writerow([row["source"], row["target"], 1 - label if i < wrong else label])
+    return out.getvalue().encode()
+
+
+def submit(client, headers, competition_id, content, filename="prediction.csv"):
+    return client.post(
+        "/api/submissions",
+        params={"competition_id": competition_id},
+        files={"file": (filename, content, "text/csv")},
+        headers=headers,
+    )
+
+
+def wait_for_result(client, headers, submission_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        submission = client.get(f"/api/submissions/{submission_id}", headers=headers).json()
+        if submission["status"] != "pending":
+            return submission
+        time.sleep(0.1)
+    raise AssertionError(f"提交 {submission_id} 评分超时")
+
+
+def test_identical_resubmission_reuses_the_score(client, db, competition_ids, make_user, auth_headers):
+    alice = auth_headers(make_user("alice"))
+    cci = competition_ids["cci"]
+    content = cci_submission(wrong=100)
+
+    first = submit(client, alice, cci, content)
+    assert first.status_code == 202
+    scored = wait_for_result(client, alice, first.json()["id"])
+    assert scored["status"] == "success"
+
+    again = submit(client, alice, cci, content, filename="renamed.csv")
+    assert again.status_code == 200
+    assert again.json()["status"] == "success"
+    assert again.json()["final_score"] == scored["final_score"]
+
+    # 复用的结果同样计入排行榜的提交次数
+    record = db.query(LeaderboardRecord).filter_by(competition_id=cci).one()
+    assert record.submission_count == 2
+
+
+def test_other_users_files_are_scored_separately(client, db, competition_ids, make_user, auth_headers):
+    alice = auth_headers(make_user("alice"))
+    bob = auth_headers(make_user("bob"))
+    cci = competition_ids["cci"]
+    content = cci_submission(wrong=100)
+
+    wait_for_result(client, alice, submit(client, alice, cci, content).json()["id"])
+
+    response = submit(client, bob, cci, content)
+    assert response.status_code == 202
+    assert response.json()["status"] == "pending"
+    assert wait_for_result(client, bob, response.json()["id"])["status"] == "success"
+
+    # 两个提交共用同一份文件
+    hashes = {s.content_hash for s in db.query(Submission).all()}
+    assert len(hashes) == 1
+
+
+def test_changed_file_is_scored_again(client, competition_ids, make_user, auth_headers):
+    alice = auth_headers(make_user("alice"))
+    cci = competition_ids["cci"]
+
+    first = wait_for_result(client, alice, submit(client, alice, cci, cci_submission(wrong=100)).json()["id"])
+    response = submit(client, alice, cci, cci_submission(wrong=10))
+    assert response.status_code == 202
+    second = wait_for_result(client, alice, response.json()["id"])
+    assert second["final_score"] > first["final_score"]
+
+
+def test_upload_is_read_without_holding_a_connection(client, competition_ids, make_user, auth_headers, monkeypatch):
+    alice = auth_headers(make_user("alice"))
+    checked_out = []
+    write = BlobWriter.write
+
+    def recording_write(self, chunk):
+        # 写入上传内容时异步连接池中没有被借出的连接
+        checked_out.append(async_engine.pool.checkedout())
+        return write(self, chunk)
+
+    monkeypatch.setattr(BlobWriter, "write", recording_write)
+    response = submit(client, alice, competition_ids["cci"], cci_submission(wrong=100))
+
+    assert response.status_code == 202
+    assert checked_out and set(checked_out) == {0}
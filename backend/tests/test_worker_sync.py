@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import auth
+from database import WorkerEvent
+from worker_sync import WorkerSync
+
+
+@pytest.fixture
+def sync(db):
+    return WorkerSync(enabled=True)
+
+
+def test_send_from_the_event_loop_is_flushed(run, db, sync):
+    async def send():
+        sync._loop = asyncio.get_running_loop()
+        sync.send("invalidate", competition_id=1)
+        # 写库在线程池中进行，任务保留在 _pending 中直到完成
+        assert len(sync._pending) == 1
+        await sync.flush()
+
+    run(send())
+
+    assert sync._pending == set()
+    assert sync.sent == 1
+    event = db.query(WorkerEvent).one()
+    assert (event.kind, event.competition_id, event.origin) == ("invalidate", 1, sync.pid)
+
+
+def test_events_from_other_workers_are_handled(run, db, sync):
+    received = []
+    sync.on("invalidate", lambda row: received.append(row.competition_id))
+    # 本进程发出的通知已直接处理，轮询时跳过
+    sync.send("invalidate", competition_id=1)
+    db.add(WorkerEvent(origin=sync.pid + 1, kind="invalidate", competition_id=2))
+    db.add(WorkerEvent(origin=sync.pid + 1, kind="unknown", competition_id=3))
+    db.commit()
+
+    run(sync._poll())
+    run(sync._poll())
+
+    assert received == [2]
+    assert sync.received == 1
+
+
+def test_disabled_sync_sends_nothing(db):
+    WorkerSync(enabled=False).send("invalidate", competition_id=1)
+
+    assert db.query(WorkerEvent).count() == 0
+
+
+def test_metrics_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(auth, "METRICS_TOKEN", "")
+    assert client.get("/api/metrics").status_code == 404
+
+    monkeypatch.setattr(auth, "METRICS_TOKEN", "secret")
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert "submission_rate_limit" in response.json()
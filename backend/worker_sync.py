@@ -0,0 +1,235 @@
+"""
+多进程部署 - 启动文件锁与跨进程通知
+
+WORKERS > 1 时由多个 uvicorn 工作进程共同提供服务（见 main.py 的启动方式），
+进程内的状态需要协调：
+
+- 启动锁：init_db（建表、迁移、初始化竞赛）和数据集打包在 fcntl 文件锁内执行，
+  多个进程同时启动时依次进行，不会互相冲突
+- 主进程锁：只有持有该锁的进程负责整理提交文件和重新排队评分租约过期的提交
+  （见 scoring_jobs.recovery_loop），避免同一任务被多个进程重复执行；
+  持有者退出后其他进程在下次轮询时接替
+- 跨进程通知：响应缓存失效和实时事件写入 worker_events 表，各进程每隔
+  WORKER_SYNC_INTERVAL 秒读取其他进程写入的新行并在本进程中处理；
+  发出通知的进程自己直接处理，不经过数据库
+
+单进程（WORKERS=1）时跨进程通知关闭，所有操作都只在进程内进行。
+不支持 fcntl 的平台（Windows）上文件锁不起作用，只应以单进程运行。
+"""
+import asyncio
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import delete, func, select
+from starlette.concurrency import run_in_threadpool
+
+from database import AsyncSessionLocal, BASE_DIR, SessionLocal, WorkerEvent
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 工作进程数（由启动器或部署脚本设置，所有工作进程读取同一个值）
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# 读取其他进程通知的间隔（秒）
+WORKER_SYNC_INTERVAL = float(os.getenv("WORKER_SYNC_INTERVAL", "0.5"))
+
+# worker_events 中的通知保留时间（秒）
+WORKER_EVENT_RETENTION = int(os.getenv("WORKER_EVENT_RETENTION", "300"))
+
+# 锁文件所在目录，同一台机器上的所有工作进程必须相同
+WORKER_LOCK_DIR = Path(os.getenv("WORKER_LOCK_DIR") or BASE_DIR)
+
+STARTUP_LOCK = ".startup.lock"
+LEADER_LOCK = ".leader.lock"
+
+
+@contextmanager
+def file_lock(name: str):
+    """阻塞地获取排他文件锁，退出时释放"""
+    WORKER_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    with open(WORKER_LOCK_DIR / name, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class LeaderLock:
+    """非阻塞的进程级文件锁，持有期间本进程负责后台任务"""
+
+    def __init__(self, name: str = LEADER_LOCK):
+        self.name = name
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        WORKER_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+        f = open(WORKER_LOCK_DIR / self.name, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            self._file.close()  # 关闭文件即释放 flock
+            self._file = None
+
+
+Handler = Callable[[WorkerEvent], None]
+
+
+class WorkerSync:
+    """通过 worker_events 表在工作进程间传递通知"""
+
+    def __init__(self, enabled: bool = WORKERS > 1):
+        self.enabled = enabled
+        self.leader = LeaderLock()
+        self._handlers: Dict[str, Handler] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_id = 0
+        # 进行中的写库任务：保留引用，避免任务在完成前被回收
+        self._pending: Set[asyncio.Task] = set()
+        self.sent = 0
+        self.received = 0
+
+    @property
+    def pid(self) -> int:
+        # 不在导入时读取：gunicorn --preload 会在导入后 fork 出工作进程
+        return os.getpid()
+
+    def on(self, kind: str, handler: Handler) -> None:
+        """注册某类通知的处理函数（在事件循环中调用）"""
+        self._handlers[kind] = handler
+
+    def send(
+        self,
+        kind: str,
+        competition_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        name: Optional[str] = None,
+        payload: Optional[str] = None,
+    ) -> None:
+        """
+        通知其他工作进程（可在任意线程中调用）
+
+        在事件循环线程中调用时写库操作放到线程池中执行，不阻塞事件循环。
+        """
+        if not self.enabled:
+            return
+        row = dict(kind=kind, competition_id=competition_id, user_id=user_id, name=name, payload=payload)
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is loop:
+            task = loop.create_task(run_in_threadpool(self._insert, row))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+        else:
+            self._insert(row)
+
+    async def flush(self) -> None:
+        """等待进行中的写库任务完成（关闭前调用）"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def _insert(self, row: Dict) -> None:
+        db = SessionLocal()
+        try:
+            db.add(WorkerEvent(origin=self.pid, **row))
+            db.commit()
+            self.sent += 1
+        except Exception as e:
+            print(f"⚠️  跨进程通知写入失败 [{row['kind']}]: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    async def _latest_id(self) -> int:
+        async with AsyncSessionLocal() as db:
+            return (await db.scalar(select(func.max(WorkerEvent.id)))) or 0
+
+    async def _poll(self) -> None:
+        async with AsyncSessionLocal() as db:
+            rows: List[WorkerEvent] = (await db.execute(
+                select(WorkerEvent)
+                .where(WorkerEvent.id > self._last_id)
+                .order_by(WorkerEvent.id)
+            )).scalars().all()
+        for row in rows:
+            self._last_id = row.id
+            if row.origin == self.pid:
+                continue
+            handler = self._handlers.get(row.kind)
+            if handler is None:
+                continue
+            self.received += 1
+            try:
+                handler(row)
+            except Exception as e:
+                print(f"⚠️  跨进程通知处理失败 [{row.kind}]: {e}")
+
+    async def _prune(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=WORKER_EVENT_RETENTION)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(WorkerEvent).where(WorkerEvent.created_at < cutoff))
+            await db.commit()
+
+    async def run(self, on_leader: Optional[Callable[[], None]] = None) -> None:
+        """
+        轮询其他进程的通知（在 lifespan 中作为后台任务运行）
+
+        未持有主进程锁时每轮尝试获取，获取成功后调用 on_leader 接管后台任务。
+        """
+        self._loop = asyncio.get_running_loop()
+        self._last_id = await self._latest_id()
+        polls = 0
+        while True:
+            await asyncio.sleep(WORKER_SYNC_INTERVAL)
+            try:
+                if not self.leader.held and self.leader.try_acquire():
+                    print(f"✅ 进程 {self.pid} 接管后台任务")
+                    if on_leader is not None:
+                        on_leader()
+                await self._poll()
+                polls += 1
+                # 约每分钟由主进程清理一次过期通知
+                if self.leader.held and polls % max(1, int(60 / WORKER_SYNC_INTERVAL)) == 0:
+                    await self._prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  跨进程通知读取失败: {e}")
+
+    def metrics(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "workers": WORKERS,
+            "pid": self.pid,
+            "leader": self.leader.held,
+            "sent": self.sent,
+            "received": self.received,
+        }
+
+
+worker_sync = WorkerSync()
@@ -21,8 +21,18 @@ api.interceptors.request.use(
 )
 
 // 响应拦截器 - 处理错误
+// 分页请求（config.paginated）额外返回响应头中的下一页游标和总数
 api.interceptors.response.use(
-  response => response.data,
+  response => {
+    if (response.config.paginated) {
+      return {
+        items: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null,
+        total: Number(response.headers['x-total-count'] || response.data.length)
+      }
+    }
+    return response.data
+  },
   error => {
     if (error.response?.status === 401) {
       // 未授权，清除token并跳转登录
@@ -57,6 +67,11 @@ export const submissionAPI = {
     })
   },
   getMySubmissions: (limit = 50) => api.get('/submissions/me', { params: { limit } }),
+  getMySubmissionsPage: (limit = 50, cursor = null) => {
+    const params = { limit }
+    if (cursor) params.cursor = cursor
+    return api.get('/submissions/me', { params, paginated: true })
+  },
   getSubmission: (id) => api.get(`/submissions/${id}`)
 }
 
@@ -66,6 +81,12 @@ export const leaderboardAPI = {
     const params = { limit }
     if (competitionId) params.competition_id = competitionId
     return api.get('/leaderboard', { params })
+  },
+  getLeaderboardPage: (competitionId = null, limit = 100, cursor = null) => {
+    const params = { limit }
+    if (competitionId) params.competition_id = competitionId
+    if (cursor) params.cursor = cursor
+    return api.get('/leaderboard', { params, paginated: true })
   }
 }
 
@@ -77,6 +98,68 @@ export const statisticsAPI = {
   }
 }
 
+// 实时事件API（SSE）：EventSource 不能设置请求头，登录用户先换取一次性票据放在查询参数中。
+// 票据只能使用一次，连接被服务器关闭后由这里换取新票据重新连接。
+// handlers: { 事件名: (data) => {}, open: 连接建立时, error: 无法建立连接时 }
+const SSE_RECONNECT_MS = 3000
+
+const openEventSource = async (competitionId) => {
+  let query = ''
+  if (localStorage.getItem('token')) {
+    const { ticket } = await api.post(`/competitions/${competitionId}/events/ticket`)
+    query = `?ticket=${encodeURIComponent(ticket)}`
+  }
+  return new EventSource(`/api/competitions/${competitionId}/events${query}`)
+}
+
+export const eventsAPI = {
+  open: (competitionId, handlers = {}) => {
+    let source = null
+    let closed = false
+    let timer = null
+
+    const connect = async () => {
+      let opened = false
+      try {
+        source = await openEventSource(competitionId)
+      } catch (error) {
+        if (!closed) handlers.error?.(error)
+        return
+      }
+      if (closed) {
+        source.close()
+        return
+      }
+      for (const [name, handler] of Object.entries(handlers)) {
+        if (name === 'open' || name === 'error') continue
+        source.addEventListener(name, (event) => handler(JSON.parse(event.data)))
+      }
+      source.onopen = () => {
+        opened = true
+        handlers.open?.()
+      }
+      source.onerror = () => {
+        // 连接中断时 EventSource 会自动重连；重连因票据已使用被拒绝时换取新票据再连接
+        if (closed || source.readyState !== EventSource.CLOSED) return
+        if (opened) {
+          timer = setTimeout(connect, SSE_RECONNECT_MS)
+        } else {
+          handlers.error?.()
+        }
+      }
+    }
+
+    connect()
+    return {
+      close: () => {
+        closed = true
+        clearTimeout(timer)
+        source?.close()
+      }
+    }
+  }
+}
+
 // 数据下载API
 export const downloadAPI = {
   getDatasetUrl: (competitionId) => `/api/download/dataset/${competitionId}`